@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import time
+import socket
+import logging
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'scripts'))
+
+from synthetic_sweep import SyntheticSweepGenerator
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+logger = logging.getLogger('benchmark')
+
+# Escalas del barrido: corridas por celda y filas del log de paquetes por corrida
+SCALES = {
+    'small': {'runs': 2, 'packets_per_run': 700},
+    'medium': {'runs': 10, 'packets_per_run': 2000},
+    'large': {'runs': 30, 'packets_per_run': 10000}
+}
+
+class PipelineBenchmark:
+    """Mide tiempo y memoria de cada etapa del pipeline sobre barridos sintéticos"""
+
+    def __init__(self, scales: List[str], stages: List[str] = None, repeat: int = 1, track_memory: bool = True):
+        self.scales = scales
+        self.stages = stages or ['load', 'statistics', 'plotting', 'reporting', 'security_performance']
+        self.repeat = repeat
+        self.track_memory = track_memory
+
+    def _measure(self, func: Callable):
+        """Ejecuta una etapa y devuelve (resultado, segundos, pico de memoria en MB)"""
+        if self.track_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            result = func()
+        finally:
+            elapsed = time.perf_counter() - start
+            peak = 0.0
+            if self.track_memory:
+                _, peak_bytes = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                peak = peak_bytes / (1024 * 1024)
+        return result, elapsed, peak
+
+    def run_scale(self, scale: str, work_dir: Path) -> Dict:
+        """Genera el barrido de una escala y mide cada etapa"""
+        from run_analysis import SimulationAnalyzer
+        from security_analysis import SecurityAnalyzer
+        from performance_analysis import PerformanceAnalyzer
+        from distribution_analysis import DistributionAnalyzer
+        from output_writer import get_writer
+
+        params = SCALES[scale]
+        sweep_dir = work_dir / 'sweep'
+        generation_start = time.perf_counter()
+        SyntheticSweepGenerator(sweep_dir, runs=params['runs'], packets_per_run=params['packets_per_run']).generate()
+        generation_time = time.perf_counter() - generation_start
+
+        # Los resultados de los analizadores quedan en el directorio temporal de la escala
+        results_dir = str(work_dir / 'results')
+        writer = get_writer()
+        results = {}
+        for iteration in range(self.repeat):
+            analyzer = SimulationAnalyzer(str(sweep_dir), results_dir=results_dir)
+            for sub in ('tables', 'graphs', 'reports'):
+                (analyzer.results_dir / sub).mkdir(parents=True, exist_ok=True)
+            state = {}
+
+            def load():
+                state['metrics'] = analyzer.load_metrics()
+
+            def statistics():
+                state['summary'] = analyzer.generate_summary_statistics(state['metrics'])
+                DistributionAnalyzer(str(sweep_dir), results_dir=results_dir).run_analysis()
+
+            def plotting():
+                analyzer.generate_comparative_plots(state['metrics'])
+
+            def reporting():
+                analyzer.generate_report(state['summary'])
+
+            def security_performance():
+                SecurityAnalyzer(str(sweep_dir), results_dir=results_dir).generate_security_report(state['metrics'])
+                PerformanceAnalyzer(str(sweep_dir), results_dir=results_dir).generate_performance_report(state['metrics'])
+
+            stage_funcs = {'load': load, 'statistics': statistics, 'plotting': plotting,
+                           'reporting': reporting, 'security_performance': security_performance}
+            # Las etapas dependen de las anteriores: se ejecutan siempre en orden
+            for stage in ['load', 'statistics', 'plotting', 'reporting', 'security_performance']:
+                if stage not in self.stages and stage not in ('load', 'statistics'):
+                    continue
+                # La etapa incluye la publicación de sus archivos por el escritor en segundo plano
+                _, elapsed, peak = self._measure(lambda: (stage_funcs[stage](), writer.flush(all_scopes=True)))
+                if stage in self.stages:
+                    entry = results.setdefault(stage, {'seconds': [], 'peak_mb': []})
+                    entry['seconds'].append(elapsed)
+                    entry['peak_mb'].append(peak)
+                logger.info(f"[{scale}] {stage}: {elapsed:.3f} s, pico {peak:.1f} MB")
+
+        stages = {stage: {'seconds': min(values['seconds']), 'peak_mb': max(values['peak_mb'])}
+                  for stage, values in results.items()}
+        return {
+            'params': params,
+            'generation_seconds': generation_time,
+            'sweep_bytes': sum(f.stat().st_size for f in sweep_dir.rglob('*') if f.is_file()),
+            'stages': stages
+        }
+
+    def run(self) -> Dict:
+        """Ejecuta todas las escalas en directorios temporales independientes"""
+        report = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'host': socket.gethostname(),
+            'python': platform.python_version(),
+            'repeat': self.repeat,
+            'scales': {}
+        }
+        for scale in self.scales:
+            with tempfile.TemporaryDirectory(prefix=f'bench_{scale}_') as tmp:
+                report['scales'][scale] = self.run_scale(scale, Path(tmp))
+        return report
+
+
+def compare_with_baseline(report: Dict, baseline: Dict, time_tolerance: float = 0.25,
+                          memory_tolerance: float = 0.25, min_seconds: float = 0.05) -> List[str]:
+    """Compara un reporte con el baseline y devuelve las regresiones detectadas"""
+    regressions = []
+    for scale, scale_report in report['scales'].items():
+        base_scale = baseline.get('scales', {}).get(scale)
+        if not base_scale:
+            continue
+        for stage, values in scale_report['stages'].items():
+            base = base_scale['stages'].get(stage)
+            if not base:
+                continue
+            seconds, base_seconds = values['seconds'], base['seconds']
+            if seconds > base_seconds * (1 + time_tolerance) and seconds - base_seconds > min_seconds:
+                regressions.append(f"{scale}/{stage}: tiempo {base_seconds:.3f} s -> {seconds:.3f} s "
+                                   f"(+{(seconds / base_seconds - 1) * 100:.0f}%)")
+            peak, base_peak = values['peak_mb'], base['peak_mb']
+            if base_peak > 0 and peak > base_peak * (1 + memory_tolerance) and peak - base_peak > 1.0:
+                regressions.append(f"{scale}/{stage}: memoria {base_peak:.1f} MB -> {peak:.1f} MB "
+                                   f"(+{(peak / base_peak - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del pipeline de post-procesamiento')
+    parser.add_argument('--scales', nargs='+', default=['small', 'medium'], choices=list(SCALES))
+    parser.add_argument('--stages', nargs='+', default=None,
+                        choices=['load', 'statistics', 'plotting', 'reporting', 'security_performance'])
+    parser.add_argument('--repeat', type=int, default=1, help='Repeticiones por escala (se toma el mínimo)')
+    parser.add_argument('--no-memory', action='store_true', help='No medir memoria (tracemalloc agrega overhead)')
+    parser.add_argument('--results-dir', default=str(BENCHMARKS_DIR / 'results'))
+    parser.add_argument('--baseline', default=str(BENCHMARKS_DIR / 'baseline.json'))
+    parser.add_argument('--save-baseline', action='store_true', help='Guarda este resultado como nuevo baseline')
+    parser.add_argument('--time-tolerance', type=float, default=0.25)
+    parser.add_argument('--memory-tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', force=True)
+    # Los analizadores registran cada archivo cargado; en el benchmark solo interesan las etapas
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger('benchmark').setLevel(logging.INFO)
+
+    benchmark = PipelineBenchmark(args.scales, args.stages, args.repeat, not args.no_memory)
+    report = benchmark.run()
+
+    results_dir = Path(args.results_dir)
+    results_dir.mkdir(parents=True, exist_ok=True)
+    result_file = results_dir / f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(result_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados guardados en {result_file}")
+
+    for scale, scale_report in report['scales'].items():
+        print(f"\n{scale} ({scale_report['params']['runs']} corridas/celda, "
+              f"{scale_report['sweep_bytes'] / 1e6:.1f} MB)")
+        for stage, values in scale_report['stages'].items():
+            print(f"  {stage:<22} {values['seconds']:8.3f} s  {values['peak_mb']:8.1f} MB")
+
+    exit_code = 0
+    baseline_file = Path(args.baseline)
+    if baseline_file.exists() and not args.save_baseline:
+        with open(baseline_file) as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(report, baseline, args.time_tolerance, args.memory_tolerance)
+        if regressions:
+            print("\nRegresiones respecto al baseline:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            exit_code = 1
+        else:
+            print("\nSin regresiones respecto al baseline")
+
+    if args.save_baseline:
+        with open(baseline_file, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline guardado en {baseline_file}")
+
+    sys.exit(exit_code)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+
+import sys
+import zlib
+import argparse
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+# Configuraciones del barrido: (nodos maliciosos, nodos interferentes), igual que run_simulations CON DSR.sh
+DEFAULT_CONFIGS = {
+    'no_mal_no_int': (0, 0),
+    'int_no_mal': (0, 3),
+    'mal_no_int': (2, 0),
+    'mal_int': (2, 3)
+}
+DEFAULT_PROTOCOLS = ['AODV', 'OLSR', 'DSDV', 'DSR']
+
+# Perfil aproximado de cada protocolo (PDR base en %, delay medio en s)
+PROTOCOL_PROFILE = {
+    'AODV': (80.0, 0.9),
+    'OLSR': (55.0, 0.05),
+    'DSDV': (70.0, 0.3),
+    'DSR': (45.0, 8.0)
+}
+
+# Cambios de ruta por nodo y segundo, y mensajes de control (por nodo y segundo, bytes) de cada protocolo
+CHURN_PER_NODE_S = {'AODV': 0.15, 'OLSR': 0.3, 'DSDV': 0.2}
+CONTROL_PROFILE = {
+    'AODV': (0.8, 52),
+    'OLSR': (1.5, 76),
+    'DSDV': (0.6, 60),
+    'DSR': (0.7, 60)
+}
+
+class SyntheticSweepGenerator:
+    """Genera árboles de barrido sintéticos con los mismos esquemas CSV que escribe el simulador"""
+
+    def __init__(self, output_dir: str, configs: Dict = None, protocols: List[str] = None, runs: int = 10,
+                 n_fixed: int = 20, n_mobile: int = 10, sim_time: int = 60, packets_per_run: int = 700,
+                 seed: int = 1, legacy_packet_schema: bool = False):
+        self.output_dir = Path(output_dir)
+        self.configs = configs or DEFAULT_CONFIGS
+        self.protocols = protocols or DEFAULT_PROTOCOLS
+        self.runs = runs
+        self.n_fixed = n_fixed
+        self.n_mobile = n_mobile
+        self.sim_time = sim_time
+        self.packets_per_run = packets_per_run
+        self.seed = seed
+        self.legacy_packet_schema = legacy_packet_schema
+        self.start = datetime(2025, 6, 3, 9, 0, 0)
+
+    def generate(self) -> Path:
+        """Genera el árbol completo <config>/<protocolo>/run<N>"""
+        for config, (n_malicious, n_interfering) in self.configs.items():
+            for protocol in self.protocols:
+                for run in range(1, self.runs + 1):
+                    run_dir = self.output_dir / config / protocol / f'run{run}'
+                    self.generate_run(run_dir, config, protocol, run, n_malicious, n_interfering)
+        logging.info(f"Barrido sintético generado en {self.output_dir}")
+        return self.output_dir
+
+    def generate_run(self, run_dir: Path, config: str, protocol: str, run: int,
+                     n_malicious: int, n_interfering: int):
+        """Genera los artefactos de una corrida"""
+        seed = 1000 + run
+        rng = np.random.default_rng([self.seed, seed, zlib.crc32(f'{config}/{protocol}'.encode())])
+        n_nodes = self.n_fixed + self.n_mobile + n_malicious + n_interfering
+        node_types = (['Fijo'] * self.n_fixed + ['Móvil'] * self.n_mobile +
+                      ['Malicioso'] * n_malicious + ['Interferente'] * n_interfering)
+        ips = [f'192.168.1.{i + 1}' for i in range(n_nodes)]
+        started = self.start + timedelta(minutes=run)
+        times = np.arange(1, self.sim_time)
+
+        for sub in ('metrics', 'node_metadata', 'packet_logs', 'routing_logs', 'pcap'):
+            (run_dir / sub).mkdir(parents=True, exist_ok=True)
+
+        # metadata.txt
+        with open(run_dir / 'metadata.txt', 'w') as f:
+            f.write("Metadatos de Simulación\n")
+            f.write(f"Timestamp: {started:%Y-%m-%d %H:%M:%S}\n")
+            f.write(f"Nodos Fijos: {self.n_fixed}\n")
+            f.write(f"Nodos Móviles: {self.n_mobile}\n")
+            f.write(f"Nodos Maliciosos: {n_malicious}\n")
+            f.write(f"Nodos Interferentes: {n_interfering}\n")
+            f.write(f"Tiempo de Simulación: {self.sim_time} segundos\n")
+            f.write(f"Protocolo de Enrutamiento: {protocol}\n")
+            f.write(f"Nombre de Configuración: {config}\n")
+            f.write(f"Semilla Aleatoria: {seed}\n")
+
+        # node_metadata/nodes.csv
+        pd.DataFrame({'node_id': range(n_nodes), 'ip_address': ips, 'node_type': node_types}) \
+            .to_csv(run_dir / 'node_metadata' / 'nodes.csv', index=False)
+
+        # packet_logs/packets_normal.csv
+        n_sources = self.n_fixed + self.n_mobile
+        sim_times = np.sort(rng.uniform(1.0, self.sim_time, self.packets_per_run))
+        packets = {
+            # El reloj de pared avanza más lento que el simulado, como en los logs reales
+            'timestamp': (pd.Timestamp(started) + pd.to_timedelta(np.floor(sim_times / 10), unit='s'))
+            .strftime('%Y-%m-%d %H:%M:%S'),
+            'source_ip': np.array(ips[:n_sources])[rng.integers(1, n_sources, self.packets_per_run)],
+            'port': 9,
+            'traffic_type': 'Normal',
+            'packet_size': 512,
+            'sim_time': np.round(sim_times, 5)
+        }
+        base_pdr, base_delay = PROTOCOL_PROFILE.get(protocol, (70.0, 0.5))
+        if not self.legacy_packet_schema:
+            packets['delay_ms'] = np.round(rng.lognormal(np.log(base_delay * 1000.0), 1.0, self.packets_per_run), 4)
+        pd.DataFrame(packets).to_csv(run_dir / 'packet_logs' / 'packets_normal.csv', index=False)
+
+        # mobile_positions.csv (el simulador solo registra los nodos móviles, no los maliciosos)
+        moving = list(range(self.n_fixed, self.n_fixed + self.n_mobile))
+        steps = rng.normal(0, 1.0, (len(times), len(moving), 2))
+        positions = np.clip(rng.uniform(0, 100, (len(moving), 2)) + np.cumsum(steps, axis=0), 0, 100)
+        pd.DataFrame({
+            'time': np.repeat(times, len(moving)),
+            'node_id': np.tile(moving, len(times)),
+            'x': np.round(positions[:, :, 0].ravel(), 4),
+            'y': np.round(positions[:, :, 1].ravel(), 4),
+            'z': 0
+        }).to_csv(run_dir / 'mobile_positions.csv', index=False)
+
+        # energy_consumption.csv
+        drain = rng.uniform(0.01, 0.05, n_nodes)
+        pd.DataFrame({
+            'time': np.repeat(times, n_nodes),
+            'node_id': np.tile(np.arange(n_nodes), len(times)),
+            'energy_remaining': np.round((100.0 - np.outer(times, drain)).ravel(), 6)
+        }).to_csv(run_dir / 'energy_consumption.csv', index=False)
+
+        # routing_logs/routing_table_changes.csv (diferencias entre muestreos; DSR no tiene tabla)
+        n_changes = 0 if protocol == 'DSR' else int(rng.poisson(CHURN_PER_NODE_S.get(protocol, 0.1) * n_nodes * len(times)))
+        change_nodes = rng.integers(0, n_nodes, n_changes)
+        pd.DataFrame({
+            'timestamp': np.sort(rng.choice(times, n_changes)),
+            'node_id': change_nodes,
+            'protocol': protocol,
+            'destination': np.array(ips)[(change_nodes + rng.integers(1, n_nodes, n_changes)) % n_nodes],
+            'next_hop': np.array(ips)[rng.integers(0, n_nodes, n_changes)],
+            'metric': rng.integers(1, 6, n_changes),
+            'change': rng.choice(['ADD', 'DEL', 'CHG'], n_changes, p=[0.4, 0.3, 0.3])
+        }, columns=['timestamp', 'node_id', 'protocol', 'destination', 'next_hop', 'metric', 'change']) \
+            .to_csv(run_dir / 'routing_logs' / 'routing_table_changes.csv', index=False)
+
+        # routing_logs/control_messages.csv (un mensaje por transmisión)
+        rate, size = CONTROL_PROFILE.get(protocol, (1.0, 48))
+        n_control = int(rng.poisson(rate * n_nodes * self.sim_time))
+        pd.DataFrame({
+            'timestamp': np.round(np.sort(rng.uniform(0.0, self.sim_time, n_control)), 6),
+            'node_id': rng.integers(0, n_nodes, n_control),
+            'protocol': protocol,
+            'msg_type': 'control',
+            'size': size
+        }).to_csv(run_dir / 'routing_logs' / 'control_messages.csv', index=False)
+
+        # metrics/metrics.csv
+        penalty = 8.0 * n_malicious + 3.0 * n_interfering
+        # Números aleatorios comunes: con la misma semilla el simulador repite movilidad y tráfico en
+        # todas las configuraciones, así que parte de la variación es propia de la semilla
+        common = np.random.default_rng([self.seed, seed]).normal(0.0, 1.0, 2)
+        # Redes más grandes que la de referencia (30 nodos) entregan menos y tardan más (más saltos)
+        size_factor = max(1.0, n_sources / 30.0)
+        pdr = float(np.clip(rng.normal(base_pdr - penalty - 10.0 * np.log2(size_factor) + 8.0 * common[0], 6.0),
+                            0.0, 100.0))
+        flows = int(rng.integers(n_sources * 10, n_sources * 30))
+        total_packets = int(n_sources * self.sim_time / 2 + rng.integers(0, 500))
+        lost = int(round(total_packets * (100.0 - pdr) / 100.0))
+        throughput = rng.gamma(2.0, 0.05)
+        delay = rng.gamma(2.0, base_delay / 2.0) * np.exp(0.3 * common[1]) * np.sqrt(size_factor)
+        ended = started + timedelta(seconds=float(rng.uniform(20, 120)) * n_nodes / 30.0)
+        metrics = pd.DataFrame([{
+            'timestamp': f'{ended:%Y-%m-%d %H:%M:%S}',
+            'protocolo': protocol,
+            'nodos_fijos': self.n_fixed,
+            'nodos_moviles': self.n_mobile,
+            'nodos_maliciosos': n_malicious,
+            'nodos_interferentes': n_interfering,
+            'throughput_promedio': round(throughput, 6),
+            'throughput_maximo': round(throughput * flows, 6),
+            'delay_promedio': round(delay, 6),
+            'delay_maximo': round(delay * rng.uniform(5, 15), 6),
+            'delay_minimo': round(rng.uniform(0.0001, 0.001), 6),
+            'jitter_promedio': round(delay * rng.uniform(0.3, 0.8), 6),
+            'perdida_paquetes': round(100.0 - pdr, 6),
+            'pdr': round(pdr, 6),
+            'paquetes_totales': total_packets,
+            'paquetes_perdidos': lost,
+            'numero_flujos': flows,
+            'tiempo_simulacion': f'{float(self.sim_time):.6f}'
+        }])
+        metrics.to_csv(run_dir / 'metrics' / 'metrics.csv', index=False)
+
+        # metrics/node_metrics.csv
+        pd.DataFrame({
+            'node_id': range(n_nodes),
+            'throughput_avg': np.round(rng.gamma(2.0, 3.0, n_nodes), 6),
+            'delay_avg': np.round(rng.gamma(2.0, base_delay / 2.0, n_nodes), 6),
+            'jitter_avg': np.round(rng.gamma(2.0, base_delay / 4.0, n_nodes), 6),
+            'energy_consumed': 0
+        }).to_csv(run_dir / 'metrics' / 'node_metrics.csv', index=False)
+
+        # metrics/node_timeseries.csv: intervalos de 1 s, solo nodos con tráfico en el intervalo
+        node_of = {ip: i for i, ip in enumerate(ips)}
+        tick = np.ceil(sim_times).clip(1, times[-1] if len(times) else 1)
+        received = pd.DataFrame({'time': tick, 'node_id': pd.Series(packets['source_ip']).map(node_of)})
+        sent = received.groupby(['time', 'node_id']).size().rename('rx').reset_index()
+        lost = rng.poisson(sent['rx'] * (100.0 - pdr) / max(pdr, 1.0))
+        tx = pd.DataFrame({'time': sent['time'], 'node_id': sent['node_id'], 'tx_packets': sent['rx'] + lost,
+                           'tx_bytes': (sent['rx'] + lost) * 512, 'rx_packets': 0, 'rx_bytes': 0,
+                           'lost_packets': lost})
+        sink = received.groupby('time').size()
+        delays = pd.Series(packets.get('delay_ms', np.full(len(tick), base_delay * 1000.0))).groupby(tick).mean()
+        rx = pd.DataFrame({'time': sink.index, 'node_id': 0, 'tx_packets': 0, 'tx_bytes': 0,
+                           'rx_packets': sink.values, 'rx_bytes': sink.values * 512, 'lost_packets': 0})
+        series = pd.concat([tx, rx], ignore_index=True).groupby(['time', 'node_id'], as_index=False).sum()
+        series['throughput_kbps'] = np.round(series['rx_bytes'] * 8.0 / 1000, 6)
+        has_rx = series['rx_packets'] > 0
+        series['delay_ms'] = np.where(has_rx, np.round(series['time'].map(delays), 4), np.nan)
+        series['jitter_ms'] = np.where(has_rx, np.round(series['delay_ms'] * 0.5, 4), np.nan)
+        series['time'] = series['time'].astype(int)
+        series.to_csv(run_dir / 'metrics' / 'node_timeseries.csv', index=False)
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera un barrido sintético con los esquemas del simulador')
+    parser.add_argument('output_dir')
+    parser.add_argument('--runs', type=int, default=10, help='Corridas por (configuración, protocolo)')
+    parser.add_argument('--configs', nargs='+', default=list(DEFAULT_CONFIGS),
+                        help='Configuraciones (nombres conocidos) a generar')
+    parser.add_argument('--protocols', nargs='+', default=DEFAULT_PROTOCOLS)
+    parser.add_argument('--fixed-nodes', type=int, default=20)
+    parser.add_argument('--mobile-nodes', type=int, default=10)
+    parser.add_argument('--node-grid', nargs='+', default=None, metavar='FIJOS:MÓVILES:MAL:INT',
+                        help='Barrido de escalabilidad (como SCALABILITY=1): una configuración por punto de la grilla')
+    parser.add_argument('--sim-time', type=int, default=60)
+    parser.add_argument('--packets', type=int, default=700, help='Filas del log de paquetes por corrida')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--legacy-packet-schema', action='store_true',
+                        help='Omite la columna delay_ms (logs anteriores del simulador)')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    unknown = [c for c in args.configs if c not in DEFAULT_CONFIGS]
+    if unknown:
+        print(f"Configuraciones desconocidas: {', '.join(unknown)}")
+        sys.exit(1)
+
+    if args.node_grid:
+        for point in args.node_grid:
+            try:
+                n_fixed, n_mobile, n_malicious, n_interfering = (int(v) for v in point.split(':'))
+            except ValueError:
+                print(f"Punto de grilla inválido (se espera fijos:móviles:maliciosos:interferentes): {point}")
+                sys.exit(1)
+            # Mismo nombre de configuración que usa run_simulations CON DSR.sh
+            config = f'scale_{n_fixed}f_{n_mobile}m_{n_malicious}mal_{n_interfering}int'
+            SyntheticSweepGenerator(args.output_dir, configs={config: (n_malicious, n_interfering)},
+                                    protocols=args.protocols, runs=args.runs, n_fixed=n_fixed, n_mobile=n_mobile,
+                                    sim_time=args.sim_time, packets_per_run=args.packets, seed=args.seed,
+                                    legacy_packet_schema=args.legacy_packet_schema).generate()
+        return
+
+    SyntheticSweepGenerator(
+        args.output_dir,
+        configs={c: DEFAULT_CONFIGS[c] for c in args.configs},
+        protocols=args.protocols,
+        runs=args.runs,
+        n_fixed=args.fixed_nodes,
+        n_mobile=args.mobile_nodes,
+        sim_time=args.sim_time,
+        packets_per_run=args.packets,
+        seed=args.seed,
+        legacy_packet_schema=args.legacy_packet_schema
+    ).generate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+import sys
+import math
+import logging
+import argparse
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from run_analysis import SimulationAnalyzer
+from sweep_index import get_sweep_index
+
+class AdaptiveSeedController:
+    """Controlador de muestreo secuencial de semillas.
+
+    Después de cada lote recalcula el ancho del intervalo de confianza por
+    (configuración, protocolo, métrica) y propone semillas adicionales solo
+    para las celdas que no alcanzan la precisión objetivo, hasta un máximo de
+    corridas intentadas (incluidas las fallidas y las de cuarentena).
+
+    La tolerancia es relativa a la media de la celda, pero nunca menor que
+    `min_scale` veces la mayor media de la métrica en el barrido: una métrica
+    con media cercana a cero en una celda (p. ej. pérdida de paquetes sin
+    ataque) se juzga en la escala de la métrica y no fuerza el máximo.
+    """
+
+    def __init__(self, simulation_dir: str, target: float = 0.05, confidence: float = 0.95,
+                 min_runs: int = 3, max_runs: int = 30, batch: int = 5, metrics: List[str] = None,
+                 min_scale: float = 0.1):
+        self.simulation_dir = Path(simulation_dir)
+        self.target = target
+        self.confidence = confidence
+        self.min_runs = min_runs
+        self.max_runs = max_runs
+        self.batch = batch
+        self.metrics = metrics or ['throughput_promedio', 'delay_promedio', 'pdr', 'perdida_paquetes']
+        self.min_scale = min_scale
+        # Piso de la tolerancia para métricas que valen cero en todo el barrido
+        self.abs_tolerance = 1e-6
+
+    def _run_values(self, metrics_data: Dict, config: str, protocol: str, metric: str) -> np.ndarray:
+        """Valor promedio de la métrica en cada corrida de una celda"""
+        values = []
+        for run_data in metrics_data.get(config, {}).get(protocol, {}).values():
+            if metric in run_data.columns:
+                run_values = run_data[metric].dropna().values
+                if len(run_values) > 0:
+                    values.append(float(np.mean(run_values)))
+        return np.array(values)
+
+    def precision_table(self, metrics_data: Dict, configs: List[str], protocols: List[str]) -> pd.DataFrame:
+        """Calcula el semiancho relativo del IC por celda y métrica, y las corridas estimadas necesarias"""
+        values_by_cell = {(config, protocol, metric): self._run_values(metrics_data, config, protocol, metric)
+                          for config in configs for protocol in protocols for metric in self.metrics}
+        # Escala de cada métrica: la mayor media (en valor absoluto) entre las celdas del barrido
+        scale = {metric: max((abs(float(np.mean(values))) for (_, _, m), values in values_by_cell.items()
+                              if m == metric and len(values) > 0), default=0.0)
+                 for metric in self.metrics}
+        rows = []
+        for config in configs:
+            for protocol in protocols:
+                for metric in self.metrics:
+                    values = values_by_cell[(config, protocol, metric)]
+                    n = len(values)
+                    row = {'config': config, 'protocol': protocol, 'metric': metric, 'n': n,
+                           'mean': np.nan, 'std': np.nan, 'half_width': np.nan,
+                           'relative_half_width': np.nan, 'runs_needed': self.min_runs}
+                    if n >= 2:
+                        mean = float(np.mean(values))
+                        std = float(np.std(values, ddof=1))
+                        t = stats.t.ppf(0.5 + self.confidence / 2, n - 1)
+                        half_width = t * std / math.sqrt(n)
+                        tolerance = max(self.target * max(abs(mean), self.min_scale * scale[metric]),
+                                        self.abs_tolerance)
+                        # n necesario con la varianza observada (aproximación con el t actual)
+                        runs_needed = max(math.ceil((t * std / tolerance) ** 2), self.min_runs)
+                        row.update({'mean': mean, 'std': std, 'half_width': half_width,
+                                    'relative_half_width': half_width / abs(mean) if mean != 0 else np.nan,
+                                    'runs_needed': runs_needed})
+                    row['converged'] = n >= self.min_runs and n >= row['runs_needed']
+                    rows.append(row)
+        return pd.DataFrame(rows)
+
+    def _attempted_runs(self, config: str, protocol: str) -> List[str]:
+        """Corridas intentadas en una celda, incluidas las fallidas y las de cuarentena"""
+        return get_sweep_index(str(self.simulation_dir)).runs(config, protocol, include_quarantined=True)
+
+    def _next_run_number(self, config: str, protocol: str) -> int:
+        """Primer número de corrida libre (no reutiliza corridas fallidas)"""
+        numbers = [0]
+        for run in self._attempted_runs(config, protocol):
+            try:
+                numbers.append(int(run[3:]))
+            except ValueError:
+                continue
+        return max(numbers) + 1
+
+    def plan(self, precision: pd.DataFrame) -> List[Dict]:
+        """Propone el siguiente lote de corridas por celda"""
+        planned = []
+        if precision.empty:
+            return planned
+        for (config, protocol), cell in precision.groupby(['config', 'protocol'], sort=False):
+            if cell['converged'].all():
+                continue
+            # El máximo se cuenta sobre las corridas intentadas: una celda cuyas simulaciones
+            # fallan siempre no llega nunca a max_runs corridas válidas
+            attempted = len(self._attempted_runs(config, protocol))
+            if attempted >= self.max_runs:
+                logging.warning(f"Celda {config}/{protocol} agotada: {attempted} corridas intentadas "
+                                f"(máximo {self.max_runs}) sin alcanzar la precisión objetivo")
+                continue
+            n = int(cell['n'].max())
+            needed = int(cell.loc[~cell['converged'], 'runs_needed'].max())
+            additional = min(max(needed - n, 1), self.batch, self.max_runs - attempted)
+            first = self._next_run_number(config, protocol)
+            for run in range(first, first + additional):
+                planned.append({'config': config, 'protocol': protocol, 'run': run})
+        return planned
+
+    def run(self, report_file: str = None) -> List[Dict]:
+        """Evalúa la convergencia del barrido y devuelve el próximo lote de corridas"""
+        analyzer = SimulationAnalyzer(str(self.simulation_dir))
+        metrics_data = analyzer.load_metrics()
+        precision = self.precision_table(metrics_data, analyzer.index.configs, analyzer.protocols)
+        if report_file:
+            Path(report_file).parent.mkdir(parents=True, exist_ok=True)
+            precision.to_csv(report_file, index=False)
+
+        planned = self.plan(precision)
+        pending = precision[~precision['converged']] if not precision.empty else precision
+        logging.info(f"Celdas/métricas sin converger: {len(pending)} - corridas propuestas: {len(planned)}")
+        return planned
+
+def main():
+    parser = argparse.ArgumentParser(description='Asignación adaptativa de semillas según convergencia de los IC')
+    parser.add_argument('simulation_dir', help='Directorio del barrido en curso')
+    parser.add_argument('--target', type=float, default=0.05,
+                        help='Semiancho relativo objetivo del IC (fracción de la media)')
+    parser.add_argument('--confidence', type=float, default=0.95)
+    parser.add_argument('--min-runs', type=int, default=3)
+    parser.add_argument('--max-runs', type=int, default=30)
+    parser.add_argument('--batch', type=int, default=5, help='Máximo de corridas nuevas por celda y lote')
+    parser.add_argument('--metrics', nargs='+', default=None)
+    parser.add_argument('--min-scale', type=float, default=0.1,
+                        help='Piso de la tolerancia, como fracción de la mayor media de la métrica en el barrido')
+    parser.add_argument('--report', default=None, help='CSV con la precisión alcanzada por celda')
+    args = parser.parse_args()
+
+    # La salida estándar queda reservada para el plan: '<config> <protocolo> <corrida>' por línea
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        handlers=[logging.StreamHandler(sys.stderr)], force=True)
+
+    controller = AdaptiveSeedController(args.simulation_dir, target=args.target, confidence=args.confidence,
+                                        min_runs=args.min_runs, max_runs=args.max_runs,
+                                        batch=args.batch, metrics=args.metrics, min_scale=args.min_scale)
+    for item in controller.run(args.report):
+        print(f"{item['config']} {item['protocol']} {item['run']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import logging
+import argparse
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from sweep_index import get_sweep_index
+from log_io import read_csv, iter_csv_chunks
+
+CUBE_VERSION = 1
+DEFAULT_CUBE_FILE = 'post_processing/results/cube/aggregate_cube.npz'
+NODE_TYPES = ['Fijo', 'Móvil', 'Malicioso', 'Interferente']
+DIMENSIONS = ('config', 'protocol', 'time', 'node_type')
+
+# Medidas aditivas del cubo (sumadas sobre corridas): artefacto de origen y descripción.
+# El tipo de nodo es el del emisor del paquete o del nodo que registra la muestra.
+MEASURES = {
+    'rx_packets': ('packets', 'Paquetes normales recibidos en el sumidero'),
+    'rx_bytes': ('packets', 'Bytes normales recibidos en el sumidero'),
+    'delay_sum': ('packets', 'Suma de delay por paquete (ms)'),
+    'delay_count': ('packets', 'Paquetes con delay registrado'),
+    'rx_malicious_packets': ('packets_malicious', 'Paquetes maliciosos recibidos en el sumidero'),
+    'control_packets': ('control', 'Mensajes de control de enrutamiento transmitidos'),
+    'control_bytes': ('control', 'Bytes de control de enrutamiento transmitidos'),
+    'route_changes': ('routing', 'Cambios de ruta (ADD/DEL/CHG)'),
+    'energy_sum': ('energy', 'Suma de energía restante muestreada (J)'),
+    'energy_count': ('energy', 'Muestras de energía')
+}
+
+# Métricas derivadas que responde query(): medidas que combinan y unidad.
+# 'per_run' divide por corridas; 'rate' además por la duración de la ventana.
+DERIVED = {
+    'packets': ('rx_packets', None, 'per_run', 'packets'),
+    'throughput': ('rx_bytes', None, 'rate', 'Kbps'),
+    'delay': ('delay_sum', 'delay_count', 'ratio', 'ms'),
+    'malicious_packets': ('rx_malicious_packets', None, 'per_run', 'packets'),
+    'control_packets': ('control_packets', None, 'per_run', 'packets'),
+    'control_bytes': ('control_bytes', None, 'per_run', 'bytes'),
+    'routing_load': ('control_packets', 'rx_packets', 'ratio', 'ctrl/pkt'),
+    'route_changes': ('route_changes', None, 'per_run', 'changes'),
+    'energy_remaining': ('energy_sum', 'energy_count', 'ratio', 'J')
+}
+
+# Métricas por corrida de metrics.csv (sin resolución temporal ni por tipo de nodo)
+SUMMARY_METRICS = ['throughput_promedio', 'delay_promedio', 'jitter_promedio', 'perdida_paquetes', 'pdr',
+                   'paquetes_totales', 'paquetes_perdidos', 'numero_flujos', 'tiempo_simulacion']
+
+Selector = Union[None, str, Sequence[str]]
+
+
+class AggregateCube:
+    """Cubo materializado configuración × protocolo × medida × intervalo de tiempo × tipo de nodo.
+
+    Las medidas son aditivas (sumas y conteos sobre todas las corridas de cada
+    celda), así que cualquier corte se resuelve sumando sobre los ejes no
+    pedidos y derivando la métrica al final: una ventana 30–40 s es la suma de
+    sus intervalos, no un promedio de promedios. Se guarda como un .npz con un
+    arreglo denso por medida.
+    """
+
+    def __init__(self, configs: List[str], protocols: List[str], bin_width: float, n_bins: int):
+        self.configs = list(configs)
+        self.protocols = list(protocols)
+        self.node_types = list(NODE_TYPES)
+        self.bin_width = float(bin_width)
+        self.n_bins = int(n_bins)
+        shape = (len(self.configs), len(self.protocols), self.n_bins, len(self.node_types))
+        self.measures = {name: np.zeros(shape) for name in MEASURES}
+        # Corridas por celda y nodos de cada tipo (sumados sobre corridas)
+        self.runs = np.zeros(shape[:2], dtype=np.int64)
+        self.nodes = np.zeros(shape[:2] + (len(self.node_types),), dtype=np.int64)
+        # Suma y suma de cuadrados de las métricas de metrics.csv por celda
+        self.summary_sum = np.zeros(shape[:2] + (len(SUMMARY_METRICS),))
+        self.summary_sumsq = np.zeros_like(self.summary_sum)
+        self.summary_count = np.zeros_like(self.summary_sum, dtype=np.int64)
+        self.source: Optional[str] = None
+
+    @property
+    def bin_edges(self) -> np.ndarray:
+        return np.arange(self.n_bins + 1) * self.bin_width
+
+    def _time_bins(self, times) -> np.ndarray:
+        """Intervalo de cada tiempo de simulación; los tiempos fuera del cubo se recortan al último"""
+        bins = np.floor(np.asarray(times, dtype=float) / self.bin_width).astype(np.int64)
+        return np.clip(bins, 0, self.n_bins - 1)
+
+    def add(self, measure: str, c: int, p: int, times, node_types, values=None):
+        """Acumula valores (o conteos si values es None) en los intervalos y tipos de nodo dados"""
+        flat = self._time_bins(times) * len(self.node_types) + np.asarray(node_types, dtype=np.int64)
+        valid = np.asarray(node_types) >= 0
+        weights = None if values is None else np.asarray(values, dtype=float)[valid]
+        counts = np.bincount(flat[valid], weights=weights, minlength=self.n_bins * len(self.node_types))
+        self.measures[measure][c, p] += counts.reshape(self.n_bins, len(self.node_types))
+
+    def save(self, path: Union[str, Path]):
+        """Guarda el cubo en un .npz comprimido (escritura atómica)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = {'version': CUBE_VERSION, 'configs': self.configs, 'protocols': self.protocols,
+                'node_types': self.node_types, 'bin_width': self.bin_width, 'n_bins': self.n_bins,
+                'summary_metrics': SUMMARY_METRICS, 'source': self.source}
+        arrays = {f'measure_{name}': values for name, values in self.measures.items()}
+        tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+        with open(tmp, 'wb') as f:
+            np.savez_compressed(f, meta=np.array(json.dumps(meta)), runs=self.runs, nodes=self.nodes,
+                                summary_sum=self.summary_sum, summary_sumsq=self.summary_sumsq,
+                                summary_count=self.summary_count, **arrays)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'AggregateCube':
+        """Carga un cubo guardado"""
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            if meta.get('version') != CUBE_VERSION:
+                raise ValueError(f"Versión de cubo no soportada en {path}: {meta.get('version')}")
+            cube = cls(meta['configs'], meta['protocols'], meta['bin_width'], meta['n_bins'])
+            cube.node_types = meta['node_types']
+            cube.source = meta.get('source')
+            cube.measures = {name: data[f'measure_{name}'] for name in MEASURES}
+            cube.runs = data['runs']
+            cube.nodes = data['nodes']
+            cube.summary_sum = data['summary_sum']
+            cube.summary_sumsq = data['summary_sumsq']
+            cube.summary_count = data['summary_count']
+        return cube
+
+    def _select(self, values: Selector, axis_labels: List[str], name: str) -> np.ndarray:
+        if values is None:
+            return np.arange(len(axis_labels))
+        if isinstance(values, str):
+            values = [values]
+        missing = [v for v in values if v not in axis_labels]
+        if missing:
+            raise KeyError(f"{name} desconocido(s): {', '.join(missing)}")
+        return np.array([axis_labels.index(v) for v in values], dtype=np.int64)
+
+    def _time_slice(self, time: Optional[Tuple[float, float]]) -> np.ndarray:
+        """Intervalos contenidos en [desde, hasta); una ventana que no cae en bordes se amplía a ellos"""
+        if time is None:
+            return np.arange(self.n_bins)
+        start, end = time
+        first = max(int(np.floor(start / self.bin_width)), 0)
+        last = min(int(np.ceil(end / self.bin_width)), self.n_bins)
+        if last <= first:
+            raise ValueError(f"Ventana de tiempo vacía: {time}")
+        return np.arange(first, last)
+
+    def query(self, metric: str, config: Selector = None, protocol: Selector = None,
+              time: Tuple[float, float] = None, node_type: Selector = None,
+              by: Iterable[str] = ('config', 'protocol')) -> pd.DataFrame:
+        """Responde una métrica sobre un corte del cubo.
+
+        `config`, `protocol` y `node_type` aceptan un valor o una lista; `time`
+        es una ventana (desde, hasta) en segundos de simulación. `by` indica qué
+        dimensiones se conservan en el resultado; las demás se agregan. Las
+        métricas de metrics.csv (p. ej. 'pdr') solo admiten config y protocolo.
+        """
+        by = list(by)
+        unknown = set(by) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Dimensiones desconocidas: {', '.join(sorted(unknown))}")
+        ci = self._select(config, self.configs, 'Configuración')
+        pi = self._select(protocol, self.protocols, 'Protocolo')
+
+        if metric in SUMMARY_METRICS:
+            if time is not None or node_type is not None or set(by) - {'config', 'protocol'}:
+                raise ValueError(f"{metric} es una métrica por corrida: solo admite cortes por config y protocolo")
+            return self._query_summary(metric, ci, pi, by)
+        if metric not in DERIVED:
+            raise KeyError(f"Métrica desconocida: {metric}")
+
+        ti = self._time_slice(time)
+        ni = self._select(node_type, self.node_types, 'Tipo de nodo')
+        numerator, denominator, kind, unit = DERIVED[metric]
+
+        def reduce(values: np.ndarray) -> np.ndarray:
+            # Conserva los ejes pedidos en `by` (en el orden de DIMENSIONS) y suma el resto
+            values = values[np.ix_(ci, pi, ti, ni)]
+            axes = tuple(i for i, dim in enumerate(DIMENSIONS) if dim not in by)
+            return values.sum(axis=axes)
+
+        num = reduce(self.measures[numerator])
+        kept = [dim for dim in DIMENSIONS if dim in by]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if kind == 'ratio':
+                value = num / reduce(self.measures[denominator])
+            else:
+                runs = self._broadcast_runs(ci, pi, kept)
+                value = num / runs
+                if kind == 'rate':
+                    # Bytes -> Kbps sobre la duración de la ventana (o de cada intervalo si se conserva el tiempo)
+                    duration = self.bin_width if 'time' in by else len(ti) * self.bin_width
+                    value = value * 8.0 / 1000.0 / duration
+
+        labels = {'config': [self.configs[i] for i in ci], 'protocol': [self.protocols[i] for i in pi],
+                  'time': list(self.bin_edges[ti]), 'node_type': [self.node_types[i] for i in ni]}
+        return self._frame(metric, unit, value, kept, labels)
+
+    def _broadcast_runs(self, ci: np.ndarray, pi: np.ndarray, kept: List[str]) -> np.ndarray:
+        """Corridas por celda con la forma del resultado (sumadas si config o protocolo se agregan)"""
+        runs = self.runs[np.ix_(ci, pi)].astype(float)
+        if 'config' not in kept:
+            runs = runs.sum(axis=0, keepdims=True)
+        if 'protocol' not in kept:
+            runs = runs.sum(axis=1, keepdims=True)
+        runs = runs.reshape([runs.shape[0], runs.shape[1]] + [1] * len([d for d in kept if d in ('time', 'node_type')]))
+        squeeze = tuple(i for i, dim in enumerate(('config', 'protocol')) if dim not in kept)
+        return runs.squeeze(axis=squeeze) if squeeze else runs
+
+    def _query_summary(self, metric: str, ci: np.ndarray, pi: np.ndarray, by: List[str]) -> pd.DataFrame:
+        m = SUMMARY_METRICS.index(metric)
+        axes = tuple(i for i, dim in enumerate(('config', 'protocol')) if dim not in by)
+        total = self.summary_sum[np.ix_(ci, pi)][..., m].sum(axis=axes)
+        sumsq = self.summary_sumsq[np.ix_(ci, pi)][..., m].sum(axis=axes)
+        count = self.summary_count[np.ix_(ci, pi)][..., m].sum(axis=axes)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = total / count
+            std = np.sqrt(np.maximum(sumsq / count - mean ** 2, 0.0))
+        kept = [dim for dim in ('config', 'protocol') if dim in by]
+        labels = {'config': [self.configs[i] for i in ci], 'protocol': [self.protocols[i] for i in pi]}
+        df = self._frame(metric, None, mean, kept, labels)
+        df['Std'] = np.ravel(std)
+        df['Corridas'] = np.ravel(count)
+        return df
+
+    def _frame(self, metric: str, unit: Optional[str], value, kept: List[str], labels: Dict) -> pd.DataFrame:
+        """Tabla larga con una fila por combinación de las dimensiones conservadas"""
+        columns = {'config': 'Configuración', 'protocol': 'Protocolo', 'time': 'Tiempo', 'node_type': 'Tipo de nodo'}
+        value = np.asarray(value, dtype=float)
+        if kept:
+            index = pd.MultiIndex.from_product([labels[dim] for dim in kept], names=[columns[d] for d in kept])
+            df = index.to_frame(index=False)
+        else:
+            df = pd.DataFrame(index=[0])
+        df['Métrica'] = metric
+        df['Unidad'] = unit or ''
+        df['Valor'] = value.ravel()
+        return df
+
+
+class CubeBuilder:
+    """Construye el cubo en una pasada por corrida sobre los logs del barrido"""
+
+    def __init__(self, simulation_dir: str, bin_width: float = 1.0, chunksize: int = 200_000):
+        self.simulation_dir = Path(simulation_dir)
+        self.index = get_sweep_index(simulation_dir)
+        self.bin_width = bin_width
+        self.chunksize = chunksize
+        self.artefacts = sorted({'metrics', 'nodes'} | {artefact for artefact, _ in MEASURES.values()})
+
+    def _read(self, config: str, protocol: str, run: str, artefact: str, **kwargs) -> Optional[pd.DataFrame]:
+        path = self.index.artefact_path(config, protocol, run, artefact)
+        if path is None:
+            return None
+        try:
+            return read_csv(path, **kwargs)
+        except pd.errors.EmptyDataError:
+            return None
+
+    def _chunks(self, config: str, protocol: str, run: str, artefact: str, **kwargs):
+        path = self.index.artefact_path(config, protocol, run, artefact)
+        if path is None:
+            return
+        try:
+            yield from iter_csv_chunks(path, chunksize=self.chunksize, **kwargs)
+        except pd.errors.EmptyDataError:
+            return
+
+    def _sim_time(self) -> float:
+        """Duración máxima de las corridas (de metrics.csv), para dimensionar el eje de tiempo"""
+        longest = 0.0
+        for config, protocol, run in self.index.iter_runs():
+            metrics = self._read(config, protocol, run, 'metrics', usecols=['tiempo_simulacion'])
+            if metrics is not None and not metrics.empty:
+                longest = max(longest, float(metrics['tiempo_simulacion'].max()))
+        return longest or 60.0
+
+    def build(self) -> AggregateCube:
+        n_bins = int(np.ceil(self._sim_time() / self.bin_width))
+        cube = AggregateCube(self.index.configs, self.index.protocols, self.bin_width, n_bins)
+        cube.source = self.index.fingerprint(self.artefacts)
+        for config, protocol, run in self.index.iter_runs():
+            c, p = cube.configs.index(config), cube.protocols.index(protocol)
+            try:
+                self._add_run(cube, c, p, config, protocol, run)
+            except Exception as e:
+                logging.error(f"Error al agregar {config}/{protocol}/{run} al cubo: {str(e)}")
+        logging.info(f"Cubo construido: {len(cube.configs)} configuraciones × {len(cube.protocols)} protocolos × "
+                     f"{n_bins} intervalos de {self.bin_width:g} s × {len(cube.node_types)} tipos de nodo, "
+                     f"{int(cube.runs.sum())} corridas")
+        return cube
+
+    def _add_run(self, cube: AggregateCube, c: int, p: int, config: str, protocol: str, run: str):
+        nodes = self._read(config, protocol, run, 'nodes', usecols=['node_id', 'ip_address', 'node_type'])
+        if nodes is None:
+            logging.warning(f"{config}/{protocol}/{run} sin nodes.csv: se omite del cubo")
+            return
+        type_index = nodes['node_type'].map({t: i for i, t in enumerate(cube.node_types)}).fillna(-1).astype(np.int64)
+        by_ip = pd.Series(type_index.values, index=nodes['ip_address'].astype(str))
+        by_id = pd.Series(type_index.values, index=nodes['node_id'].astype(np.int64))
+
+        def types_of(keys: pd.Series, lookup: pd.Series) -> np.ndarray:
+            return keys.map(lookup).fillna(-1).astype(np.int64).values
+
+        cube.runs[c, p] += 1
+        cube.nodes[c, p] += np.bincount(type_index[type_index >= 0], minlength=len(cube.node_types))
+
+        metrics = self._read(config, protocol, run, 'metrics')
+        if metrics is not None and not metrics.empty:
+            row = metrics.iloc[-1]
+            for m, name in enumerate(SUMMARY_METRICS):
+                if name in row.index and pd.notna(row[name]):
+                    value = float(row[name])
+                    cube.summary_sum[c, p, m] += value
+                    cube.summary_sumsq[c, p, m] += value * value
+                    cube.summary_count[c, p, m] += 1
+
+        for chunk in self._chunks(config, protocol, run, 'packets'):
+            types = types_of(chunk['source_ip'].astype(str), by_ip)
+            cube.add('rx_packets', c, p, chunk['sim_time'], types)
+            cube.add('rx_bytes', c, p, chunk['sim_time'], types, chunk['packet_size'])
+            if 'delay_ms' in chunk.columns:
+                has_delay = chunk['delay_ms'].notna().values
+                cube.add('delay_sum', c, p, chunk['sim_time'][has_delay], types[has_delay],
+                         chunk['delay_ms'][has_delay])
+                cube.add('delay_count', c, p, chunk['sim_time'][has_delay], types[has_delay])
+
+        for chunk in self._chunks(config, protocol, run, 'packets_malicious', usecols=['source_ip', 'sim_time']):
+            cube.add('rx_malicious_packets', c, p, chunk['sim_time'], types_of(chunk['source_ip'].astype(str), by_ip))
+
+        for chunk in self._chunks(config, protocol, run, 'control', usecols=['timestamp', 'node_id', 'size']):
+            types = types_of(chunk['node_id'].astype(np.int64), by_id)
+            cube.add('control_packets', c, p, chunk['timestamp'], types)
+            cube.add('control_bytes', c, p, chunk['timestamp'], types, chunk['size'])
+
+        routing = self.index.artefact_path(config, protocol, run, 'routing')
+        if routing is not None:
+            # Solo los logs con columna change tienen cambios reales (los anteriores son filas de relleno)
+            try:
+                has_changes = 'change' in read_csv(routing, nrows=0).columns
+            except pd.errors.EmptyDataError:
+                has_changes = False
+            if has_changes:
+                for chunk in self._chunks(config, protocol, run, 'routing', usecols=['timestamp', 'node_id']):
+                    cube.add('route_changes', c, p, chunk['timestamp'], types_of(chunk['node_id'].astype(np.int64), by_id))
+
+        for chunk in self._chunks(config, protocol, run, 'energy'):
+            types = types_of(chunk['node_id'].astype(np.int64), by_id)
+            cube.add('energy_sum', c, p, chunk['time'], types, chunk['energy_remaining'])
+            cube.add('energy_count', c, p, chunk['time'], types)
+
+
+def build_cube(simulation_dir: str, output: str = DEFAULT_CUBE_FILE, bin_width: float = 1.0,
+               refresh: bool = False) -> AggregateCube:
+    """Construye y guarda el cubo; reutiliza el guardado si los logs del barrido no cambiaron"""
+    builder = CubeBuilder(simulation_dir, bin_width)
+    output = Path(output)
+    if not refresh and output.exists():
+        try:
+            cube = AggregateCube.load(output)
+            if cube.source == builder.index.fingerprint(builder.artefacts) and cube.bin_width == bin_width:
+                logging.info(f"Cubo vigente reutilizado desde {output}")
+                return cube
+        except Exception as e:
+            logging.warning(f"Cubo inválido en {output}, se reconstruye: {str(e)}")
+    cube = builder.build()
+    cube.save(output)
+    logging.info(f"Cubo guardado en {output}")
+    return cube
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cubo de agregados del barrido y consultas sobre él')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help='Construye el cubo desde los logs del barrido')
+    build.add_argument('simulation_dir')
+    build.add_argument('--output', default=DEFAULT_CUBE_FILE)
+    build.add_argument('--bin', type=float, default=1.0, help='Ancho de los intervalos de tiempo (s)')
+    build.add_argument('--refresh', action='store_true', help='Reconstruye aunque el cubo esté vigente')
+
+    query = subparsers.add_parser('query', help='Consulta una métrica sobre un corte del cubo')
+    query.add_argument('metric', choices=list(DERIVED) + SUMMARY_METRICS)
+    query.add_argument('--cube', default=DEFAULT_CUBE_FILE)
+    query.add_argument('--config', nargs='+')
+    query.add_argument('--protocol', nargs='+')
+    query.add_argument('--time', nargs=2, type=float, metavar=('DESDE', 'HASTA'))
+    query.add_argument('--node-type', nargs='+', choices=NODE_TYPES)
+    query.add_argument('--by', nargs='*', default=['config', 'protocol'], choices=list(DIMENSIONS))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    try:
+        if args.command == 'build':
+            build_cube(args.simulation_dir, args.output, args.bin, args.refresh)
+            return
+        cube = AggregateCube.load(args.cube)
+        result = cube.query(args.metric, args.config, args.protocol,
+                            tuple(args.time) if args.time else None, args.node_type, args.by)
+        print(result.to_string(index=False))
+    except Exception as e:
+        logging.error(f"Error fatal: {str(e)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import hashlib
+import logging
+import argparse
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from aggregate_cube import AggregateCube, SUMMARY_METRICS, build_cube
+from output_tree import DEFAULT_RESULTS_DIR
+
+# Cubo de cada barrido, guardado junto a sus logs para que dos barridos no compartan archivo
+SWEEP_CUBE_FILE = '.aggregate_cube.npz'
+DEFAULT_COMPARE_DIR = 'post_processing/results/compare'
+
+# Métricas por corrida que se comparan (tiempo_simulacion y numero_flujos son parámetros del escenario)
+COMPARE_METRICS = ['throughput_promedio', 'delay_promedio', 'jitter_promedio', 'perdida_paquetes', 'pdr',
+                   'paquetes_totales', 'paquetes_perdidos']
+
+
+def sweep_cube_file(simulation_dir: str, results_dir: Optional[str] = None) -> Path:
+    """Ubicación del cubo de un barrido: junto a sus logs o, si no es escribible, en la raíz de resultados"""
+    sweep = Path(simulation_dir).resolve()
+    if os.access(sweep, os.W_OK):
+        return sweep / SWEEP_CUBE_FILE
+    # Barrido de solo lectura o compartido: un archivo por barrido (nombre y hash de su ruta)
+    digest = hashlib.sha1(str(sweep).encode()).hexdigest()[:10]
+    return Path(results_dir or DEFAULT_RESULTS_DIR) / 'cube' / f'{sweep.name}_{digest}.npz'
+
+
+def sweep_cube(simulation_dir: str, refresh: bool = False, results_dir: Optional[str] = None) -> AggregateCube:
+    """Cubo de agregados de un barrido; se reconstruye solo si cambiaron sus logs"""
+    cube_file = sweep_cube_file(simulation_dir, results_dir)
+    if cube_file.parent != Path(simulation_dir).resolve():
+        logging.info(f"{simulation_dir} no es escribible: el cubo se guarda en {cube_file}")
+    return build_cube(simulation_dir, str(cube_file), refresh=refresh)
+
+
+def cell_moments(cube: AggregateCube, metric: str) -> pd.DataFrame:
+    """Media, desviación muestral y corridas por (configuración, protocolo) desde el cubo"""
+    m = SUMMARY_METRICS.index(metric)
+    total = cube.summary_sum[..., m]
+    sumsq = cube.summary_sumsq[..., m]
+    count = cube.summary_count[..., m]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / count
+        var = np.maximum(sumsq - count * mean ** 2, 0.0) / (count - 1)
+    rows = []
+    for c, config in enumerate(cube.configs):
+        for p, protocol in enumerate(cube.protocols):
+            if count[c, p] > 0:
+                rows.append({'config': config, 'protocol': protocol, 'n': int(count[c, p]),
+                             'mean': mean[c, p], 'std': np.sqrt(var[c, p]) if count[c, p] > 1 else np.nan})
+    return pd.DataFrame(rows, columns=['config', 'protocol', 'n', 'mean', 'std'])
+
+
+def hedges_g(mean_a, std_a, n_a, mean_b, std_b, n_b):
+    """Tamaño del efecto de B respecto de A con corrección de sesgo para muestras pequeñas"""
+    dof = n_a + n_b - 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pooled = np.sqrt(((n_a - 1) * std_a ** 2 + (n_b - 1) * std_b ** 2) / dof)
+        d = (mean_b - mean_a) / pooled
+    correction = 1.0 - 3.0 / (4.0 * (n_a + n_b) - 9.0)
+    # Sin variabilidad en ninguno de los dos barridos: efecto nulo si las medias coinciden
+    return np.where((pooled == 0) & (mean_a == mean_b), 0.0, d * correction)
+
+
+def benjamini_hochberg(p_values: np.ndarray) -> np.ndarray:
+    """Valores q (tasa de falsos descubrimientos) para una familia de pruebas; ignora NaN"""
+    q = np.full(len(p_values), np.nan)
+    valid = np.flatnonzero(~np.isnan(p_values))
+    if len(valid) == 0:
+        return q
+    order = valid[np.argsort(p_values[valid])]
+    ranked = p_values[order] * len(valid) / np.arange(1, len(valid) + 1)
+    q[order] = np.minimum(np.minimum.accumulate(ranked[::-1])[::-1], 1.0)
+    return q
+
+
+def compare_cubes(cube_a: AggregateCube, cube_b: AggregateCube, metrics: List[str] = None,
+                  alpha: float = 0.05) -> pd.DataFrame:
+    """Diferencias por (configuración, protocolo, métrica) entre dos barridos.
+
+    Usa la prueba t de Welch sobre las medias por corrida, Hedges' g como tamaño
+    del efecto y Benjamini-Hochberg sobre todas las celdas comparadas. Solo se
+    comparan las celdas con corridas en ambos barridos.
+    """
+    frames = []
+    for metric in metrics or COMPARE_METRICS:
+        merged = cell_moments(cube_a, metric).merge(cell_moments(cube_b, metric),
+                                                    on=['config', 'protocol'], suffixes=('_a', '_b'))
+        if merged.empty:
+            continue
+        merged.insert(2, 'metric', metric)
+        frames.append(merged)
+    if not frames:
+        raise ValueError("Los barridos no tienen celdas (configuración, protocolo) en común")
+    df = pd.concat(frames, ignore_index=True)
+
+    mean_a, std_a, n_a = df['mean_a'].to_numpy(), df['std_a'].to_numpy(), df['n_a'].to_numpy()
+    mean_b, std_b, n_b = df['mean_b'].to_numpy(), df['std_b'].to_numpy(), df['n_b'].to_numpy()
+    df['delta'] = mean_b - mean_a
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df['delta_pct'] = np.where(mean_a != 0, 100.0 * df['delta'] / np.abs(mean_a), np.nan)
+        _, p_value = stats.ttest_ind_from_stats(mean_a, std_a, n_a, mean_b, std_b, n_b, equal_var=False)
+    # Sin variabilidad en ninguno de los dos barridos la prueba no está definida
+    p_value = np.where((std_a == 0) & (std_b == 0), np.where(mean_a == mean_b, 1.0, 0.0), p_value)
+    df['hedges_g'] = hedges_g(mean_a, std_a, n_a, mean_b, std_b, n_b)
+    df['p_value'] = p_value
+    df['q_value'] = benjamini_hochberg(np.asarray(p_value, dtype=float))
+    df['significant'] = df['q_value'] < alpha
+
+    df = df.assign(_rank=df['hedges_g'].abs().fillna(-1.0))
+    df = df.sort_values(['significant', '_rank'], ascending=False).drop(columns='_rank')
+    return df.reset_index(drop=True)
+
+
+def _default_output(sweep_a: str, sweep_b: str, results_dir: Optional[str] = None) -> Path:
+    compare_dir = Path(results_dir) / 'compare' if results_dir else Path(DEFAULT_COMPARE_DIR)
+    return compare_dir / f'{Path(sweep_a).resolve().name}_vs_{Path(sweep_b).resolve().name}'
+
+
+def plot_ranking(diff: pd.DataFrame, output_file: Path, top: int = 25):
+    """Gráfico de barras horizontales de las celdas con mayor |Hedges' g|"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    ranked = diff.dropna(subset=['hedges_g'])
+    ranked = ranked.reindex(ranked['hedges_g'].abs().sort_values(ascending=False).index).head(top)
+    if ranked.empty:
+        logging.warning("No hay celdas con tamaño de efecto para graficar")
+        return
+    ranked = ranked.iloc[::-1]
+    labels = ranked['config'] + ' / ' + ranked['protocol'] + ' / ' + ranked['metric']
+    colors = np.where(ranked['significant'], '#c0392b', '#95a5a6')
+
+    fig, ax = plt.subplots(figsize=(10, max(3.0, 0.35 * len(ranked) + 1.0)))
+    ax.barh(labels, ranked['hedges_g'], color=colors)
+    ax.axvline(0.0, color='black', linewidth=0.8)
+    ax.set_xlabel("Hedges' g (B - A)")
+    ax.set_title('Celdas con mayor cambio (rojo: significativas tras Benjamini-Hochberg)')
+    plt.tight_layout()
+    plt.savefig(output_file)
+    plt.close(fig)
+
+
+def compare_scenarios(sweep_a: str, sweep_b: str, output_dir: Optional[str] = None, alpha: float = 0.05,
+                      top: int = 25, refresh: bool = False, generate_plots: bool = True,
+                      results_dir: Optional[str] = None) -> pd.DataFrame:
+    """Compara dos barridos y escribe la tabla de diferencias y el gráfico en su propio directorio"""
+    cube_a = sweep_cube(sweep_a, refresh, results_dir)
+    cube_b = sweep_cube(sweep_b, refresh, results_dir)
+    diff = compare_cubes(cube_a, cube_b, alpha=alpha)
+
+    output = Path(output_dir) if output_dir else _default_output(sweep_a, sweep_b, results_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    table = diff.round({'mean_a': 4, 'std_a': 4, 'mean_b': 4, 'std_b': 4, 'delta': 4, 'delta_pct': 2,
+                        'hedges_g': 3, 'p_value': 5, 'q_value': 5})
+    table.to_csv(output / 'comparison.csv', index=False)
+    if generate_plots:
+        plot_ranking(diff, output / 'comparison_ranked.png', top)
+
+    significant = int(diff['significant'].sum())
+    logging.info(f"Comparación A={sweep_a} B={sweep_b}: {significant} de {len(diff)} celdas "
+                 f"con cambio significativo (q < {alpha}); resultados en {output}")
+    return diff
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara dos barridos por (configuración, protocolo, métrica)')
+    parser.add_argument('sweep_a', help='Barrido de referencia (A)')
+    parser.add_argument('sweep_b', help='Barrido comparado (B)')
+    parser.add_argument('--output', default=None, help=f'Por defecto {DEFAULT_COMPARE_DIR}/<A>_vs_<B>')
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--top', type=int, default=25, help='Celdas en el gráfico')
+    parser.add_argument('--refresh', action='store_true', help='Reconstruye los cubos de ambos barridos')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    try:
+        compare_scenarios(args.sweep_a, args.sweep_b, args.output, args.alpha, args.top, args.refresh)
+    except Exception as e:
+        logging.error(f"Error fatal: {str(e)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
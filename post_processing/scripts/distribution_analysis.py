@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+import pandas as pd
+from pathlib import Path
+import json
+import logging
+from typing import Dict
+
+from sketches import QuantileSketch, save_sketches, load_sketches
+from sweep_index import get_sweep_index, KNOWN_CONFIGS, KNOWN_PROTOCOLS
+from log_io import resolve_log, iter_csv_chunks
+from output_writer import get_writer
+from output_tree import DEFAULT_RESULTS_DIR
+
+class DistributionAnalyzer:
+    def __init__(self, simulation_dir: str, results_dir: str = None):
+        self.simulation_dir = Path(simulation_dir)
+        self.results_dir = Path(results_dir or DEFAULT_RESULTS_DIR)
+        self.writer = get_writer()
+        self.index = get_sweep_index(simulation_dir)
+        self.configs = self.index.configs or list(KNOWN_CONFIGS)
+        self.protocols = self.index.protocols or list(KNOWN_PROTOCOLS)
+        self.distributions = {
+            'delay': 'ms',
+            'inter_arrival': 'ms'
+        }
+        self.quantiles = [0.5, 0.95, 0.99]
+        self.chunksize = 100_000
+
+    def build_run_sketches(self, run_dir: Path) -> Dict[str, QuantileSketch]:
+        """Construye los sketches de una corrida en una sola pasada sobre el log de paquetes"""
+        sketches = {name: QuantileSketch() for name in self.distributions}
+        # El log puede estar en texto plano o comprimido (.csv.zst / .csv.gz)
+        packet_log = resolve_log(run_dir / 'packet_logs' / 'packets_normal.csv')
+        if packet_log is None:
+            return sketches
+
+        # Último tiempo de llegada por origen, para enlazar bloques consecutivos
+        last_seen = pd.Series(dtype=float)
+        has_delay = None
+        for chunk in iter_csv_chunks(packet_log, chunksize=self.chunksize):
+            if has_delay is None:
+                has_delay = 'delay_ms' in chunk.columns
+                if not has_delay:
+                    logging.debug(f"{packet_log} no tiene columna delay_ms, se omite la distribución de delay")
+            if chunk.empty:
+                continue
+
+            if has_delay:
+                sketches['delay'].update_many(chunk['delay_ms'].values)
+
+            sources = chunk['source_ip']
+            times = chunk['sim_time'].astype(float)
+            gaps = times.groupby(sources).diff()
+            first = gaps.isna()
+            gaps[first] = times[first] - sources[first].map(last_seen)
+            sketches['inter_arrival'].update_many(gaps.values * 1000.0)
+
+            last_seen = times.groupby(sources).last().combine_first(last_seen)
+
+        return sketches
+
+    def _sketch_path(self, config: str, protocol: str, run_name: str) -> Path:
+        """Ruta del archivo de sketches serializados de una corrida"""
+        return self.results_dir / 'sketches' / config / protocol / f'{run_name}.json'
+
+    def load_run_sketches(self, config: str, protocol: str, run_dir: Path) -> Dict[str, QuantileSketch]:
+        """Devuelve los sketches de una corrida, reutilizando los serializados si siguen vigentes"""
+        # Tamaño y mtime del log de paquetes según el índice del barrido
+        entry = self.index.artefact(config, protocol, run_dir.name, 'packets')
+        source = {'size': entry['size'], 'mtime': entry['mtime']} if entry else None
+
+        sketch_file = self._sketch_path(config, protocol, run_dir.name)
+        if sketch_file.exists():
+            try:
+                with open(sketch_file) as f:
+                    cached_source = json.load(f).get('source')
+                if cached_source == source:
+                    return load_sketches(sketch_file)
+            except Exception as e:
+                logging.warning(f"Sketch inválido en {sketch_file}, se recalcula: {str(e)}")
+
+        sketches = self.build_run_sketches(run_dir)
+        save_sketches(sketches, sketch_file, extra={'source': source})
+        return sketches
+
+    def collect_sketches(self) -> Dict:
+        """Combina los sketches de todas las corridas por (configuración, protocolo)"""
+        merged = {}
+        for config in self.configs:
+            merged[config] = {}
+            for protocol in self.protocols:
+                cell = {name: QuantileSketch() for name in self.distributions}
+                for run in self.index.runs(config, protocol):
+                    run_dir = self.index.run_dir(config, protocol, run)
+                    try:
+                        run_sketches = self.load_run_sketches(config, protocol, run_dir)
+                    except Exception as e:
+                        logging.error(f"Error al procesar paquetes de {run_dir}: {str(e)}")
+                        continue
+                    for name, sketch in run_sketches.items():
+                        cell[name].merge(sketch)
+                merged[config][protocol] = cell
+        return merged
+
+    def generate_quantile_table(self, sketches: Dict) -> pd.DataFrame:
+        """Genera la tabla de cuantiles a partir de los sketches combinados"""
+        rows = []
+        for config in self.configs:
+            for protocol in self.protocols:
+                cell = sketches.get(config, {}).get(protocol, {})
+                for name, unit in self.distributions.items():
+                    sketch = cell.get(name)
+                    if sketch is None or sketch.n == 0:
+                        continue
+                    values = sketch.quantiles(self.quantiles)
+                    row = {
+                        'Configuración': config,
+                        'Protocolo': protocol,
+                        'Métrica': name,
+                        'Unidad': unit,
+                        'Muestras': sketch.n,
+                        'Min': sketch.min
+                    }
+                    for q, value in zip(self.quantiles, values):
+                        row[f'p{int(round(q * 100))}'] = value
+                    row['Max'] = sketch.max
+                    rows.append(row)
+        return pd.DataFrame(rows)
+
+    def run_analysis(self, sketches: Dict = None) -> pd.DataFrame:
+        """Ejecuta el análisis de distribuciones de delay y tiempos entre llegadas"""
+        logging.info("Iniciando análisis de distribuciones...")
+        tables_dir = self.results_dir / 'tables'
+        tables_dir.mkdir(parents=True, exist_ok=True)
+
+        if sketches is None:
+            sketches = self.collect_sketches()
+        table = self.generate_quantile_table(sketches)
+        if table.empty:
+            logging.warning("No se encontraron datos de paquetes para las distribuciones")
+        else:
+            self.writer.write_csv(table, tables_dir / 'distribution_quantiles.csv', index=False)
+
+        logging.info("Análisis de distribuciones completado")
+        return table
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 2:
+        print("Uso: python distribution_analysis.py <directorio_simulacion>")
+        sys.exit(1)
+
+    analyzer = DistributionAnalyzer(sys.argv[1])
+    analyzer.run_analysis()
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import json
+import logging
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from sweep_index import get_sweep_index, QUARANTINE_FILE
+from log_io import read_csv
+
+QUARANTINE_VERSION = 1
+
+# Esquema de cada artefacto: columnas obligatorias, opcionales (versiones del simulador) y columna de tiempo
+SCHEMAS = {
+    'metrics': {'required': ['timestamp', 'protocolo', 'nodos_fijos', 'nodos_moviles', 'nodos_maliciosos',
+                             'nodos_interferentes', 'throughput_promedio', 'throughput_maximo', 'delay_promedio',
+                             'delay_maximo', 'delay_minimo', 'jitter_promedio', 'perdida_paquetes', 'pdr',
+                             'paquetes_totales', 'paquetes_perdidos', 'numero_flujos', 'tiempo_simulacion']},
+    'node_metrics': {'required': ['node_id', 'throughput_avg', 'delay_avg', 'jitter_avg', 'energy_consumed']},
+    'node_timeseries': {'required': ['time', 'node_id', 'tx_packets', 'tx_bytes', 'rx_packets', 'rx_bytes',
+                                     'lost_packets', 'throughput_kbps', 'delay_ms', 'jitter_ms'], 'time': 'time'},
+    'nodes': {'required': ['node_id', 'ip_address', 'node_type']},
+    'packets': {'required': ['timestamp', 'source_ip', 'port', 'traffic_type', 'packet_size', 'sim_time'],
+                'optional': ['delay_ms'], 'time': 'sim_time'},
+    'packets_malicious': {'required': ['timestamp', 'source_ip', 'port', 'traffic_type', 'packet_size', 'sim_time'],
+                          'optional': ['delay_ms'], 'time': 'sim_time'},
+    'routing': {'required': ['timestamp', 'node_id', 'protocol', 'destination', 'next_hop', 'metric'],
+                'optional': ['change'], 'time': 'timestamp'},
+    'control': {'required': ['timestamp', 'node_id', 'protocol', 'msg_type', 'size'], 'time': 'timestamp'},
+    'positions': {'required': ['time', 'node_id', 'x', 'y', 'z'], 'time': 'time'},
+    'energy': {'required': ['time', 'node_id', 'energy_remaining'], 'time': 'time'}
+}
+# Sin estos artefactos la corrida no se puede analizar
+REQUIRED_ARTEFACTS = ['metadata', 'metrics', 'nodes']
+# Logs que el simulador escribe siempre; vacíos indican un fallo del logger, no falta de tráfico
+EXPECTED_NONEMPTY = ['positions', 'energy', 'routing']
+
+ERROR = 'error'
+WARNING = 'warning'
+
+
+def parse_metadata(path) -> Dict[str, float]:
+    """Lee metadata.txt: tiempo de simulación, cantidad de nodos por tipo, semilla y hora de inicio (epoch)"""
+    fields = {'Tiempo de Simulación': 'sim_time', 'Nodos Fijos': 'fixed', 'Nodos Móviles': 'mobile',
+              'Nodos Maliciosos': 'malicious', 'Nodos Interferentes': 'interfering', 'Semilla Aleatoria': 'seed'}
+    metadata = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key.strip() == 'Timestamp':
+                try:
+                    metadata['started'] = datetime.strptime(value.strip(), '%Y-%m-%d %H:%M:%S').timestamp()
+                except ValueError:
+                    pass
+            elif key.strip() in fields:
+                match = re.search(r'-?\d+(\.\d+)?', value)
+                if match:
+                    metadata[fields[key.strip()]] = float(match.group())
+    return metadata
+
+
+def _check_artefact(path: Path, name: str) -> Tuple[List[Tuple[str, str]], Optional[pd.Series], int, List[str]]:
+    """Verifica esquema, encabezados repetidos y tiempo monótono de un log.
+
+    Devuelve (problemas, columna de tiempo, filas de datos, encabezado).
+    """
+    schema = SCHEMAS[name]
+    issues = []
+    try:
+        header = list(read_csv(path, nrows=0).columns)
+    except pd.errors.EmptyDataError:
+        return [(WARNING if name in EXPECTED_NONEMPTY else ERROR, 'archivo vacío (sin encabezado)')], None, 0, []
+
+    missing = [c for c in schema['required'] if c not in header]
+    if missing:
+        return [(ERROR, f"faltan columnas: {', '.join(missing)}")], None, 0, header
+    extra = [c for c in header if c not in schema['required'] + schema.get('optional', [])]
+    if extra:
+        issues.append((WARNING, f"columnas desconocidas: {', '.join(extra)}"))
+
+    time_col = schema.get('time')
+    first_col = header[0]
+    columns = [first_col] + ([time_col] if time_col and time_col != first_col else [])
+    values = read_csv(path, usecols=columns, dtype=str, keep_default_na=False)
+    rows = len(values)
+
+    # Un encabezado en medio del archivo: el logger escribió dos veces sobre una salida reutilizada
+    repeated = values[first_col] == first_col
+    if repeated.any():
+        issues.append((ERROR, f"encabezado repetido {int(repeated.sum())} veces (salida reutilizada)"))
+        values = values[~repeated]
+        rows = len(values)
+
+    times = None
+    if time_col:
+        times = pd.to_numeric(values[time_col], errors='coerce')
+        bad = int(times.isna().sum())
+        if bad:
+            issues.append((ERROR, f"{bad} valores no numéricos en {time_col}"))
+            times = times.dropna()
+        backwards = int((np.diff(times.values) < 0).sum())
+        if backwards:
+            issues.append((ERROR, f"{time_col} no monótono ({backwards} retrocesos)"))
+    return issues, times, rows, header
+
+
+def check_run(run_dir: str, artefacts: Dict[str, str]) -> List[Dict]:
+    """Verifica todos los artefactos de una corrida; devuelve una lista de problemas"""
+    run_dir = Path(run_dir)
+    issues = []
+
+    def report(artefact: str, severity: str, message: str):
+        issues.append({'artefact': artefact, 'severity': severity, 'message': message})
+
+    for name in REQUIRED_ARTEFACTS:
+        if name not in artefacts:
+            report(name, ERROR, 'falta el artefacto')
+    metadata = {}
+    if 'metadata' in artefacts:
+        try:
+            metadata = parse_metadata(run_dir / artefacts['metadata'])
+        except (OSError, UnicodeDecodeError) as e:
+            report('metadata', ERROR, f'no se pudo leer: {str(e)}')
+        for field in ('sim_time', 'fixed', 'mobile'):
+            if 'metadata' in artefacts and field not in metadata:
+                report('metadata', ERROR, f'falta el campo {field}')
+
+    # Muestreos cada 1 s desde t=1 hasta el final: simTime - 1 instantes
+    ticks = int(metadata['sim_time']) - 1 if 'sim_time' in metadata else None
+    n_nodes = int(sum(metadata.get(k, 0) for k in ('fixed', 'mobile', 'malicious', 'interfering')))
+    n_mobile = int(metadata.get('mobile', 0))
+
+    for name, relative in sorted(artefacts.items()):
+        if name not in SCHEMAS:
+            continue
+        try:
+            found, times, rows, header = _check_artefact(run_dir / relative, name)
+        except Exception as e:
+            report(name, ERROR, f'no se pudo leer: {str(e)}')
+            continue
+        for severity, message in found:
+            report(name, severity, message)
+        if not header or any(severity == ERROR for severity, _ in found) and times is None:
+            continue
+        # Con el formato de diferencias un log de rutas sin filas es válido (DSR, red estable)
+        legacy_routing = name == 'routing' and 'change' not in header
+
+        if name == 'metrics' and rows != 1:
+            report(name, ERROR, f'{rows} filas de resumen (se esperaba 1)')
+        elif name == 'nodes' and n_nodes and rows != n_nodes:
+            report(name, ERROR, f'{rows} nodos (metadata indica {n_nodes})')
+        elif name == 'node_metrics' and n_nodes and rows != n_nodes:
+            report(name, WARNING, f'{rows} filas (metadata indica {n_nodes} nodos)')
+        elif name in EXPECTED_NONEMPTY and rows == 0 and (name != 'routing' or legacy_routing):
+            report(name, WARNING, 'sin filas de datos')
+        elif ticks is not None and times is not None and len(times):
+            if times.max() > metadata['sim_time']:
+                report(name, ERROR, f'tiempo {times.max():g} mayor que la simulación ({metadata["sim_time"]:g} s)')
+            # Cantidad esperada de filas de los logs muestreados cada segundo
+            expected = None
+            if name == 'positions':
+                expected, per_tick = ticks * n_mobile, n_mobile
+            elif name in ('energy', 'node_timeseries') or legacy_routing:
+                # Energía: solo nodos con fuente; serie por nodo: solo nodos con tráfico;
+                # rutas de relleno: un registro por nodo. Cota superior
+                expected, per_tick = ticks * n_nodes, n_nodes
+            if expected is not None:
+                if rows > expected + per_tick:
+                    report(name, ERROR, f'{rows} filas, más de las {expected} esperadas (datos duplicados)')
+                elif name == 'positions' and rows < expected - per_tick:
+                    report(name, WARNING, f'{rows} filas, menos de las {expected} esperadas (log truncado)')
+    return issues
+
+
+def _run_fingerprint(index, config: str, protocol: str, run: str) -> str:
+    artefacts = index.tree[config][protocol][run]
+    return ';'.join(f"{name}:{e['path']}:{e['size']}:{e['mtime']}" for name, e in sorted(artefacts.items()))
+
+
+def _check_worker(args):
+    key, run_dir, artefacts = args
+    return key, check_run(run_dir, artefacts)
+
+
+def scan_sweep(simulation_dir: str, workers: int = 4, strict: bool = False,
+               refresh: bool = False) -> Dict[str, List[Dict]]:
+    """Verifica todas las corridas y actualiza la cuarentena del barrido.
+
+    Las corridas con errores (o también con advertencias si strict) se
+    registran en `.quarantine.json`, que el índice usa para ocultarlas a todas
+    las etapas. Solo se vuelven a verificar las corridas cuyos artefactos
+    cambiaron desde la última verificación.
+    """
+    index = get_sweep_index(simulation_dir)
+    quarantine_file = Path(simulation_dir) / QUARANTINE_FILE
+    previous = {}
+    if not refresh:
+        try:
+            with open(quarantine_file) as f:
+                payload = json.load(f)
+            if payload.get('version') == QUARANTINE_VERSION:
+                previous = payload.get('checks', {})
+        except (OSError, ValueError):
+            pass
+
+    checks, jobs = {}, []
+    for config, protocol, run in index.iter_runs(include_quarantined=True):
+        key = f'{config}/{protocol}/{run}'
+        fingerprint = _run_fingerprint(index, config, protocol, run)
+        if previous.get(key, {}).get('fingerprint') == fingerprint:
+            checks[key] = previous[key]
+            continue
+        checks[key] = {'fingerprint': fingerprint, 'issues': []}
+        artefacts = {name: entry['path'] for name, entry in index.tree[config][protocol][run].items()}
+        jobs.append((key, str(index.run_dir(config, protocol, run)), artefacts))
+
+    if jobs:
+        logging.info(f"Verificando integridad de {len(jobs)} corridas ({len(checks) - len(jobs)} sin cambios)...")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_check_worker, job) for job in jobs]
+            for future in as_completed(futures):
+                key, issues = future.result()
+                checks[key]['issues'] = issues
+
+    blocking = {ERROR, WARNING} if strict else {ERROR}
+    quarantine = {}
+    for key, check in checks.items():
+        reasons = [f"{i['artefact']}: {i['message']}" for i in check['issues'] if i['severity'] in blocking]
+        if reasons:
+            quarantine[key] = reasons
+        for issue in check['issues']:
+            level = logging.ERROR if issue['severity'] in blocking else logging.DEBUG
+            logging.log(level, f"{key} {issue['artefact']}: {issue['message']}")
+
+    payload = {'version': QUARANTINE_VERSION, 'strict': strict, 'runs': quarantine, 'checks': checks}
+    tmp_file = quarantine_file.with_name(f'{QUARANTINE_FILE}.{os.getpid()}.tmp')
+    try:
+        with open(tmp_file, 'w') as f:
+            json.dump(payload, f, indent=1, ensure_ascii=False)
+        os.replace(tmp_file, quarantine_file)
+    except OSError as e:
+        # Barrido de solo lectura o compartido: la cuarentena vale solo para este proceso
+        logging.warning(f"No se pudo guardar la cuarentena en {quarantine_file} ({str(e)}); "
+                        f"se aplica solo en memoria")
+        try:
+            tmp_file.unlink()
+        except OSError:
+            pass
+    index.quarantine = quarantine
+
+    warnings = sum(1 for c in checks.values() for i in c['issues'] if i['severity'] == WARNING)
+    logging.info(f"Integridad: {len(checks)} corridas verificadas, {len(quarantine)} en cuarentena, "
+                 f"{warnings} advertencias")
+    return {key: check['issues'] for key, check in checks.items()}
+
+
+def issues_table(results: Dict[str, List[Dict]]) -> pd.DataFrame:
+    """Problemas encontrados como tabla (config, protocolo, corrida, artefacto, severidad, mensaje)"""
+    rows = []
+    for key, issues in results.items():
+        config, protocol, run = key.split('/')
+        rows.extend({'config': config, 'protocol': protocol, 'run': run, **issue} for issue in issues)
+    return pd.DataFrame(rows, columns=['config', 'protocol', 'run', 'artefact', 'severity', 'message'])
+
+
+def compare_sweeps(primary: str, copy: str) -> pd.DataFrame:
+    """Diferencias entre un barrido y una copia (corridas o artefactos faltantes o con otro tamaño)"""
+    a, b = get_sweep_index(primary), get_sweep_index(copy)
+    keys = set(a.iter_runs(include_quarantined=True)) | set(b.iter_runs(include_quarantined=True))
+    rows = []
+    for config, protocol, run in sorted(keys):
+        left = a.tree.get(config, {}).get(protocol, {}).get(run)
+        right = b.tree.get(config, {}).get(protocol, {}).get(run)
+        if left is None or right is None:
+            rows.append({'config': config, 'protocol': protocol, 'run': run, 'artefact': '*',
+                         'difference': 'falta en la copia' if right is None else 'falta en el original'})
+            continue
+        for name in sorted(set(left) | set(right)):
+            l, r = left.get(name), right.get(name)
+            if l is None or r is None:
+                difference = 'falta en la copia' if r is None else 'falta en el original'
+            elif l['size'] != r['size']:
+                difference = f"tamaño {l['size']} != {r['size']}"
+            else:
+                continue
+            rows.append({'config': config, 'protocol': protocol, 'run': run, 'artefact': name,
+                         'difference': difference})
+    return pd.DataFrame(rows, columns=['config', 'protocol', 'run', 'artefact', 'difference'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verifica la integridad de los artefactos de cada corrida')
+    parser.add_argument('simulation_dir')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--strict', action='store_true', help='También pone en cuarentena las corridas con advertencias')
+    parser.add_argument('--refresh', action='store_true', help='Verifica todas las corridas, aunque no hayan cambiado')
+    parser.add_argument('--report', default=None, help='CSV con todos los problemas encontrados')
+    parser.add_argument('--against', default=None, help='Compara además contra otra copia del barrido')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    try:
+        results = scan_sweep(args.simulation_dir, args.workers, args.strict, args.refresh)
+        if args.report:
+            Path(args.report).parent.mkdir(parents=True, exist_ok=True)
+            issues_table(results).to_csv(args.report, index=False)
+        drift = pd.DataFrame()
+        if args.against:
+            drift = compare_sweeps(args.simulation_dir, args.against)
+            for row in drift.itertuples():
+                logging.warning(f"Copia desalineada: {row.config}/{row.protocol}/{row.run} {row.artefact}: {row.difference}")
+    except Exception as e:
+        logging.error(f"Error fatal: {str(e)}")
+        sys.exit(1)
+    quarantined = get_sweep_index(args.simulation_dir).quarantine
+    sys.exit(1 if quarantined or not drift.empty else 0)
+
+if __name__ == "__main__":
+    main()
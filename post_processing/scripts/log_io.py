@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import sys
+import gzip
+import shutil
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+
+from sweep_index import COMPRESSED_SUFFIXES, get_sweep_index
+
+try:
+    import zstandard
+except ImportError:  # zstandard es opcional: sin él solo se usa gzip
+    zstandard = None
+
+CODECS = {'zst': '.zst', 'gz': '.gz'}
+DEFAULT_LEVELS = {'zst': 10, 'gz': 6}
+# Logs voluminosos que se compactan por defecto (metrics.csv y nodes.csv quedan en texto plano)
+COMPACT_ARTEFACTS = ['packets', 'packets_malicious', 'positions', 'energy', 'routing', 'control', 'node_timeseries']
+COPY_BUFFER = 1 << 20
+
+
+def default_codec() -> str:
+    """Codec de compactación por defecto: zstd si está disponible, gzip en otro caso"""
+    return 'zst' if zstandard is not None else 'gz'
+
+
+def canonical_path(path) -> Path:
+    """Ruta del log sin sufijo de compresión (p. ej. packets_normal.csv)"""
+    path = Path(path)
+    if path.suffix in COMPRESSED_SUFFIXES:
+        return path.with_suffix('')
+    return path
+
+
+def resolve_log(path) -> Optional[Path]:
+    """Devuelve la variante existente de un log (plano, .zst o .gz) o None si no hay ninguna"""
+    path = canonical_path(path)
+    for candidate in [path] + [Path(f'{path}{suffix}') for suffix in COMPRESSED_SUFFIXES]:
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def _require_zstandard(path):
+    if zstandard is None:
+        raise ImportError(f"{path} está comprimido con zstd: instale el paquete 'zstandard'")
+
+
+def open_log(path, mode: str = 'rt'):
+    """Abre un log (plano o comprimido) como flujo, descomprimiendo a medida que se lee"""
+    path = Path(path)
+    text = 't' in mode
+    if path.suffix == '.gz':
+        return gzip.open(path, 'rt' if text else 'rb', encoding='utf-8' if text else None)
+    if path.suffix == '.zst':
+        _require_zstandard(path)
+        stream = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+        return io.TextIOWrapper(stream, encoding='utf-8') if text else stream
+    return open(path, 'r' if text else 'rb', encoding='utf-8' if text else None)
+
+
+def read_csv(path, **kwargs):
+    """pd.read_csv sobre cualquier variante del log.
+
+    Acepta la ruta canónica (.csv) o la comprimida. Con chunksize devuelve un
+    lector por bloques que descomprime en streaming, sin cargar el archivo.
+    """
+    resolved = resolve_log(path)
+    if resolved is None:
+        raise FileNotFoundError(f"No existe {path} (ni variantes comprimidas)")
+    if resolved.suffix == '.zst':
+        _require_zstandard(resolved)
+    return pd.read_csv(resolved, compression='infer', **kwargs)
+
+
+def iter_csv_chunks(path, chunksize: int = 100_000, **kwargs) -> Iterator[pd.DataFrame]:
+    """Recorre un log CSV por bloques, sea plano o comprimido"""
+    with read_csv(path, chunksize=chunksize, **kwargs) as reader:
+        for chunk in reader:
+            yield chunk
+
+
+def compress_file(path, codec: str = None, level: int = None, keep_original: bool = False) -> Path:
+    """Comprime un log en streaming y reemplaza el original de forma atómica.
+
+    Escribe a un temporal, verifica que se pueda descomprimir completo y recién
+    entonces lo renombra y borra el original. Conserva el mtime del original.
+    """
+    codec = codec or default_codec()
+    if codec not in CODECS:
+        raise ValueError(f"Codec desconocido: {codec}")
+    if codec == 'zst':
+        _require_zstandard(path)
+    level = DEFAULT_LEVELS[codec] if level is None else level
+
+    src = Path(path)
+    dst = Path(f'{src}{CODECS[codec]}')
+    tmp = dst.with_name(f'.{dst.name}.{os.getpid()}.tmp')
+    try:
+        with open(src, 'rb') as fin, open(tmp, 'wb') as raw:
+            if codec == 'zst':
+                compressor = zstandard.ZstdCompressor(level=level, threads=0)
+                with compressor.stream_writer(raw, closefd=False) as fout:
+                    shutil.copyfileobj(fin, fout, COPY_BUFFER)
+            else:
+                # mtime=0 deja la salida determinista (mismo contenido, mismos bytes)
+                with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=level, mtime=0) as fout:
+                    shutil.copyfileobj(fin, fout, COPY_BUFFER)
+
+        # Verificación: el contenido descomprimido debe tener el tamaño original
+        restored = 0
+        with _open_tmp(tmp, codec) as check:
+            while True:
+                block = check.read(COPY_BUFFER)
+                if not block:
+                    break
+                restored += len(block)
+        if restored != src.stat().st_size:
+            raise IOError(f"Verificación fallida al comprimir {src}: {restored} bytes restaurados")
+
+        stat = src.stat()
+        os.utime(tmp, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.replace(tmp, dst)
+        if not keep_original:
+            src.unlink()
+        return dst
+    except BaseException:
+        if tmp.exists():
+            tmp.unlink()
+        raise
+
+
+def _open_tmp(path: Path, codec: str):
+    """Abre un temporal comprimido en modo binario según el codec (el nombre no tiene el sufijo)"""
+    if codec == 'gz':
+        return gzip.open(path, 'rb')
+    return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+
+
+def _compress_worker(args):
+    path, codec, level = args
+    before = Path(path).stat().st_size
+    dst = compress_file(path, codec, level)
+    return path, before, dst.stat().st_size
+
+
+def compact_sweep(simulation_dir: str, codec: str = None, level: int = None, workers: int = 4,
+                  artefacts: List[str] = None, min_bytes: int = 1024) -> Dict:
+    """Recomprime en paralelo los logs en texto plano de un barrido existente"""
+    codec = codec or default_codec()
+    artefacts = artefacts or COMPACT_ARTEFACTS
+    index = get_sweep_index(simulation_dir, refresh=True)
+
+    jobs = []
+    for config, protocol, run in index.iter_runs(include_quarantined=True):
+        for name in artefacts:
+            entry = index.artefact(config, protocol, run, name)
+            if entry is None or Path(entry['path']).suffix in COMPRESSED_SUFFIXES or entry['size'] < min_bytes:
+                continue
+            jobs.append((str(index.run_dir(config, protocol, run) / entry['path']), codec, level))
+
+    summary = {'files': 0, 'errors': 0, 'bytes_before': 0, 'bytes_after': 0}
+    if not jobs:
+        logging.info("No hay logs en texto plano para compactar")
+        return summary
+
+    logging.info(f"Compactando {len(jobs)} logs con {codec} ({workers} procesos)...")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_compress_worker, job): job[0] for job in jobs}
+        for future in as_completed(futures):
+            try:
+                _, before, after = future.result()
+            except Exception as e:
+                summary['errors'] += 1
+                logging.error(f"Error al compactar {futures[future]}: {str(e)}")
+                continue
+            summary['files'] += 1
+            summary['bytes_before'] += before
+            summary['bytes_after'] += after
+
+    # Los renombres cambian el mtime de los directorios: el índice se reconstruye
+    get_sweep_index(simulation_dir, refresh=True)
+    ratio = summary['bytes_before'] / summary['bytes_after'] if summary['bytes_after'] else 0.0
+    logging.info(f"Compactados {summary['files']} logs: {summary['bytes_before'] / 1e6:.1f} MB -> "
+                 f"{summary['bytes_after'] / 1e6:.1f} MB ({ratio:.1f}x)")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compacta los logs de un barrido (zstd o gzip)')
+    parser.add_argument('simulation_dir')
+    parser.add_argument('--codec', choices=list(CODECS), default=None,
+                        help='zst si el paquete zstandard está instalado, gz en otro caso')
+    parser.add_argument('--level', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--min-bytes', type=int, default=1024, help='No comprime logs más chicos')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    try:
+        summary = compact_sweep(args.simulation_dir, args.codec, args.level, args.workers,
+                                min_bytes=args.min_bytes)
+    except Exception as e:
+        logging.error(f"Error fatal: {str(e)}")
+        sys.exit(1)
+    sys.exit(1 if summary['errors'] else 0)
+
+if __name__ == "__main__":
+    main()
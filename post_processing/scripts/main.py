@@ -7,18 +7,27 @@ from pathlib import Path
 import argparse
 from datetime import datetime
 import shutil
+from typing import Dict, Iterable
 
-from run_analysis import SimulationAnalyzer
-from security_analysis import SecurityAnalyzer
-from performance_analysis import PerformanceAnalyzer
+from sweep_index import get_sweep_index, KNOWN_CONFIGS, BASELINE_CONFIG
+from output_writer import get_writer
+from output_tree import DEFAULT_RESULTS_DIR, OutputTree
 
-def setup_logging():
-    """Configura el sistema de logging"""
+# Los analizadores (pandas, matplotlib, plotly, reportlab) se importan dentro de
+# cada etapa: 'validate' y la ayuda del CLI arrancan sin cargarlos
+
+# Etapas del pipeline, en orden de ejecución
+STAGES = ('tables', 'plots', 'report')
+# Comandos que escriben un árbol de resultados (con bloqueo, manifiesto y log propio)
+ANALYSIS_COMMANDS = ('run', 'tables', 'plots', 'report')
+
+def setup_logging(log_file: Path = None):
+    """Configura el sistema de logging (por defecto en post_processing/logs, un archivo por invocación)"""
     try:
-        log_dir = Path('post_processing/logs')
-        log_dir.mkdir(parents=True, exist_ok=True)
-        
-        log_file = log_dir / f'post_processing_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log'
+        if log_file is None:
+            log_dir = Path('post_processing/logs')
+            log_dir.mkdir(parents=True, exist_ok=True)
+            log_file = log_dir / f'post_processing_{datetime.now().strftime("%Y%m%d_%H%M%S")}_{os.getpid()}.log'
         
         logging.basicConfig(
             level=logging.INFO,
@@ -33,10 +42,10 @@ def setup_logging():
         print(f"Error al configurar logging: {str(e)}")
         sys.exit(1)
 
-def create_results_structure():
+def create_results_structure(results_dir: str = None):
     """Crea la estructura de directorios para los resultados"""
     try:
-        results_dir = Path('post_processing/results')
+        results_dir = Path(results_dir or DEFAULT_RESULTS_DIR)
         dirs = [
             results_dir / 'tables',
             results_dir / 'graphs',
@@ -55,34 +64,31 @@ def create_results_structure():
         logging.error(f"Error al crear estructura de directorios: {str(e)}")
         raise
 
-def backup_raw_data(simulation_dir: str):
+def backup_raw_data(simulation_dir: str, results_dir: str = None):
     """Hace una copia de seguridad de los datos originales"""
     try:
         src_dir = Path(simulation_dir)
         if not src_dir.exists():
             raise FileNotFoundError(f"El directorio de origen {simulation_dir} no existe")
             
-        dst_dir = Path('post_processing/results/raw_data')
+        dst_dir = Path(results_dir or DEFAULT_RESULTS_DIR) / 'raw_data'
         dst_dir.mkdir(parents=True, exist_ok=True)
         
-        # Lista de directorios a copiar
-        dirs_to_copy = ['mal_int', 'mal_no_int', 'int_no_mal', 'no_mal_no_int']
+        # Directorios a copiar: las configuraciones presentes en el barrido
+        dirs_to_copy = get_sweep_index(simulation_dir).configs
         
         for dir_name in dirs_to_copy:
             src = src_dir / dir_name
             dst = dst_dir / dir_name
             
-            if src.exists():
-                try:
-                    if dst.exists():
-                        shutil.rmtree(dst)
-                    shutil.copytree(src, dst)
-                    logging.info(f"Directorio {dir_name} copiado exitosamente")
-                except Exception as e:
-                    logging.error(f"Error al copiar directorio {dir_name}: {str(e)}")
-                    raise
-            else:
-                logging.warning(f"El directorio {dir_name} no existe en la ubicación de origen")
+            try:
+                if dst.exists():
+                    shutil.rmtree(dst)
+                shutil.copytree(src, dst)
+                logging.info(f"Directorio {dir_name} copiado exitosamente")
+            except Exception as e:
+                logging.error(f"Error al copiar directorio {dir_name}: {str(e)}")
+                raise
     except Exception as e:
         logging.error(f"Error en backup de datos: {str(e)}")
         raise
@@ -90,27 +96,28 @@ def backup_raw_data(simulation_dir: str):
 def validate_simulation_dir(simulation_dir: str):
     """Valida que el directorio de simulación tenga la estructura correcta"""
     try:
-        required_dirs = ['mal_int', 'mal_no_int', 'int_no_mal', 'no_mal_no_int']
-        required_protocols = ['AODV', 'OLSR', 'DSDV', 'DSR']
-        
         sim_dir = Path(simulation_dir)
         if not sim_dir.exists():
             raise FileNotFoundError(f"El directorio de simulación {simulation_dir} no existe")
+        
+        index = get_sweep_index(simulation_dir)
+        if not index.configs:
+            raise FileNotFoundError(f"No se encontraron configuraciones con corridas en {simulation_dir}")
+        
+        for config in KNOWN_CONFIGS:
+            if config not in index.configs:
+                logging.warning(f"Falta el directorio de configuración {config}")
+        if BASELINE_CONFIG not in index.configs:
+            logging.warning(f"Sin configuración base {BASELINE_CONFIG}: no se calculará el impacto de ataques")
             
-        for config in required_dirs:
-            config_dir = sim_dir / config
-            if not config_dir.exists():
-                raise FileNotFoundError(f"Falta el directorio de configuración {config}")
-                
-            for protocol in required_protocols:
-                protocol_dir = config_dir / protocol
-                if not protocol_dir.exists():
+        for config in index.configs:
+            for protocol in index.protocols:
+                if protocol not in index.protocols_for(config):
                     logging.warning(f"Falta el directorio del protocolo {protocol} en {config}")
                     continue
                     
                 # Verificar que haya al menos una ejecución
-                runs = list(protocol_dir.glob('run*'))
-                if not runs:
+                if not index.runs(config, protocol):
                     logging.warning(f"No se encontraron ejecuciones para {protocol} en {config}")
                     
         return True
@@ -118,8 +125,31 @@ def validate_simulation_dir(simulation_dir: str):
         logging.error(f"Error al validar directorio de simulación: {str(e)}")
         return False
 
-def run_analysis(simulation_dir: str):
-    """Ejecuta todo el proceso de análisis"""
+def check_integrity(simulation_dir: str, strict: bool = False, workers: int = 4) -> bool:
+    """Verifica los artefactos de cada corrida y actualiza la cuarentena del barrido.
+    
+    Las corridas con errores quedan excluidas de todas las etapas. Con strict
+    también las que tienen advertencias, y cualquier corrida en cuarentena hace
+    fallar la verificación.
+    """
+    from integrity_check import scan_sweep
+    
+    try:
+        scan_sweep(simulation_dir, workers=workers, strict=strict)
+        quarantine = get_sweep_index(simulation_dir).quarantine
+        if quarantine:
+            logging.warning(f"{len(quarantine)} corridas en cuarentena, excluidas del análisis "
+                            f"(detalle en {Path(simulation_dir) / '.quarantine.json'})")
+        return not (strict and quarantine)
+    except Exception as e:
+        logging.error(f"Error al verificar la integridad de las corridas: {str(e)}")
+        return False
+
+def run_analysis(simulation_dir: str, stages: Iterable[str] = STAGES, backup: bool = True,
+                 strict: bool = False, workers: int = 4, stage_workers: int = 4, results_dir: str = None):
+    """Ejecuta el proceso de análisis (todas las etapas o un subconjunto)"""
+    from run_analysis import SimulationAnalyzer
+    
     logging.info("Iniciando proceso de post-procesamiento...")
     
     try:
@@ -127,33 +157,161 @@ def run_analysis(simulation_dir: str):
         if not validate_simulation_dir(simulation_dir):
             raise ValueError("El directorio de simulación no tiene la estructura correcta")
         
+        # Verificar los artefactos antes de cargar nada: las corridas dañadas quedan en cuarentena
+        if not check_integrity(simulation_dir, strict, workers):
+            raise ValueError("Hay corridas con artefactos inválidos (modo estricto)")
+        
         # Crear estructura de directorios
-        create_results_structure()
+        create_results_structure(results_dir)
         
         # Hacer backup de datos originales
-        backup_raw_data(simulation_dir)
+        if backup:
+            backup_raw_data(simulation_dir, results_dir)
         
         # Cargar datos
         analyzer = SimulationAnalyzer(simulation_dir)
         metrics_data = analyzer.load_metrics()
         
+        run_analysis_stages(simulation_dir, metrics_data, stages=stages, workers=stage_workers,
+                            results_dir=results_dir)
+        
+    except Exception as e:
+        logging.error(f"Error durante el análisis: {str(e)}")
+        raise
+
+def build_stage_graph(simulation_dir: str, sketches: Dict = None, stages: Iterable[str] = STAGES,
+                      results_dir: str = None):
+    """Grafo de tablas, gráficos y reportes con sus entradas declaradas.
+    
+    Todas las etapas reciben `metrics_data` en memoria. Los reportes reciben las
+    estadísticas calculadas por las etapas de tablas en lugar de releer los CSV.
+    Las etapas que dibujan con pyplot comparten un recurso exclusivo.
+    """
+    from run_analysis import SimulationAnalyzer
+    from security_analysis import SecurityAnalyzer
+    from performance_analysis import PerformanceAnalyzer
+    from distribution_analysis import DistributionAnalyzer
+    from routing_analysis import RoutingAnalyzer
+    from paired_impact import PairedImpactAnalyzer
+    from scalability_analysis import ScalabilityAnalyzer
+    from stage_graph import StageGraph, PYPLOT
+    
+    stages = set(stages)
+    unknown = stages - set(STAGES)
+    if unknown:
+        raise ValueError(f"Etapas desconocidas: {', '.join(sorted(unknown))}")
+    plots = 'plots' in stages
+    report = 'report' in stages
+    # Al combinar parciales de shards no hay barrido local: solo corren las etapas que
+    # trabajan con las métricas y los sketches combinados
+    local_sweep = Path(simulation_dir).is_dir()
+    
+    # Las tablas se calculan sin gráficos; los gráficos van en etapas propias con pyplot
+    analyzer = SimulationAnalyzer(simulation_dir, generate_plots=False, results_dir=results_dir)
+    security = SecurityAnalyzer(simulation_dir, generate_plots=False, results_dir=results_dir)
+    performance = PerformanceAnalyzer(simulation_dir, generate_plots=False, results_dir=results_dir)
+    for directory in ('tables', 'graphs' if plots else None, 'reports' if report else None):
+        if directory:
+            (analyzer.results_dir / directory).mkdir(parents=True, exist_ok=True)
+    
+    def summary_table(metrics_data):
+        summary_stats = analyzer.generate_summary_statistics(metrics_data)
+        analyzer.writer.write_csv(summary_stats, analyzer.results_dir / 'tables' / 'summary_statistics.csv', index=False)
+        return summary_stats
+    
+    graph = StageGraph()
+    graph.add('summary', summary_table, inputs=['metrics_data'])
+    graph.add('security_tables', security.analyze_security_metrics, inputs=['metrics_data'])
+    graph.add('attack_impact', SecurityAnalyzer(simulation_dir, generate_plots=plots,
+                                                results_dir=results_dir).analyze_attack_impact,
+              inputs=['metrics_data'])
+    graph.add('paired_impact', PairedImpactAnalyzer(simulation_dir, generate_plots=plots,
+                                                    results_dir=results_dir).run_analysis,
+              inputs=['metrics_data'])
+    # Seguridad y rendimiento escriben los mismos {métrica}_by_protocol.csv y {métrica}_violin.png:
+    # se mantiene el orden de la ejecución secuencial (prevalece rendimiento)
+    graph.add('performance_tables', performance.analyze_performance_metrics, inputs=['metrics_data'],
+              after=['security_tables'])
+    performance_plotting = PerformanceAnalyzer(simulation_dir, generate_plots=plots, results_dir=results_dir)
+    graph.add('efficiency', performance_plotting.analyze_efficiency, inputs=['metrics_data'])
+    graph.add('scalability', performance_plotting.analyze_scalability, inputs=['metrics_data'])
+    # Solo produce resultados en barridos con varios tamaños de red (SCALABILITY=1)
+    graph.add('scalability_curves', ScalabilityAnalyzer(simulation_dir, generate_plots=plots,
+                                                        results_dir=results_dir).run_analysis,
+              inputs=['metrics_data'])
+    
+    if plots:
+        # Las etapas de gráficos corren fuera del hilo principal: backend sin interfaz
+        import matplotlib
+        matplotlib.use('Agg')
+        
+        plotter = SimulationAnalyzer(simulation_dir, results_dir=results_dir)
+        security_plotter = SecurityAnalyzer(simulation_dir, results_dir=results_dir)
+        performance_plotter = PerformanceAnalyzer(simulation_dir, results_dir=results_dir)
+        # Los gráficos de plotly no usan pyplot y corren en paralelo con los de matplotlib
+        graph.add('temporal_plots', lambda metrics_data: plotter.generate_comparative_plots(
+            metrics_data, static=False), inputs=['metrics_data'])
+        graph.add('comparative_plots', lambda metrics_data: plotter.generate_comparative_plots(
+            metrics_data, interactive=False), inputs=['metrics_data'], resources=[PYPLOT])
+        # Los violines de seguridad se sobrescribían con los de rendimiento (mismo {métrica}_violin.png
+        # para un subconjunto de las métricas): solo se generan los de rendimiento
+        graph.add('security_plots', lambda metrics_data: security_plotter.plot_security_metrics(
+            metrics_data, violin=False), inputs=['metrics_data'])
+        graph.add('performance_plots', lambda metrics_data: performance_plotter.plot_performance_metrics(
+            metrics_data, violin=False), inputs=['metrics_data'])
+        graph.add('violin_plots', lambda metrics_data: performance_plotter.plot_performance_metrics(
+            metrics_data, interactive=False), inputs=['metrics_data'], resources=[PYPLOT])
+    
+    if report:
+        # Los reportes insertan los gráficos: esperan a las etapas que los generan
+        figures = {
+            'analysis': ['temporal_plots', 'comparative_plots'],
+            'security': ['violin_plots', 'security_plots', 'attack_impact', 'paired_impact'],
+            'performance': ['violin_plots', 'performance_plots', 'efficiency', 'scalability', 'scalability_curves']
+                           + (['routing'] if local_sweep else [])
+        } if plots else {}
+        graph.add('analysis_report', lambda summary: analyzer.generate_report(summary), inputs=['summary'],
+                  after=figures.get('analysis', []))
+        graph.add('security_report', lambda metrics_data, security_tables: security.generate_security_report(
+            metrics_data, security_tables), inputs=['metrics_data', 'security_tables'],
+                  after=figures.get('security', []))
+        graph.add('performance_report', lambda metrics_data, performance_tables:
+                  performance.generate_performance_report(metrics_data, performance_tables),
+                  inputs=['metrics_data', 'performance_tables'], after=figures.get('performance', []))
+    
+    if 'tables' in stages:
+        if local_sweep:
+            graph.add('node_load', lambda: performance.analyze_node_load())
+        # Análisis de distribuciones (cuantiles de delay y tiempos entre llegadas)
+        if local_sweep or sketches is not None:
+            graph.add('distributions', lambda: DistributionAnalyzer(simulation_dir, results_dir=results_dir).run_analysis(
+                sketches))
+    
+    # Overhead de enrutamiento y cambios de ruta (el reporte de rendimiento inserta routing_overhead.html)
+    if local_sweep and ('tables' in stages or plots):
+        graph.add('routing', RoutingAnalyzer(simulation_dir, generate_plots=plots,
+                                             results_dir=results_dir).run_analysis)
+    return graph
+
+def run_analysis_stages(simulation_dir: str, metrics_data: Dict, sketches: Dict = None,
+                        stages: Iterable[str] = STAGES, workers: int = 4, results_dir: str = None):
+    """Ejecuta las etapas de análisis sobre métricas ya cargadas (locales o combinadas desde shards).
+    
+    'tables' escribe las tablas CSV, 'plots' los gráficos y 'report' los PDF. Las
+    etapas de gráficos y reportes regeneran también las tablas de las que dependen.
+    Las etapas independientes corren en paralelo en `workers` hilos.
+    """
+    try:
         # Verificar si hay datos cargados
         if not any(metrics_data.values()):
             raise ValueError("No se encontraron datos de métricas en ninguna configuración")
         
-        # Ejecutar análisis principal
-        logging.info("Ejecutando análisis principal...")
-        analyzer.run_analysis()
-        
-        # Ejecutar análisis de seguridad
-        logging.info("Ejecutando análisis de seguridad...")
-        security_analyzer = SecurityAnalyzer(simulation_dir)
-        security_analyzer.generate_security_report(metrics_data)
-        
-        # Ejecutar análisis de rendimiento
-        logging.info("Ejecutando análisis de rendimiento...")
-        performance_analyzer = PerformanceAnalyzer(simulation_dir)
-        performance_analyzer.generate_performance_report(metrics_data)
+        graph = build_stage_graph(simulation_dir, sketches, stages, results_dir)
+        logging.info(f"Ejecutando {len(graph.stages)} etapas de análisis con {workers} hilos...")
+        graph.run({'metrics_data': metrics_data}, workers=workers)
+        written = get_writer().stats
+        logging.info(f"Resultados publicados: {written['written']} archivos ({written['bytes'] / 1e6:.1f} MB), "
+                     f"{written['skipped']} sin cambios")
         
         logging.info("Proceso de post-procesamiento completado exitosamente")
         
@@ -163,16 +321,128 @@ def run_analysis(simulation_dir: str):
 
 def main():
     """Función principal"""
+    commands = {
+        'run': ('Ejecuta el pipeline completo (tablas, gráficos y reportes)', STAGES),
+        'validate': ('Valida la estructura del directorio de simulación', ()),
+        'tables': ('Genera solo las tablas CSV (sin librerías de gráficos)', ('tables',)),
+        'plots': ('Genera los gráficos', ('plots',)),
+        'report': ('Genera los reportes PDF', ('report',)),
+        'compact': ('Comprime en paralelo los logs en texto plano del barrido', ()),
+        'ingest': ('Convierte posiciones y energía por nodo al almacén memmap', ()),
+        'cube': ('Construye el cubo de agregados para consultas interactivas', ()),
+        'serve': ('Sirve los resultados como JSON por HTTP (local)', ()),
+        'compare': ('Compara dos barridos por (configuración, protocolo, métrica)', ())
+    }
+    
     parser = argparse.ArgumentParser(description='Post-procesamiento de simulaciones IoT')
-    parser.add_argument('simulation_dir', help='Directorio de las simulaciones a analizar')
-    args = parser.parse_args()
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name, (help_text, _) in commands.items():
+        subparser = subparsers.add_parser(name, help=help_text)
+        subparser.add_argument('simulation_dir', help='Directorio de las simulaciones a analizar')
+        if name == 'compare':
+            subparser.add_argument('other_dir', help='Barrido comparado (B); simulation_dir es la referencia (A)')
+        if name in ('run', 'validate', 'tables', 'plots', 'report'):
+            subparser.add_argument('--strict', action='store_true',
+                                   help='Falla si alguna corrida queda en cuarentena (también por advertencias)')
+            subparser.add_argument('--check-workers', type=int, default=4,
+                                   help='Procesos para la verificación de integridad')
+        if name in ANALYSIS_COMMANDS:
+            subparser.add_argument('--stage-workers', type=int, default=4,
+                                   help='Hilos para las etapas de análisis independientes')
+        if name in ANALYSIS_COMMANDS + ('cube', 'compare'):
+            subparser.add_argument('--output-dir', default=None,
+                                   help=f'Raíz de resultados de esta invocación (por defecto {DEFAULT_RESULTS_DIR})')
+        if name == 'run':
+            subparser.add_argument('--no-backup', action='store_true',
+                                   help='No copia los datos originales a results/raw_data')
+        elif name == 'compact':
+            subparser.add_argument('--codec', choices=['zst', 'gz'], default=None,
+                                   help='zst si el paquete zstandard está instalado, gz en otro caso')
+            subparser.add_argument('--level', type=int, default=None)
+            subparser.add_argument('--workers', type=int, default=4)
+        elif name == 'ingest':
+            subparser.add_argument('--workers', type=int, default=4)
+            subparser.add_argument('--refresh', action='store_true', help='Reingiere aunque el almacén esté vigente')
+        elif name == 'cube':
+            subparser.add_argument('--bin', type=float, default=1.0, help='Ancho de los intervalos de tiempo (s)')
+            subparser.add_argument('--refresh', action='store_true', help='Reconstruye aunque el cubo esté vigente')
+        elif name == 'serve':
+            subparser.add_argument('--host', default='127.0.0.1')
+            subparser.add_argument('--port', type=int, default=8050)
+            subparser.add_argument('--cache-size', type=int, default=64,
+                                   help='Respuestas que se conservan en memoria')
+        elif name == 'compare':
+            subparser.add_argument('--output', default=None,
+                                   help='Directorio de salida (por defecto post_processing/results/compare/<A>_vs_<B>)')
+            subparser.add_argument('--alpha', type=float, default=0.05,
+                                   help='Nivel de significancia tras la corrección de Benjamini-Hochberg')
+            subparser.add_argument('--refresh', action='store_true', help='Reconstruye los cubos de ambos barridos')
+    
+    # Compatibilidad: 'main.py <directorio>' equivale a 'main.py run <directorio>'
+    argv = sys.argv[1:]
+    if argv and argv[0] not in commands and not argv[0].startswith('-'):
+        argv = ['run'] + argv
+    args = parser.parse_args(argv)
+    
+    # Cada análisis usa su propio árbol de resultados; su log queda dentro del árbol
+    tree = None
+    if args.command in ANALYSIS_COMMANDS:
+        tree = OutputTree(args.output_dir, args.command, args.simulation_dir)
     
     try:
         # Configurar logging
-        setup_logging()
+        setup_logging(tree.new_log_file() if tree else None)
+        
+        if args.command == 'validate':
+            if not validate_simulation_dir(args.simulation_dir):
+                sys.exit(1)
+            if not check_integrity(args.simulation_dir, args.strict, args.check_workers):
+                sys.exit(1)
+            logging.info(f"Estructura válida: {args.simulation_dir}")
+            return
+        
+        if args.command == 'compact':
+            from log_io import compact_sweep
+            
+            summary = compact_sweep(args.simulation_dir, args.codec, args.level, args.workers)
+            if summary['errors']:
+                sys.exit(1)
+            return
+        
+        if args.command == 'ingest':
+            from timeseries_store import TimeSeriesStore
+            
+            summary = TimeSeriesStore(args.simulation_dir).ingest(workers=args.workers, refresh=args.refresh)
+            if summary['errors']:
+                sys.exit(1)
+            return
+        
+        if args.command == 'cube':
+            from aggregate_cube import build_cube
+            
+            output = Path(args.output_dir or DEFAULT_RESULTS_DIR) / 'cube' / 'aggregate_cube.npz'
+            build_cube(args.simulation_dir, str(output), bin_width=args.bin, refresh=args.refresh)
+            return
+        
+        if args.command == 'serve':
+            from results_service import serve
+            
+            serve(args.simulation_dir, args.host, args.port, args.cache_size)
+            return
+        
+        if args.command == 'compare':
+            from compare import compare_scenarios
+            
+            compare_scenarios(args.simulation_dir, args.other_dir, args.output, args.alpha, refresh=args.refresh,
+                              results_dir=args.output_dir)
+            return
         
-        # Ejecutar análisis
-        run_analysis(args.simulation_dir)
+        # Ejecutar análisis (el backup de datos crudos solo en el pipeline completo)
+        backup = args.command == 'run' and not args.no_backup
+        with tree:
+            logging.info(f"Resultados en {tree.root}")
+            run_analysis(args.simulation_dir, commands[args.command][1], backup=backup, strict=args.strict,
+                         workers=args.check_workers, stage_workers=args.stage_workers, results_dir=str(tree.root))
     except Exception as e:
         logging.error(f"Error fatal: {str(e)}")
         sys.exit(1)
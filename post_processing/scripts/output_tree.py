@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import socket
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # fcntl solo existe en POSIX: sin él no se bloquea el árbol
+    fcntl = None
+
+from output_writer import get_writer, publish
+
+DEFAULT_RESULTS_DIR = 'post_processing/results'
+LOCK_FILE = '.lock'
+MANIFEST_FILE = 'manifest.json'
+MANIFEST_VERSION = 1
+
+
+class OutputTree:
+    """Árbol de resultados de una invocación, con bloqueo, manifiesto y log propios.
+
+    Cada análisis escribe en su propia raíz (`--output-dir`), así varios
+    análisis corren a la vez en la misma máquina sin pisarse. Mientras dura la
+    invocación se toma un flock exclusivo sobre `<raíz>/.lock`: un segundo
+    análisis sobre el mismo árbol falla de inmediato en lugar de mezclar sus
+    archivos, y el bloqueo se libera solo si el proceso muere. `manifest.json`
+    registra quién generó el árbol (comando, barrido, host, pid, fechas,
+    estado) y el tamaño y SHA-1 de cada archivo publicado.
+    """
+
+    def __init__(self, root: Optional[str] = None, command: str = 'run', simulation_dir: Optional[str] = None):
+        self.root = Path(root or DEFAULT_RESULTS_DIR)
+        self.command = command
+        self.simulation_dir = simulation_dir
+        self.logs_dir = self.root / 'logs'
+        self.started = datetime.now()
+        self.lock_handle = None
+        self.log_file: Optional[Path] = None
+
+    @property
+    def manifest_file(self) -> Path:
+        return self.root / MANIFEST_FILE
+
+    def _holder(self) -> Dict:
+        return {'pid': os.getpid(), 'host': socket.gethostname(), 'command': self.command,
+                'simulation_dir': str(Path(self.simulation_dir).resolve()) if self.simulation_dir else None,
+                'started': self.started.isoformat(timespec='seconds')}
+
+    def acquire(self):
+        """Toma el bloqueo exclusivo del árbol; falla si otro análisis lo tiene"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        if fcntl is None:
+            logging.warning(f"Sin fcntl en esta plataforma: {self.root} se usa sin bloqueo")
+            return
+        handle = open(self.root / LOCK_FILE, 'a+')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            handle.seek(0)
+            holder = handle.read().strip() or 'desconocido'
+            handle.close()
+            raise RuntimeError(f"El directorio de resultados {self.root} está en uso por otro análisis "
+                               f"({holder}); use --output-dir para escribir en otro")
+        handle.seek(0)
+        handle.truncate()
+        handle.write(json.dumps(self._holder()))
+        handle.flush()
+        self.lock_handle = handle
+
+    def release(self):
+        if self.lock_handle is not None:
+            self.lock_handle.seek(0)
+            self.lock_handle.truncate()
+            fcntl.flock(self.lock_handle, fcntl.LOCK_UN)
+            self.lock_handle.close()
+            self.lock_handle = None
+
+    def new_log_file(self) -> Path:
+        """Log propio de la invocación (la fecha y el pid evitan choques entre análisis simultáneos)"""
+        self.logs_dir.mkdir(parents=True, exist_ok=True)
+        self.log_file = self.logs_dir / f'post_processing_{self.started.strftime("%Y%m%d_%H%M%S")}_{os.getpid()}.log'
+        return self.log_file
+
+    def _previous_files(self) -> Dict[str, Dict]:
+        """Archivos del manifiesto anterior que siguen presentes con el mismo tamaño"""
+        try:
+            with open(self.manifest_file) as f:
+                previous = json.load(f).get('files', {})
+        except (OSError, ValueError):
+            return {}
+        kept = {}
+        for name, entry in previous.items():
+            try:
+                if (self.root / name).stat().st_size == entry.get('size'):
+                    kept[name] = entry
+            except OSError:
+                continue
+        return kept
+
+    def write_manifest(self, status: str, error: Optional[str] = None):
+        """Actualiza el manifiesto con el estado de la invocación y los archivos publicados"""
+        files = self._previous_files()
+        root = self.root.absolute()
+        invocation = self.started.isoformat(timespec='seconds')
+        for path, entry in get_writer().published.items():
+            try:
+                name = path.relative_to(root).as_posix()
+            except ValueError:
+                continue
+            files[name] = dict(entry, invocation=invocation)
+
+        manifest = {'version': MANIFEST_VERSION, **self._holder(), 'argv': sys.argv,
+                    'status': status, 'error': error,
+                    'finished': datetime.now().isoformat(timespec='seconds') if status != 'running' else None,
+                    'log_file': str(self.log_file.relative_to(self.root)) if self.log_file else None,
+                    'files': dict(sorted(files.items()))}
+        if self.simulation_dir:
+            from sweep_index import get_sweep_index
+
+            try:
+                manifest['sweep_fingerprint'] = get_sweep_index(self.simulation_dir).fingerprint()
+            except Exception as e:
+                logging.warning(f"No se pudo calcular la huella del barrido: {str(e)}")
+        publish(self.manifest_file, json.dumps(manifest, indent=1, ensure_ascii=False).encode('utf-8'))
+
+    def __enter__(self) -> 'OutputTree':
+        self.acquire()
+        try:
+            self.write_manifest('running')
+        except BaseException:
+            self.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            try:
+                get_writer().flush(all_scopes=True)
+            except OSError as e:
+                if exc_type is None:
+                    exc_type, exc = type(e), e
+                    raise
+            finally:
+                self.write_manifest('error' if exc_type else 'ok', str(exc) if exc else None)
+        finally:
+            self.release()
+        return False
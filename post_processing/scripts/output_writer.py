@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import hashlib
+import atexit
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Union
+
+if TYPE_CHECKING:
+    # Solo para la anotación: importar pandas demora `main.py --help` y `validate`
+    import pandas as pd
+
+PathLike = Union[str, Path]
+
+_writer: Optional['OutputWriter'] = None
+_writer_lock = threading.Lock()
+
+
+def publish(path: PathLike, data: bytes) -> bool:
+    """Escribe un archivo de forma atómica; devuelve False si ya tenía exactamente ese contenido.
+
+    Escribe a un temporal en el mismo directorio, lo sincroniza y recién
+    entonces lo renombra sobre el destino: un lector ve el archivo anterior
+    completo o el nuevo completo, nunca uno a medio escribir.
+    """
+    path = Path(path)
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except OSError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if tmp.exists():
+            tmp.unlink()
+        raise
+    return True
+
+
+class OutputWriter:
+    """Escritor de resultados en segundo plano.
+
+    Los resultados se serializan en memoria en el hilo que los produce (pyplot
+    y los DataFrames no se comparten entre hilos) y los bytes se publican con
+    `publish` en un pool acotado de hilos, así el cálculo sigue mientras el
+    disco (o NFS) escribe. Con más de `max_pending` escrituras en cola, el
+    productor espera. Las escrituras de un mismo archivo se aplican en el orden
+    en que se encolaron. `flush(scope)` es la barrera entre etapas
+    dependientes: espera las escrituras de ese alcance y relanza el primer error.
+    """
+
+    def __init__(self, workers: int = 4, max_pending: int = 64):
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='output-writer')
+        self.slots = threading.BoundedSemaphore(max(1, max_pending))
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.pending: Dict[Optional[str], List[Future]] = {}
+        self.last_write: Dict[Path, Future] = {}
+        self.stats = {'written': 0, 'skipped': 0, 'bytes': 0}
+        # Ruta absoluta -> tamaño y SHA-1 de lo publicado (para el manifiesto del árbol de resultados)
+        self.published: Dict[Path, Dict] = {}
+
+    @contextmanager
+    def scope(self, name: str):
+        """Asocia las escrituras del hilo actual a `name` (p. ej. el nombre de la etapa)"""
+        previous = getattr(self.local, 'scope', None)
+        self.local.scope = name
+        try:
+            yield self
+        finally:
+            self.local.scope = previous
+
+    def _publish(self, path: Path, data: bytes, previous: Optional[Future]) -> bool:
+        if previous is not None:
+            wait([previous])
+        written = publish(path, data)
+        digest = hashlib.sha1(data).hexdigest()
+        with self.lock:
+            self.published[path] = {'size': len(data), 'sha1': digest}
+            if written:
+                self.stats['written'] += 1
+                self.stats['bytes'] += len(data)
+            else:
+                self.stats['skipped'] += 1
+        return written
+
+    def _done(self, path: Path, scope: Optional[str], future: Future):
+        self.slots.release()
+        with self.lock:
+            if self.last_write.get(path) is future:
+                del self.last_write[path]
+        if future.exception() is not None and scope is None:
+            # Sin alcance nadie espera esta escritura con flush: al menos queda en el log
+            logging.error(f"Error al escribir {path}: {str(future.exception())}")
+
+    def write_bytes(self, path: PathLike, data: bytes) -> Future:
+        """Encola la publicación de `data` en `path`"""
+        path = Path(path).absolute()
+        scope = getattr(self.local, 'scope', None)
+        self.slots.acquire()
+        with self.lock:
+            future = self.executor.submit(self._publish, path, data, self.last_write.get(path))
+            self.last_write[path] = future
+            self.pending.setdefault(scope, []).append(future)
+        future.add_done_callback(lambda f: self._done(path, scope, f))
+        return future
+
+    def write_text(self, path: PathLike, text: str, encoding: str = 'utf-8') -> Future:
+        return self.write_bytes(path, text.encode(encoding))
+
+    def write_csv(self, df: 'pd.DataFrame', path: PathLike, **kwargs) -> Future:
+        """Equivalente a df.to_csv(path, **kwargs)"""
+        return self.write_text(path, df.to_csv(**kwargs))
+
+    def write_figure(self, path: PathLike, fig=None, **kwargs) -> Future:
+        """Equivalente a plt.savefig(path) (o fig.savefig) para figuras de matplotlib"""
+        if fig is None:
+            import matplotlib.pyplot as plt
+            fig = plt.gcf()
+        buffer = io.BytesIO()
+        kwargs.setdefault('format', Path(path).suffix.lstrip('.') or 'png')
+        fig.savefig(buffer, **kwargs)
+        return self.write_bytes(path, buffer.getvalue())
+
+    def write_html(self, fig, path: PathLike, **kwargs) -> Future:
+        """Equivalente a fig.write_html(path) para figuras de plotly.
+
+        El id del div se deriva del nombre del archivo (plotly usa uno aleatorio)
+        para que el mismo gráfico produzca los mismos bytes y no se reescriba.
+        """
+        kwargs.setdefault('div_id', Path(path).stem)
+        return self.write_text(path, fig.to_html(**kwargs))
+
+    def flush(self, scope: Optional[str] = None, all_scopes: bool = False):
+        """Espera las escrituras de un alcance (o de todos) y relanza el primer error"""
+        with self.lock:
+            if all_scopes:
+                futures = [f for fs in self.pending.values() for f in fs]
+                self.pending = {}
+            else:
+                futures = self.pending.pop(scope, [])
+        wait(futures)
+        errors = [f.exception() for f in futures if f.exception() is not None]
+        if errors:
+            raise OSError(f"{len(errors)} resultados sin escribir: {str(errors[0])}")
+
+    def close(self):
+        try:
+            self.flush(all_scopes=True)
+        finally:
+            self.executor.shutdown(wait=True)
+
+
+def get_writer() -> OutputWriter:
+    """Escritor compartido por todas las etapas del proceso"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = OutputWriter()
+            atexit.register(_flush_at_exit)
+        return _writer
+
+
+def _flush_at_exit():
+    # Los scripts que se ejecutan por separado no llaman a flush: se publica todo al salir
+    try:
+        _writer.flush(all_scopes=True)
+    except OSError as e:
+        logging.error(f"Error al publicar resultados pendientes: {str(e)}")
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+
+import re
+import math
+import logging
+import warnings
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from sweep_index import get_sweep_index, KNOWN_CONFIGS, KNOWN_PROTOCOLS, BASELINE_CONFIG
+from integrity_check import parse_metadata
+from output_writer import get_writer
+from output_tree import DEFAULT_RESULTS_DIR
+
+# run_simulations CON DSR.sh usa SEED=1000+run en todas las configuraciones y protocolos
+SEED_OFFSET = 1000
+
+class PairedImpactAnalyzer:
+    """Impacto de los ataques con corridas pareadas por semilla (números aleatorios comunes).
+
+    Todas las configuraciones usan las mismas semillas, así que la corrida con
+    semilla s de una configuración de ataque se compara con la corrida de la
+    misma semilla en la configuración base. Las métricas se ordenan en un arreglo
+    configuración × protocolo × semilla × métrica y las diferencias por semilla
+    de todos los protocolos y métricas salen de una sola resta. Como las
+    diferencias pareadas cancelan la variabilidad común a la semilla, el IC es
+    más angosto que el de la comparación de medias independientes con las
+    mismas corridas.
+    """
+
+    def __init__(self, simulation_dir: str, generate_plots: bool = True, confidence: float = 0.95,
+                 metrics: List[str] = None, results_dir: str = None):
+        self.simulation_dir = Path(simulation_dir)
+        self.generate_plots = generate_plots
+        self.results_dir = Path(results_dir or DEFAULT_RESULTS_DIR)
+        self.writer = get_writer()
+        self.index = get_sweep_index(simulation_dir)
+        self.configs = self.index.configs or list(KNOWN_CONFIGS)
+        self.protocols = self.index.protocols or list(KNOWN_PROTOCOLS)
+        self.confidence = confidence
+        self.metrics = metrics or ['throughput_promedio', 'delay_promedio', 'jitter_promedio',
+                                   'perdida_paquetes', 'pdr']
+
+    def run_seed(self, config: str, protocol: str, run_key: str) -> Optional[int]:
+        """Semilla de una corrida: la de metadata.txt o, si falta, 1000 + número de corrida"""
+        run = run_key[len('run_'):] if run_key.startswith('run_') else run_key
+        path = self.index.artefact_path(config, protocol, run, 'metadata') if self.index.configs else None
+        if path is not None:
+            try:
+                seed = parse_metadata(path).get('seed')
+                if seed is not None:
+                    return int(seed)
+            except (OSError, UnicodeDecodeError) as e:
+                logging.warning(f"No se pudo leer la semilla de {path}: {str(e)}")
+        match = re.search(r'(\d+)$', run)
+        return SEED_OFFSET + int(match.group(1)) if match else None
+
+    def build_array(self, metrics_data: Dict) -> Tuple[np.ndarray, List[str], List[str], List[int]]:
+        """Arreglo configuración × protocolo × semilla × métrica (NaN donde falta la corrida)"""
+        configs = [c for c in self.configs if c in metrics_data]
+        protocols = [p for p in self.protocols if any(p in metrics_data[c] for c in configs)]
+        cells = []
+        for c, config in enumerate(configs):
+            for p, protocol in enumerate(protocols):
+                for run_key, run_data in metrics_data[config].get(protocol, {}).items():
+                    seed = self.run_seed(config, protocol, run_key)
+                    if seed is None:
+                        logging.warning(f"Corrida sin semilla identificable: {config}/{protocol}/{run_key}")
+                        continue
+                    row = [run_data[m].dropna().mean() if m in run_data.columns else np.nan for m in self.metrics]
+                    cells.append((c, p, seed, row))
+
+        seeds = sorted({seed for _, _, seed, _ in cells})
+        seed_pos = {seed: i for i, seed in enumerate(seeds)}
+        values = np.full((len(configs), len(protocols), len(seeds), len(self.metrics)), np.nan)
+        for c, p, seed, row in cells:
+            values[c, p, seed_pos[seed]] = row
+        return values, configs, protocols, seeds
+
+    def paired_impact(self, metrics_data: Dict) -> pd.DataFrame:
+        """Diferencias pareadas por semilla de cada configuración de ataque respecto de la base"""
+        values, configs, protocols, seeds = self.build_array(metrics_data)
+        if BASELINE_CONFIG not in configs:
+            logging.warning(f"Sin configuración base {BASELINE_CONFIG}, no se calcula el impacto pareado")
+            return pd.DataFrame()
+        attacks = [c for c in configs if c != BASELINE_CONFIG]
+        if not attacks:
+            return pd.DataFrame()
+
+        base = values[configs.index(BASELINE_CONFIG)]                       # protocolo × semilla × métrica
+        attack = values[[configs.index(c) for c in attacks]]                # ataque × protocolo × semilla × métrica
+        delta = attack - base[np.newaxis]
+        paired = ~np.isnan(delta)
+        n = paired.sum(axis=2)
+
+        with warnings.catch_warnings(), np.errstate(divide='ignore', invalid='ignore'):
+            warnings.simplefilter('ignore', RuntimeWarning)
+            mean = np.nanmean(delta, axis=2)
+            sd = np.nanstd(delta, axis=2, ddof=1)
+            base_mean = np.nanmean(np.where(paired, base[np.newaxis], np.nan), axis=2)
+            t_crit = stats.t.ppf(0.5 + self.confidence / 2, n - 1)
+            half_width = t_crit * sd / np.sqrt(n)
+            p_value = 2 * stats.t.sf(np.abs(mean / (sd / np.sqrt(n))), n - 1)
+
+            # Misma comparación ignorando el pareo (medias independientes, Welch) con todas las corridas
+            var_a = np.nanvar(attack, axis=2, ddof=1) / np.sum(~np.isnan(attack), axis=2)
+            var_b = np.nanvar(base, axis=1, ddof=1)[np.newaxis] / np.sum(~np.isnan(base), axis=1)[np.newaxis]
+            dof = (var_a + var_b) ** 2 / (var_a ** 2 / (np.sum(~np.isnan(attack), axis=2) - 1) +
+                                          var_b ** 2 / (np.sum(~np.isnan(base), axis=1)[np.newaxis] - 1))
+            unpaired_half_width = stats.t.ppf(0.5 + self.confidence / 2, dof) * np.sqrt(var_a + var_b)
+            seed_factor = (unpaired_half_width / half_width) ** 2
+            # Impacto relativo a la base; sin definir si la media base es cero (p. ej. pérdidas sin ataque)
+            nonzero = base_mean != 0
+            impact = np.where(nonzero, 100 * mean / np.abs(base_mean), np.nan)
+            impact_low = np.where(nonzero, 100 * (mean - half_width) / np.abs(base_mean), np.nan)
+            impact_high = np.where(nonzero, 100 * (mean + half_width) / np.abs(base_mean), np.nan)
+
+        a_idx, p_idx, m_idx = np.indices(mean.shape)
+        df = pd.DataFrame({
+            'Configuración': np.array(attacks)[a_idx.ravel()],
+            'Protocolo': np.array(protocols)[p_idx.ravel()],
+            'Métrica': np.array(self.metrics)[m_idx.ravel()],
+            'Pares': n.ravel(),
+            'Base': base_mean.ravel(),
+            'Delta': mean.ravel(),
+            'IC inferior': (mean - half_width).ravel(),
+            'IC superior': (mean + half_width).ravel(),
+            'Impacto (%)': impact.ravel(),
+            'Impacto IC inferior (%)': impact_low.ravel(),
+            'Impacto IC superior (%)': impact_high.ravel(),
+            'p': p_value.ravel(),
+            'Semiancho pareado': half_width.ravel(),
+            'Semiancho no pareado': unpaired_half_width.ravel(),
+            'Factor de semillas': seed_factor.ravel()
+        })
+        df = df[df['Pares'] > 0].replace([np.inf, -np.inf], np.nan)
+        unpaired = int((df['Pares'] < 2).sum())
+        if unpaired:
+            logging.warning(f"{unpaired} celdas con menos de 2 semillas en común con la base, sin IC")
+        return df.reset_index(drop=True)
+
+    def run_analysis(self, metrics_data: Dict) -> pd.DataFrame:
+        """Calcula el impacto pareado y guarda la tabla y el gráfico"""
+        logging.info("Iniciando análisis de impacto pareado por semilla...")
+        try:
+            df = self.paired_impact(metrics_data)
+            if df.empty:
+                logging.warning("No hay corridas pareadas por semilla para calcular el impacto de ataques")
+                return df
+
+            tables_dir = self.results_dir / 'tables'
+            tables_dir.mkdir(parents=True, exist_ok=True)
+            self.writer.write_csv(df.round(6), tables_dir / 'paired_attack_impact.csv', index=False)
+
+            if self.generate_plots:
+                try:
+                    self._plot_impact(df)
+                except Exception as e:
+                    logging.error(f"Error al generar gráfico de impacto pareado: {str(e)}")
+
+            factor = df['Factor de semillas'].median()
+            if not math.isnan(factor):
+                logging.info(f"Impacto pareado: mediana del factor de semillas {factor:.2f} "
+                             "(semillas independientes necesarias por semilla pareada para el mismo IC)")
+            return df
+        except Exception as e:
+            logging.error(f"Error en el análisis de impacto pareado: {str(e)}")
+            raise
+
+    def _plot_impact(self, df: pd.DataFrame):
+        """Impacto relativo por protocolo y ataque con el IC pareado"""
+        import plotly.express as px
+
+        plot = df.assign(error_plus=df['Impacto IC superior (%)'] - df['Impacto (%)'],
+                         error_minus=df['Impacto (%)'] - df['Impacto IC inferior (%)'])
+        fig = px.bar(plot, x='Protocolo', y='Impacto (%)', color='Configuración', barmode='group',
+                     facet_col='Métrica', facet_col_wrap=2, error_y='error_plus', error_y_minus='error_minus',
+                     title=f'Impacto de los ataques pareado por semilla (IC {self.confidence:.0%})')
+        fig.update_yaxes(matches=None)
+        graphs_dir = self.results_dir / 'graphs'
+        graphs_dir.mkdir(parents=True, exist_ok=True)
+        self.writer.write_html(fig, str(graphs_dir / 'paired_attack_impact.html'))
+
+if __name__ == "__main__":
+    import sys
+    from run_analysis import SimulationAnalyzer
+
+    if len(sys.argv) != 2:
+        print("Uso: python paired_impact.py <directorio_simulacion>")
+        sys.exit(1)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    metrics_data = SimulationAnalyzer(sys.argv[1]).load_metrics()
+    PairedImpactAnalyzer(sys.argv[1]).run_analysis(metrics_data)
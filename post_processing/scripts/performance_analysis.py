@@ -1,26 +1,30 @@
 #!/usr/bin/env python3
 
+import io
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from pathlib import Path
 import logging
-from typing import Dict, List
-import plotly.express as px
-import plotly.graph_objects as go
-from scipy import stats
+from typing import Dict, List, Optional
+
+from sweep_index import get_sweep_index, KNOWN_CONFIGS, KNOWN_PROTOCOLS, BASELINE_CONFIG
+from log_io import read_csv
+from output_writer import get_writer
+from output_tree import DEFAULT_RESULTS_DIR
+from report_assets import get_report_assets
+
+# Las librerías de gráficos se importan solo en los métodos que las usan
 
 class PerformanceAnalyzer:
-    def __init__(self, simulation_dir: str):
+    def __init__(self, simulation_dir: str, generate_plots: bool = True, results_dir: str = None):
         self.simulation_dir = Path(simulation_dir)
-        self.results_dir = Path('post_processing/results')
-        self.configs = ['no_mal_no_int', 'int_no_mal', 'mal_no_int', 'mal_int']
-        self.protocols = ['AODV', 'OLSR', 'DSDV', 'DSR']
-        
-    def analyze_performance_metrics(self, metrics_data: Dict):
-        """Analiza métricas relacionadas con rendimiento"""
-        performance_metrics = {
+        self.generate_plots = generate_plots
+        self.results_dir = Path(results_dir or DEFAULT_RESULTS_DIR)
+        self.writer = get_writer()
+        self.index = get_sweep_index(simulation_dir)
+        self.configs = self.index.configs or list(KNOWN_CONFIGS)
+        self.protocols = self.index.protocols or list(KNOWN_PROTOCOLS)
+        self.performance_metrics = {
             'throughput_promedio': 'Throughput de red',
             'delay_promedio': 'Latencia de red',
             'jitter_promedio': 'Jitter de red',
@@ -32,12 +36,52 @@ class PerformanceAnalyzer:
             'tiempo_simulacion': 'Tiempo de simulación'
         }
         
-        for metric, description in performance_metrics.items():
-            self._analyze_performance_metric(metrics_data, metric, description)
+    def analyze_performance_metrics(self, metrics_data: Dict) -> Dict[str, pd.DataFrame]:
+        """Analiza métricas relacionadas con rendimiento; devuelve las estadísticas por protocolo"""
+        protocol_stats = {}
+        for metric, description in self.performance_metrics.items():
+            stats = self._analyze_performance_metric(metrics_data, metric, description)
+            if stats is not None:
+                protocol_stats[metric] = stats
+        return protocol_stats
             
-    def _analyze_performance_metric(self, metrics_data: Dict, metric: str, description: str):
-        """Analiza una métrica específica de rendimiento"""
-        # Crear DataFrame para análisis
+    def _analyze_performance_metric(self, metrics_data: Dict, metric: str,
+                                    description: str) -> Optional[pd.DataFrame]:
+        """Analiza una métrica específica de rendimiento; devuelve las estadísticas por protocolo"""
+        df = self._metric_values(metrics_data, metric)
+        if df is None:
+            logging.warning(f"No se encontraron datos para la métrica {metric}")
+            return None
+        
+        # Asegurarse de que el directorio de tablas existe
+        tables_dir = self.results_dir / 'tables'
+        tables_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Análisis estadístico
+        stats_by_config = df.groupby('config')['value'].agg(['mean', 'std', 'min', 'max'])
+        stats_by_protocol = df.groupby('protocol')['value'].agg(['mean', 'std', 'min', 'max'])
+        
+        # Guardar estadísticas
+        self.writer.write_csv(stats_by_config, str(tables_dir / f'{metric}_by_config.csv'))
+        self.writer.write_csv(stats_by_protocol, str(tables_dir / f'{metric}_by_protocol.csv'))
+        
+        # Generar gráficos
+        if self.generate_plots:
+            self._plot_performance_metric(df, metric, description)
+        return stats_by_protocol
+        
+    def plot_performance_metrics(self, metrics_data: Dict, interactive: bool = True, violin: bool = True):
+        """Genera solo los gráficos de las métricas de rendimiento (sin escribir tablas).
+        
+        interactive: gráficos HTML de plotly; violin: gráficos de violín con pyplot.
+        """
+        for metric, description in self.performance_metrics.items():
+            df = self._metric_values(metrics_data, metric)
+            if df is not None:
+                self._plot_performance_metric(df, metric, description, interactive, violin)
+        
+    def _metric_values(self, metrics_data: Dict, metric: str) -> Optional[pd.DataFrame]:
+        """Valor medio de la métrica por corrida: (config, protocol, run, value)"""
         data = []
         for config in self.configs:
             for protocol in self.protocols:
@@ -56,32 +100,24 @@ class PerformanceAnalyzer:
                             })
         
         if not data:  # Si no hay datos, salir
-            logging.warning(f"No se encontraron datos para la métrica {metric}")
-            return
-            
-        df = pd.DataFrame(data)
-        
-        # Asegurarse de que el directorio de tablas existe
-        tables_dir = self.results_dir / 'tables'
-        tables_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Análisis estadístico
-        stats_by_config = df.groupby('config')['value'].agg(['mean', 'std', 'min', 'max'])
-        stats_by_protocol = df.groupby('protocol')['value'].agg(['mean', 'std', 'min', 'max'])
+            return None
+        return pd.DataFrame(data)
         
-        # Guardar estadísticas
-        stats_by_config.to_csv(str(tables_dir / f'{metric}_by_config.csv'))
-        stats_by_protocol.to_csv(str(tables_dir / f'{metric}_by_protocol.csv'))
-        
-        # Generar gráficos
-        self._plot_performance_metric(df, metric, description)
-        
-    def _plot_performance_metric(self, df: pd.DataFrame, metric: str, description: str):
+    def _plot_performance_metric(self, df: pd.DataFrame, metric: str, description: str,
+                          interactive: bool = True, violin: bool = True):
         """Genera gráficos para una métrica de rendimiento"""
-        # Gráfico de barras por configuración
-        fig = px.box(df, x='config', y='value', color='protocol',
-                    title=f'{description} por Configuración y Protocolo')
-        fig.write_html(str(self.results_dir / 'graphs' / f'{metric}_performance.html'))
+        if interactive:
+            import plotly.express as px
+            
+            # Gráfico de barras por configuración
+            fig = px.box(df, x='config', y='value', color='protocol',
+                        title=f'{description} por Configuración y Protocolo')
+            self.writer.write_html(fig, str(self.results_dir / 'graphs' / f'{metric}_performance.html'))
+        
+        if not violin:
+            return
+        import matplotlib.pyplot as plt
+        import seaborn as sns
         
         # Gráfico de violín
         plt.figure(figsize=(12, 6))
@@ -89,7 +125,7 @@ class PerformanceAnalyzer:
         plt.title(f'Distribución de {description}')
         plt.xticks(rotation=45)
         plt.tight_layout()
-        plt.savefig(str(self.results_dir / 'graphs' / f'{metric}_violin.png'))
+        self.writer.write_figure(str(self.results_dir / 'graphs' / f'{metric}_violin.png'))
         plt.close()
         
     def analyze_efficiency(self, metrics_data: Dict):
@@ -113,12 +149,12 @@ class PerformanceAnalyzer:
         try:
             efficiency_data = []
             
-            # Obtener el valor base (no_mal_no_int)
+            # Obtener el valor base (configuración sin nodos maliciosos ni interferentes)
             base_values = []
-            if 'no_mal_no_int' in metrics_data:
+            if BASELINE_CONFIG in metrics_data:
                 for protocol in self.protocols:
-                    if protocol in metrics_data['no_mal_no_int']:
-                        for run_data in metrics_data['no_mal_no_int'][protocol].values():
+                    if protocol in metrics_data[BASELINE_CONFIG]:
+                        for run_data in metrics_data[BASELINE_CONFIG][protocol].values():
                             if isinstance(run_data, pd.DataFrame) and metric in run_data.columns:
                                 values = run_data[metric].dropna().values
                                 if len(values) > 0:
@@ -192,20 +228,22 @@ class PerformanceAnalyzer:
             
             # Guardar resultados
             try:
-                df.to_csv(tables_dir / f'{metric}_efficiency.csv', index=False)
+                self.writer.write_csv(df, tables_dir / f'{metric}_efficiency.csv', index=False)
             except Exception as e:
                 logging.error(f"Error al guardar resultados de eficiencia para {metric}: {str(e)}")
                 return
             
             # Generar gráfico solo si hay datos
-            if not df.empty:
+            if self.generate_plots and not df.empty:
                 try:
+                    import plotly.express as px
+                    
                     fig = px.bar(df, x='Protocolo', y='Eficiencia', color='Configuración',
                                title=f'Eficiencia de {description}',
                                labels={'Eficiencia': f'Eficiencia de {description}',
                                      'Protocolo': 'Protocolo de Enrutamiento'})
                     
-                    fig.write_html(str(graphs_dir / f'{metric}_efficiency.html'))
+                    self.writer.write_html(fig, str(graphs_dir / f'{metric}_efficiency.html'))
                 except Exception as e:
                     logging.error(f"Error al generar gráfico de eficiencia para {metric}: {str(e)}")
             
@@ -214,7 +252,7 @@ class PerformanceAnalyzer:
             raise
         
     def analyze_scalability(self, metrics_data: Dict):
-        """Analiza la escalabilidad de la red"""
+        """Throughput por flujo de cada celda (las curvas por cantidad de nodos están en scalability_analysis.py)"""
         try:
             scalability_data = []
             
@@ -252,11 +290,13 @@ class PerformanceAnalyzer:
             tables_dir.mkdir(parents=True, exist_ok=True)
             
             # Guardar resultados
-            df.to_csv(tables_dir / 'scalability_analysis.csv', index=False)
+            self.writer.write_csv(df, tables_dir / 'scalability_analysis.csv', index=False)
             
             # Generar gráfico solo si hay datos
-            if not df.empty:
+            if self.generate_plots and not df.empty:
                 try:
+                    import plotly.express as px
+                    
                     fig = px.bar(df, x='Protocolo', y='Throughput por Flujo', color='Configuración',
                                title='Análisis de Escalabilidad',
                                labels={'Throughput por Flujo': 'Throughput por Flujo',
@@ -266,7 +306,7 @@ class PerformanceAnalyzer:
                     graphs_dir = self.results_dir / 'graphs'
                     graphs_dir.mkdir(parents=True, exist_ok=True)
                     
-                    fig.write_html(str(graphs_dir / 'scalability_analysis.html'))
+                    self.writer.write_html(fig, str(graphs_dir / 'scalability_analysis.html'))
                 except Exception as e:
                     logging.error(f"Error al generar gráfico de escalabilidad: {str(e)}")
             
@@ -274,8 +314,85 @@ class PerformanceAnalyzer:
             logging.error(f"Error en el análisis de escalabilidad: {str(e)}")
             raise
 
-    def generate_performance_report(self, metrics_data: Dict):
-        """Genera un reporte de rendimiento"""
+    def load_node_timeseries(self, config: str, protocol: str, run: str) -> Optional[pd.DataFrame]:
+        """Serie temporal por nodo de una corrida (metrics/node_timeseries.csv) con el tipo de nodo.
+
+        El simulador escribe una fila por nodo e intervalo solo si el nodo envió,
+        recibió o perdió paquetes; los intervalos ausentes valen cero. Devuelve
+        None si la corrida es de una versión anterior del simulador sin este log.
+        """
+        path = self.index.artefact_path(config, protocol, run, 'node_timeseries')
+        if path is None:
+            return None
+        try:
+            df = read_csv(path)
+        except pd.errors.EmptyDataError:
+            return None
+        nodes_path = self.index.artefact_path(config, protocol, run, 'nodes')
+        if nodes_path is not None:
+            nodes = read_csv(nodes_path, usecols=['node_id', 'node_type'])
+            df = df.merge(nodes, on='node_id', how='left')
+        else:
+            df['node_type'] = np.nan
+        return df
+
+    def analyze_node_load(self) -> pd.DataFrame:
+        """Carga por nodo y tipo de nodo a partir de la serie temporal por nodo"""
+        try:
+            rows = []
+            for config in self.configs:
+                for protocol in self.protocols:
+                    for run in self.index.runs(config, protocol):
+                        df = self.load_node_timeseries(config, protocol, run)
+                        if df is None or df.empty:
+                            continue
+                        per_node = df.groupby(['node_type', 'node_id'], dropna=False)[
+                            ['tx_packets', 'tx_bytes', 'rx_bytes', 'lost_packets']].sum()
+                        duration = df['time'].max() - df['time'].min() + 1.0
+                        for node_type, nodes in per_node.groupby(level='node_type', dropna=False):
+                            tx = nodes['tx_bytes'].to_numpy(dtype=float)
+                            senders = tx[tx > 0]
+                            # Índice de Jain sobre los bytes enviados: 1 si todos los emisores envían lo mismo
+                            fairness = senders.sum() ** 2 / (len(senders) * (senders ** 2).sum()) if len(senders) else np.nan
+                            sent = nodes['tx_packets'].sum()
+                            rows.append({
+                                'config': config, 'protocol': protocol, 'run': run, 'node_type': node_type,
+                                'active_nodes': len(nodes),
+                                'tx_packets_per_node': sent / len(nodes),
+                                'loss': 100.0 * nodes['lost_packets'].sum() / sent if sent else np.nan,
+                                'rx_throughput': nodes['rx_bytes'].sum() * 8.0 / duration / 1000,
+                                'fairness': fairness
+                            })
+
+            if not rows:
+                logging.warning("No se encontraron series temporales por nodo (metrics/node_timeseries.csv)")
+                return pd.DataFrame()
+
+            per_run = pd.DataFrame(rows)
+            summary = per_run.groupby(['config', 'protocol', 'node_type'], sort=False).agg(
+                runs=('run', 'nunique'), active_nodes=('active_nodes', 'mean'),
+                tx_packets_per_node=('tx_packets_per_node', 'mean'), loss=('loss', 'mean'),
+                rx_throughput=('rx_throughput', 'mean'), fairness=('fairness', 'mean')).reset_index()
+            summary = summary.rename(columns={
+                'config': 'Configuración', 'protocol': 'Protocolo', 'node_type': 'Tipo de nodo',
+                'runs': 'Corridas', 'active_nodes': 'Nodos activos',
+                'tx_packets_per_node': 'Paquetes enviados por nodo', 'loss': 'Pérdida (%)',
+                'rx_throughput': 'Throughput recibido (Kbps)', 'fairness': 'Equidad de Jain'})
+
+            tables_dir = self.results_dir / 'tables'
+            tables_dir.mkdir(parents=True, exist_ok=True)
+            self.writer.write_csv(summary.round(4), tables_dir / 'node_load.csv', index=False)
+            return summary
+        except Exception as e:
+            logging.error(f"Error en el análisis de carga por nodo: {str(e)}")
+            raise
+
+    def generate_performance_report(self, metrics_data: Dict, protocol_stats: Dict[str, pd.DataFrame] = None):
+        """Genera un reporte de rendimiento.
+        
+        protocol_stats son las estadísticas por protocolo de analyze_performance_metrics;
+        si no se pasan, se ejecutan aquí los análisis de métricas, eficiencia y escalabilidad.
+        """
         try:
             # Asegurarse de que los directorios necesarios existen
             self.results_dir.mkdir(parents=True, exist_ok=True)
@@ -283,23 +400,25 @@ class PerformanceAnalyzer:
             (self.results_dir / 'graphs').mkdir(exist_ok=True)
             (self.results_dir / 'reports').mkdir(exist_ok=True)
             
-            # Análisis de métricas de rendimiento
-            try:
-                self.analyze_performance_metrics(metrics_data)
-            except Exception as e:
-                logging.error(f"Error en el análisis de métricas de rendimiento: {str(e)}")
-            
-            # Análisis de eficiencia
-            try:
-                self.analyze_efficiency(metrics_data)
-            except Exception as e:
-                logging.error(f"Error en el análisis de eficiencia: {str(e)}")
-            
-            # Análisis de escalabilidad
-            try:
-                self.analyze_scalability(metrics_data)
-            except Exception as e:
-                logging.error(f"Error en el análisis de escalabilidad: {str(e)}")
+            if protocol_stats is None:
+                # Análisis de métricas de rendimiento
+                try:
+                    protocol_stats = self.analyze_performance_metrics(metrics_data)
+                except Exception as e:
+                    logging.error(f"Error en el análisis de métricas de rendimiento: {str(e)}")
+                    protocol_stats = {}
+                
+                # Análisis de eficiencia
+                try:
+                    self.analyze_efficiency(metrics_data)
+                except Exception as e:
+                    logging.error(f"Error en el análisis de eficiencia: {str(e)}")
+                
+                # Análisis de escalabilidad
+                try:
+                    self.analyze_scalability(metrics_data)
+                except Exception as e:
+                    logging.error(f"Error en el análisis de escalabilidad: {str(e)}")
             
             # Generar reporte PDF
             try:
@@ -308,8 +427,9 @@ class PerformanceAnalyzer:
                 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
                 from reportlab.lib.styles import getSampleStyleSheet
                 
-                report_path = str(self.results_dir / 'reports' / 'performance_report.pdf')
-                doc = SimpleDocTemplate(report_path, pagesize=letter)
+                report_path = self.results_dir / 'reports' / 'performance_report.pdf'
+                buffer = io.BytesIO()
+                doc = SimpleDocTemplate(buffer, pagesize=letter)
                 styles = getSampleStyleSheet()
                 elements = []
                 
@@ -337,9 +457,8 @@ class PerformanceAnalyzer:
                 # Generar conclusiones automáticamente
                 for metric in ['throughput_promedio', 'delay_promedio', 'perdida_paquetes', 'pdr']:
                     try:
-                        metric_file = self.results_dir / 'tables' / f'{metric}_by_protocol.csv'
-                        if metric_file.exists():
-                            metric_data = pd.read_csv(metric_file)
+                        metric_data = protocol_stats.get(metric)
+                        if metric_data is not None:
                             if not metric_data.empty:
                                 best_protocol = metric_data.loc[metric_data['mean'].idxmax() if metric == 'throughput_promedio' 
                                                               else metric_data['mean'].idxmin()]
@@ -353,7 +472,11 @@ class PerformanceAnalyzer:
                         logging.error(f"Error al generar conclusión para {metric}: {str(e)}")
                         continue
                 
+                # Gráficos ya generados, reducidos y cacheados por contenido
+                elements.extend(get_report_assets(self.results_dir).flowables('performance', styles))
+                
                 doc.build(elements)
+                self.writer.write_bytes(report_path, buffer.getvalue())
                 
             except Exception as e:
                 logging.error(f"Error al generar el reporte PDF: {str(e)}")
@@ -408,12 +531,15 @@ class PerformanceAnalyzer:
                     graphs_dir = self.results_dir / 'graphs'
                     graphs_dir.mkdir(parents=True, exist_ok=True)
                     
+                    import matplotlib.pyplot as plt
+                    import seaborn as sns
+                    
                     plt.figure(figsize=(10, 8))
                     sns.heatmap(mean_correlation, annot=True, cmap='coolwarm', center=0, 
                               mask=mean_correlation.isna(), fmt='.2f')
                     plt.title(f'Correlación entre Métricas para {metric}')
                     plt.tight_layout()
-                    plt.savefig(str(graphs_dir / f'{metric}_correlation.png'))
+                    self.writer.write_figure(str(graphs_dir / f'{metric}_correlation.png'))
                     plt.close()
                 else:
                     logging.warning(f"No hay datos válidos para generar el mapa de calor de correlación para {metric}")
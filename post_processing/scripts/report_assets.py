@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+
+import io
+import json
+import hashlib
+import importlib.util
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from output_writer import publish
+from output_tree import DEFAULT_RESULTS_DIR
+
+try:
+    from PIL import Image as PILImage
+except ImportError:  # sin Pillow se insertan los PNG originales, sin reducir
+    PILImage = None
+
+# plotly exporta imágenes con kaleido; se comprueba sin importarlo (tarda en cargar)
+HAS_KALEIDO = importlib.util.find_spec('kaleido') is not None
+
+ASSETS_DIR = '.report_assets'
+# Cambiar al modificar la forma de rasterizar: invalida los recursos ya guardados
+ASSET_VERSION = 1
+
+# Gráficos de results/graphs que entran en cada reporte. Los violines se comparten entre los
+# reportes de seguridad y de rendimiento: se rasterizan una vez y ambos usan el mismo recurso.
+REPORT_FIGURES = {
+    'analysis': ['*_boxplot.png', '*_correlation.png', '*_temporal.html'],
+    'security': ['perdida_paquetes_violin.png', 'delay_promedio_violin.png', 'jitter_promedio_violin.png',
+                 'throughput_promedio_violin.png', 'pdr_violin.png', '*_security.html', '*_attack_impact.html',
+                 'paired_attack_impact.html'],
+    'performance': ['*_violin.png', '*_performance.html', '*_efficiency.html', 'scalability_curves.html',
+                    'scalability_analysis.html', 'routing_overhead.html']
+}
+
+_assets: Dict[Path, 'ReportAssets'] = {}
+_assets_lock = threading.Lock()
+
+
+def _plotly_figure(html: bytes):
+    """Reconstruye la figura de plotly a partir del HTML que escribe fig.to_html"""
+    import plotly.io as pio
+
+    text = html.decode('utf-8')
+    start = text.find('Plotly.newPlot(')
+    if start < 0:
+        return None
+    decoder = json.JSONDecoder()
+    position = start + len('Plotly.newPlot(')
+    values = []
+    # Argumentos: id del div, datos y layout
+    while len(values) < 3:
+        while text[position] in ' \t\r\n,':
+            position += 1
+        value, position = decoder.raw_decode(text, position)
+        values.append(value)
+    return pio.from_json(json.dumps({'data': values[1], 'layout': values[2]}))
+
+
+class ReportAssets:
+    """Caché de los gráficos rasterizados para los reportes PDF.
+
+    Cada gráfico se reduce una sola vez al tamaño con el que entra en la página
+    (`width_in` pulgadas a `dpi`) y se guarda en `<resultados>/.report_assets/`
+    con el SHA-1 del archivo original y de los parámetros de rasterizado como
+    nombre: si el gráfico no cambió, los reportes siguientes reutilizan el
+    recurso sin volver a decodificar el PNG original, y un mismo gráfico usado
+    en varios reportes se rasteriza una vez. Los HTML de plotly se exportan solo
+    si está instalado kaleido; si no, se omiten.
+    """
+
+    def __init__(self, results_dir: Optional[str] = None, width_in: float = 3.1, dpi: int = 150,
+                 max_figures: int = 40):
+        self.results_dir = Path(results_dir or DEFAULT_RESULTS_DIR)
+        self.cache_dir = self.results_dir / ASSETS_DIR
+        self.width_in = width_in
+        self.dpi = dpi
+        self.max_figures = max_figures
+        self.lock = threading.Lock()
+        self.key_locks: Dict[str, threading.Lock] = {}
+        # Archivo original (ruta, mtime, tamaño) -> recurso rasterizado (ruta, ancho y alto en px)
+        self.memo: Dict[Tuple[Path, int, int], Optional[Tuple[Path, int, int]]] = {}
+        self.stats = {'rendered': 0, 'cached': 0, 'skipped': 0}
+        self.warned_kaleido = False
+
+    @property
+    def width_px(self) -> int:
+        return int(self.width_in * self.dpi)
+
+    def figures(self, report: str) -> List[Path]:
+        """Gráficos existentes de un reporte, en orden estable y sin repetidos"""
+        graphs_dir = self.results_dir / 'graphs'
+        found = []
+        for pattern in REPORT_FIGURES[report]:
+            for path in sorted(graphs_dir.glob(pattern)):
+                if path not in found:
+                    found.append(path)
+        return found
+
+    def asset(self, source: Path) -> Optional[Tuple[Path, int, int]]:
+        """Recurso rasterizado de un gráfico (ruta, ancho y alto en px); None si no se puede rasterizar"""
+        try:
+            stat = source.stat()
+        except OSError:
+            return None
+        memo_key = (source, stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            if memo_key in self.memo:
+                return self.memo[memo_key]
+        data = source.read_bytes()
+        key = hashlib.sha1(data + f'{ASSET_VERSION}:{self.width_px}:{self.dpi}'.encode()).hexdigest()
+        with self.lock:
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+        # Dos reportes que piden el mismo gráfico a la vez: uno lo rasteriza y el otro espera
+        with key_lock:
+            target = self.cache_dir / f'{key}.png'
+            result = None
+            if target.exists() and PILImage is not None:
+                with PILImage.open(target) as image:
+                    result = (target, *image.size)
+                with self.lock:
+                    self.stats['cached'] += 1
+            else:
+                result = self._render(source, data, target)
+            with self.lock:
+                self.memo[memo_key] = result
+        return result
+
+    def _render(self, source: Path, data: bytes, target: Path) -> Optional[Tuple[Path, int, int]]:
+        if source.suffix == '.html':
+            if not HAS_KALEIDO:
+                if not self.warned_kaleido:
+                    self.warned_kaleido = True
+                    logging.info("kaleido no está instalado: los gráficos de plotly no se insertan en los reportes")
+                with self.lock:
+                    self.stats['skipped'] += 1
+                return None
+            try:
+                fig = _plotly_figure(data)
+                if fig is None:
+                    raise ValueError("no contiene una figura de plotly")
+                data = fig.to_image(format='png', width=self.width_px * 2, height=int(self.width_px * 1.4))
+            except Exception as e:
+                logging.warning(f"No se pudo exportar {source.name} para el reporte: {str(e)}")
+                with self.lock:
+                    self.stats['skipped'] += 1
+                return None
+
+        if PILImage is None:
+            # Sin Pillow no hay cómo reducirlo ni medirlo: reportlab lo lee tal cual
+            return (source, 0, 0) if source.suffix == '.png' else None
+        with PILImage.open(io.BytesIO(data)) as image:
+            image = image.convert('RGB')
+            if image.width > self.width_px:
+                image = image.resize((self.width_px, round(image.height * self.width_px / image.width)),
+                                     PILImage.LANCZOS)
+            # Los gráficos tienen pocos colores: la paleta de 256 reduce el PNG sin pérdida visible
+            image = image.quantize(colors=256, method=PILImage.Quantize.MEDIANCUT)
+            buffer = io.BytesIO()
+            image.save(buffer, format='PNG', optimize=True, dpi=(self.dpi, self.dpi))
+            size = image.size
+        publish(target, buffer.getvalue())
+        with self.lock:
+            self.stats['rendered'] += 1
+        return (target, *size)
+
+    def flowables(self, report: str, styles) -> List:
+        """Sección de gráficos de un reporte: grilla de dos columnas con los recursos rasterizados"""
+        from reportlab.lib.units import inch
+        from reportlab.platypus import Image, Paragraph, Spacer, Table, TableStyle
+
+        figures = self.figures(report)
+        if len(figures) > self.max_figures:
+            # Se recorta antes de rasterizar: los gráficos que no entran no se procesan
+            logging.info(f"Reporte {report}: se insertan {self.max_figures} de {len(figures)} gráficos")
+            figures = figures[:self.max_figures]
+
+        cells = []
+        for source in figures:
+            asset = self.asset(source)
+            if asset is None:
+                continue
+            path, width, height = asset
+            draw_width = self.width_in * inch
+            draw_height = draw_width * height / width if width else draw_width * 0.6
+            cells.append([Image(str(path), width=draw_width, height=draw_height),
+                          Paragraph(source.stem.replace('_', ' '), styles['Italic'])])
+        if not cells:
+            return []
+
+        rows = [cells[i:i + 2] for i in range(0, len(cells), 2)]
+        rows[-1] += [''] * (2 - len(rows[-1]))
+        table = Table(rows, colWidths=[self.width_in * inch + 6] * 2)
+        table.setStyle(TableStyle([('VALIGN', (0, 0), (-1, -1), 'TOP'),
+                                   ('LEFTPADDING', (0, 0), (-1, -1), 3),
+                                   ('RIGHTPADDING', (0, 0), (-1, -1), 3)]))
+        return [Spacer(1, 12), Paragraph("Gráficos", styles['Heading1']), table]
+
+
+def get_report_assets(results_dir: Optional[str] = None) -> ReportAssets:
+    """Caché de recursos compartida por los reportes de un mismo árbol de resultados"""
+    root = Path(results_dir or DEFAULT_RESULTS_DIR).absolute()
+    with _assets_lock:
+        if root not in _assets:
+            _assets[root] = ReportAssets(str(root))
+        return _assets[root]
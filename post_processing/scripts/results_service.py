@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+import pandas as pd
+
+from sweep_index import get_sweep_index
+
+# Artefactos de los que depende cada endpoint: su huella forma parte de la clave de caché y del ETag
+ENDPOINT_ARTEFACTS = {
+    '/api/runs': None,
+    '/api/summary': ['metrics'],
+    '/api/attack-impact': ['metrics'],
+    '/api/timeseries': ['metrics', 'nodes', 'packets', 'packets_malicious', 'control', 'routing', 'energy']
+}
+ATTACK_IMPACT_METRICS = ['throughput_promedio', 'delay_promedio', 'perdida_paquetes', 'pdr']
+
+
+class LRUCache:
+    """Caché LRU en memoria, segura entre hilos.
+
+    get_or_compute calcula cada clave una sola vez aunque varias peticiones la
+    pidan a la vez: las demás esperan el resultado del primer hilo.
+    """
+
+    def __init__(self, maxsize: int = 64):
+        self.maxsize = maxsize
+        self._data: 'OrderedDict[Tuple, object]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+        return None
+
+    def put(self, key: Tuple, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key: Tuple, compute: Callable):
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            key_lock = self._pending.setdefault(key, threading.Lock())
+        with key_lock:
+            value = self.get(key)
+            if value is not None:
+                return value
+            with self._lock:
+                self.misses += 1
+            try:
+                value = compute()
+                self.put(key, value)
+            finally:
+                with self._lock:
+                    self._pending.pop(key, None)
+        return value
+
+    def __len__(self):
+        return len(self._data)
+
+
+def _records(df: Optional[pd.DataFrame]) -> List[Dict]:
+    """Filas de un DataFrame como dicts JSON (NaN -> null)"""
+    if df is None or df.empty:
+        return []
+    df = df.replace([np.inf, -np.inf], np.nan)
+    df = df.astype(object).where(pd.notna(df), None)
+    return [{k: (v.item() if isinstance(v, np.generic) else v) for k, v in row.items()}
+            for row in df.to_dict('records')]
+
+
+class ResultsService:
+    """Resultados del barrido como JSON, calculados bajo demanda y cacheados por huella de entradas.
+
+    La huella de cada endpoint sale del índice del barrido (ruta, tamaño y mtime
+    de los artefactos que usa). Mientras no cambie, las respuestas se sirven
+    desde la caché y el ETag permite responder 304 sin recalcular nada.
+    """
+
+    def __init__(self, simulation_dir: str, cache_size: int = 64, check_interval: float = 2.0):
+        self.simulation_dir = simulation_dir
+        self.cache = LRUCache(cache_size)
+        # Cada cuánto (s) se comprueba si el barrido cambió en disco
+        self.check_interval = check_interval
+        self._index_lock = threading.Lock()
+        self._index = get_sweep_index(simulation_dir)
+        self._checked = time.monotonic()
+        self.routes = {
+            '/api/runs': self.runs,
+            '/api/summary': self.summary,
+            '/api/attack-impact': self.attack_impact,
+            '/api/timeseries': self.timeseries
+        }
+
+    @property
+    def index(self):
+        """Índice del barrido, revalidado contra el disco como máximo cada check_interval segundos"""
+        with self._index_lock:
+            now = time.monotonic()
+            if now - self._checked >= self.check_interval:
+                self._checked = now
+                if not self._index.is_current(check_files=True):
+                    logging.info("El barrido cambió en disco: se reconstruye el índice")
+                    self._index = get_sweep_index(self.simulation_dir, refresh=True)
+            return self._index
+
+    def fingerprint(self, path: str) -> str:
+        return self.index.fingerprint(ENDPOINT_ARTEFACTS[path])
+
+    def etag(self, path: str, params: Dict[str, List[str]], fingerprint: str) -> str:
+        query = '&'.join(f'{k}={",".join(v)}' for k, v in sorted(params.items()))
+        return '"' + hashlib.sha1(f'{path}?{query}|{fingerprint}'.encode()).hexdigest()[:24] + '"'
+
+    def handle(self, path: str, params: Dict[str, List[str]], if_none_match: Optional[str]) -> Tuple[int, bytes, str]:
+        """Resuelve una petición: (estado HTTP, cuerpo JSON, ETag)"""
+        if path in ('/', '/api', '/api/'):
+            body = json.dumps({'endpoints': sorted(self.routes)}).encode()
+            return HTTPStatus.OK, body, ''
+        if path not in self.routes:
+            return HTTPStatus.NOT_FOUND, json.dumps({'error': f'Ruta desconocida: {path}'}).encode(), ''
+
+        fingerprint = self.fingerprint(path)
+        etag = self.etag(path, params, fingerprint)
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(',')]:
+            return HTTPStatus.NOT_MODIFIED, b'', etag
+
+        key = ('response', path, tuple(sorted((k, tuple(v)) for k, v in params.items())), fingerprint)
+        body = self.cache.get_or_compute(key, lambda: json.dumps(
+            {'fingerprint': fingerprint, 'data': self.routes[path](params)},
+            ensure_ascii=False, allow_nan=False).encode('utf-8'))
+        return HTTPStatus.OK, body, etag
+
+    # --- Datos compartidos entre endpoints (también cacheados por huella) ---
+
+    def _metrics_data(self) -> Dict:
+        from run_analysis import SimulationAnalyzer
+
+        key = ('metrics_data', self.index.fingerprint(['metrics']))
+        return self.cache.get_or_compute(key, lambda: SimulationAnalyzer(
+            self.simulation_dir, generate_plots=False).load_metrics())
+
+    def _cube(self):
+        # Cubo propio del barrido (como en compare): varios servicios sobre barridos distintos no se pisan
+        from compare import sweep_cube
+
+        key = ('cube', self.fingerprint('/api/timeseries'))
+        return self.cache.get_or_compute(key, lambda: sweep_cube(self.simulation_dir))
+
+    # --- Endpoints ---
+
+    @staticmethod
+    def _param(params: Dict[str, List[str]], name: str, default=None):
+        values = params.get(name)
+        return values[-1] if values else default
+
+    @staticmethod
+    def _list(params: Dict[str, List[str]], name: str) -> Optional[List[str]]:
+        values = [v for value in params.get(name, []) for v in value.split(',') if v]
+        return values or None
+
+    def runs(self, params: Dict[str, List[str]]) -> List[Dict]:
+        """Corridas del barrido con sus artefactos: ?config=&protocol="""
+        configs, protocols = self._list(params, 'config'), self._list(params, 'protocol')
+        index = self.index
+        return [{'config': config, 'protocol': protocol, 'run': run,
+                 'artefacts': sorted(index.tree[config][protocol][run])}
+                for config, protocol, run in index.iter_runs()
+                if (configs is None or config in configs) and (protocols is None or protocol in protocols)]
+
+    def summary(self, params: Dict[str, List[str]]) -> List[Dict]:
+        """Estadísticas resumen (como summary_statistics.csv): ?config=&protocol=&metric="""
+        from run_analysis import SimulationAnalyzer
+
+        analyzer = SimulationAnalyzer(self.simulation_dir, generate_plots=False)
+        df = analyzer.generate_summary_statistics(self._metrics_data())
+        for column, name in (('Configuración', 'config'), ('Protocolo', 'protocol'), ('Métrica', 'metric')):
+            values = self._list(params, name)
+            if values is not None and not df.empty:
+                df = df[df[column].isin(values)]
+        return _records(df)
+
+    def attack_impact(self, params: Dict[str, List[str]]) -> List[Dict]:
+        """Impacto relativo (%) de cada configuración de ataque respecto de la base: ?metric=&protocol="""
+        from security_analysis import SecurityAnalyzer
+
+        metrics = self._list(params, 'metric') or ATTACK_IMPACT_METRICS
+        protocols = self._list(params, 'protocol')
+        analyzer = SecurityAnalyzer(self.simulation_dir, generate_plots=False)
+        rows = []
+        for metric in metrics:
+            df = analyzer.compute_attack_impact(self._metrics_data(), metric)
+            if df is None:
+                continue
+            if protocols is not None:
+                df = df[df['protocol'].isin(protocols)]
+            rows.extend(dict(row, metric=metric) for row in _records(df))
+        return rows
+
+    def timeseries(self, params: Dict[str, List[str]]) -> List[Dict]:
+        """Serie temporal de una métrica del cubo: ?metric=&config=&protocol=&node_type=&start=&end=&by="""
+        metric = self._param(params, 'metric', 'throughput')
+        by = self._list(params, 'by') or ['config', 'protocol']
+        if 'time' not in by:
+            by.append('time')
+        cube = self._cube()
+        start, end = self._param(params, 'start'), self._param(params, 'end')
+        window = None
+        if start is not None or end is not None:
+            window = (float(start or 0.0), float(end) if end is not None else cube.n_bins * cube.bin_width)
+        df = cube.query(metric, self._list(params, 'config'), self._list(params, 'protocol'), window,
+                        self._list(params, 'node_type'), by)
+        return _records(df)
+
+
+class ResultsRequestHandler(BaseHTTPRequestHandler):
+    server_version = 'IoTResults/1.0'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        try:
+            status, body, etag = self.server.service.handle(url.path.rstrip('/') or '/', params,
+                                                            self.headers.get('If-None-Match'))
+        except (KeyError, ValueError) as e:
+            status, body, etag = HTTPStatus.BAD_REQUEST, json.dumps({'error': str(e)}, ensure_ascii=False).encode(), ''
+        except Exception as e:
+            logging.error(f"Error al atender {self.path}: {str(e)}")
+            status, body, etag = HTTPStatus.INTERNAL_SERVER_ERROR, json.dumps({'error': str(e)}).encode(), ''
+
+        self.send_response(status)
+        if etag:
+            self.send_header('ETag', etag)
+            # El cliente debe revalidar siempre: un 304 es barato y el barrido puede cambiar
+            self.send_header('Cache-Control', 'no-cache')
+        if status != HTTPStatus.NOT_MODIFIED:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if status != HTTPStatus.NOT_MODIFIED:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.info(f"{self.address_string()} - {format % args}")
+
+
+def create_server(simulation_dir: str, host: str = '127.0.0.1', port: int = 8050,
+                  cache_size: int = 64) -> ThreadingHTTPServer:
+    """Crea el servidor (un hilo por petición) sin ponerlo a atender"""
+    server = ThreadingHTTPServer((host, port), ResultsRequestHandler)
+    server.daemon_threads = True
+    server.service = ResultsService(simulation_dir, cache_size)
+    return server
+
+
+def serve(simulation_dir: str, host: str = '127.0.0.1', port: int = 8050, cache_size: int = 64):
+    """Atiende peticiones hasta Ctrl+C"""
+    server = create_server(simulation_dir, host, port, cache_size)
+    logging.info(f"Sirviendo resultados de {simulation_dir} en http://{host}:{server.server_address[1]}/api")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("Servidor detenido")
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servicio HTTP local con los resultados del barrido en JSON')
+    parser.add_argument('simulation_dir')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--cache-size', type=int, default=64, help='Respuestas que se conservan en memoria')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    try:
+        serve(args.simulation_dir, args.host, args.port, args.cache_size)
+    except Exception as e:
+        logging.error(f"Error fatal: {str(e)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from sweep_index import get_sweep_index, KNOWN_CONFIGS, KNOWN_PROTOCOLS
+from log_io import read_csv
+from output_writer import get_writer
+from output_tree import DEFAULT_RESULTS_DIR
+
+# Columnas de metrics.csv que suman la cantidad de nodos de la red
+NODE_COUNT_COLUMNS = ['nodos_fijos', 'nodos_moviles', 'nodos_maliciosos', 'nodos_interferentes']
+
+# DSR no tiene tabla de rutas recorrible: el simulador solo registra su overhead de control
+TABLELESS_PROTOCOLS = {'DSR'}
+
+class RoutingAnalyzer:
+    """Overhead de enrutamiento y estabilidad de rutas por (configuración, protocolo).
+
+    Consume los logs del simulador `routing_logs/control_messages.csv` (una fila
+    por mensaje de control transmitido) y `routing_logs/routing_table_changes.csv`
+    (diferencias ADD/DEL/CHG entre muestreos de la tabla de rutas). Los logs de
+    versiones anteriores del simulador, sin columna `change`, solo tienen filas de
+    relleno y se ignoran.
+    """
+
+    def __init__(self, simulation_dir: str, generate_plots: bool = True, results_dir: str = None):
+        self.simulation_dir = Path(simulation_dir)
+        self.generate_plots = generate_plots
+        self.results_dir = Path(results_dir or DEFAULT_RESULTS_DIR)
+        self.writer = get_writer()
+        self.index = get_sweep_index(simulation_dir)
+        self.configs = self.index.configs or list(KNOWN_CONFIGS)
+        self.protocols = self.index.protocols or list(KNOWN_PROTOCOLS)
+        self.metrics = {
+            'paquetes_control': 'packets',
+            'bytes_control': 'bytes',
+            'carga_normalizada': 'ctrl/pkt',
+            'cambios_ruta': 'changes',
+            'tasa_cambios_ruta': 'changes/node/s',
+            'eventos_movilidad': 'events',
+            'eventos_con_reconvergencia': '%',
+            'tiempo_convergencia': 's',
+            'tiempo_convergencia_p95': 's'
+        }
+        # Desplazamiento mínimo entre muestras (m) y giro mínimo (grados) para un evento de movilidad
+        self.move_threshold = 0.5
+        self.heading_threshold = 45.0
+        # Sin cambios de ruta durante esta ventana (s) se considera que las rutas convergieron
+        self.quiet_window = 2.0
+
+    def _read(self, config: str, protocol: str, run: str, artefact: str,
+              usecols: List[str] = None) -> Optional[pd.DataFrame]:
+        """Lee un artefacto de una corrida; devuelve None si falta o está vacío"""
+        path = self.index.artefact_path(config, protocol, run, artefact)
+        if path is None:
+            return None
+        try:
+            df = read_csv(path, usecols=usecols)
+        except pd.errors.EmptyDataError:
+            return None
+        return df
+
+    def load_route_changes(self, config: str, protocol: str, run: str) -> Optional[pd.DataFrame]:
+        """Cambios de ruta de una corrida (t, node_id, destination, next_hop, change).
+
+        Devuelve None si la corrida no registra cambios reales (log ausente, de
+        una versión anterior del simulador o de un protocolo sin tabla).
+        """
+        if protocol in TABLELESS_PROTOCOLS:
+            return None
+        path = self.index.artefact_path(config, protocol, run, 'routing')
+        if path is None:
+            return None
+        try:
+            header = read_csv(path, nrows=0)
+        except pd.errors.EmptyDataError:
+            return None
+        if 'change' not in header.columns:
+            logging.debug(f"{path} no tiene columna change (log de relleno), se omite")
+            return None
+        changes = read_csv(path, usecols=['timestamp', 'node_id', 'destination', 'next_hop', 'change'])
+        return changes.rename(columns={'timestamp': 't'})
+
+    def mobility_events(self, positions: pd.DataFrame) -> pd.DataFrame:
+        """Eventos de movilidad (node_id, t): un nodo empieza a moverse o cambia de rumbo.
+
+        Con RandomWalk2d los nodos cambian de dirección cada pocos segundos; cada
+        cambio de rumbo mayor que heading_threshold cuenta como un evento.
+        """
+        positions = positions.sort_values(['node_id', 'time'], kind='mergesort')
+        by_node = positions.groupby('node_id')
+        dx = by_node['x'].diff()
+        dy = by_node['y'].diff()
+        moving = np.hypot(dx, dy) > self.move_threshold
+        heading = np.degrees(np.arctan2(dy, dx))
+
+        prev_moving = moving.groupby(positions['node_id']).shift(1)
+        prev_heading = heading.groupby(positions['node_id']).shift(1)
+        turn = np.abs((heading - prev_heading + 180.0) % 360.0 - 180.0)
+        # La primera diferencia de cada nodo no tiene muestra previa con la que comparar
+        known = prev_moving.notna()
+        started = moving & known & (prev_moving == False)  # noqa: E712 (serie con NaN)
+        turned = moving & known & (prev_moving == True) & (turn > self.heading_threshold)  # noqa: E712
+
+        events = positions.loc[started | turned, ['node_id', 'time']].rename(columns={'time': 't'})
+        return events.astype({'node_id': np.int64, 't': float}).reset_index(drop=True)
+
+    def convergence_times(self, changes: pd.DataFrame, nodes: pd.DataFrame,
+                          events: pd.DataFrame) -> np.ndarray:
+        """Tiempo hasta que se estabilizan las rutas que involucran al nodo de cada evento.
+
+        Un cambio involucra a un nodo si es su propia tabla o si el nodo es el
+        destino o el siguiente salto de la ruta. Los cambios de cada nodo se
+        agrupan en ráfagas separadas por más de quiet_window; la convergencia de
+        un evento es el fin de la primera ráfaga que empieza dentro de esa
+        ventana. NaN si el evento no provocó cambios de ruta.
+        """
+        if events.empty:
+            return np.array([], dtype=float)
+        ip_to_node = dict(zip(nodes['ip_address'].astype(str), nodes['node_id'].astype(np.int64)))
+        involved = pd.concat([
+            changes[['node_id', 't']],
+            pd.DataFrame({'node_id': changes['destination'].astype(str).map(ip_to_node), 't': changes['t']}),
+            pd.DataFrame({'node_id': changes['next_hop'].astype(str).map(ip_to_node), 't': changes['t']})
+        ], ignore_index=True).dropna()
+        if involved.empty:
+            return np.full(len(events), np.nan)
+        involved = involved.astype({'node_id': np.int64, 't': float}).drop_duplicates()
+        involved = involved.sort_values(['node_id', 't'], kind='mergesort')
+
+        gap = involved.groupby('node_id')['t'].diff()
+        burst = (gap.isna() | (gap > self.quiet_window)).cumsum()
+        involved['burst_end'] = involved.groupby(burst)['t'].transform('max')
+
+        joined = pd.merge_asof(events.sort_values('t', kind='mergesort'),
+                               involved.rename(columns={'t': 'change_t'}).sort_values('change_t', kind='mergesort'),
+                               left_on='t', right_on='change_t', by='node_id', direction='forward',
+                               tolerance=self.quiet_window)
+        return (joined['burst_end'] - joined['t']).to_numpy(dtype=float)
+
+    def analyze_run(self, config: str, protocol: str, run: str) -> Optional[Dict]:
+        """Métricas de enrutamiento de una corrida (NaN en lo que la corrida no registra)"""
+        metrics = self._read(config, protocol, run, 'metrics')
+        if metrics is None or metrics.empty:
+            return None
+        summary = metrics.iloc[-1]
+        duration = float(summary.get('tiempo_simulacion', np.nan))
+        n_nodes = sum(int(summary[c]) for c in NODE_COUNT_COLUMNS if c in summary.index)
+        delivered = float(summary.get('paquetes_totales', np.nan)) - float(summary.get('paquetes_perdidos', np.nan))
+
+        result = {'Configuración': config, 'Protocolo': protocol, 'Corrida': run}
+        result.update({metric: np.nan for metric in self.metrics})
+
+        control = self._read(config, protocol, run, 'control', usecols=['size'])
+        if control is not None:
+            result['paquetes_control'] = len(control)
+            result['bytes_control'] = float(control['size'].sum())
+            # Carga de enrutamiento normalizada: paquetes de control por paquete de datos entregado
+            if delivered > 0:
+                result['carga_normalizada'] = len(control) / delivered
+
+        changes = self.load_route_changes(config, protocol, run)
+        if changes is None:
+            return result
+        result['cambios_ruta'] = len(changes)
+        if n_nodes > 0 and duration > 0:
+            result['tasa_cambios_ruta'] = len(changes) / (n_nodes * duration)
+
+        positions = self._read(config, protocol, run, 'positions', usecols=['time', 'node_id', 'x', 'y'])
+        nodes = self._read(config, protocol, run, 'nodes', usecols=['node_id', 'ip_address'])
+        if positions is None or nodes is None:
+            return result
+        events = self.mobility_events(positions)
+        result['eventos_movilidad'] = len(events)
+        if events.empty:
+            return result
+        times = self.convergence_times(changes, nodes, events)
+        reacted = times[~np.isnan(times)]
+        result['eventos_con_reconvergencia'] = 100.0 * len(reacted) / len(times)
+        if len(reacted):
+            result['tiempo_convergencia'] = float(np.mean(reacted))
+            result['tiempo_convergencia_p95'] = float(np.percentile(reacted, 95))
+        return result
+
+    def analyze_routing(self) -> pd.DataFrame:
+        """Métricas de enrutamiento de todas las corridas del barrido"""
+        rows = []
+        for config in self.configs:
+            for protocol in self.protocols:
+                for run in self.index.runs(config, protocol):
+                    try:
+                        row = self.analyze_run(config, protocol, run)
+                    except Exception as e:
+                        logging.error(f"Error al analizar enrutamiento de {config}/{protocol}/{run}: {str(e)}")
+                        continue
+                    if row is not None:
+                        rows.append(row)
+        return pd.DataFrame(rows, columns=['Configuración', 'Protocolo', 'Corrida'] + list(self.metrics))
+
+    def summarize(self, per_run: pd.DataFrame) -> pd.DataFrame:
+        """Estadísticas por (configuración, protocolo, métrica), con el formato de summary_statistics.csv"""
+        summary = []
+        for (config, protocol), cell in per_run.groupby(['Configuración', 'Protocolo'], sort=False):
+            for metric, unit in self.metrics.items():
+                values = cell[metric].dropna().values
+                if len(values):
+                    summary.append({
+                        'Configuración': config,
+                        'Protocolo': protocol,
+                        'Métrica': metric,
+                        'Unidad': unit,
+                        'Corridas': len(values),
+                        'Media': np.mean(values),
+                        'Mediana': np.median(values),
+                        'Std': np.std(values),
+                        'Min': np.min(values),
+                        'Max': np.max(values)
+                    })
+        return pd.DataFrame(summary)
+
+    def _plot_overhead(self, summary: pd.DataFrame):
+        """Gráfico de barras de la carga de enrutamiento normalizada"""
+        import plotly.express as px
+
+        df = summary[summary['Métrica'] == 'carga_normalizada']
+        if df.empty:
+            return
+        fig = px.bar(df, x='Protocolo', y='Media', color='Configuración', barmode='group', error_y='Std',
+                     title='Carga de Enrutamiento Normalizada',
+                     labels={'Media': 'Paquetes de control por paquete entregado',
+                             'Protocolo': 'Protocolo de Enrutamiento'})
+        graphs_dir = self.results_dir / 'graphs'
+        graphs_dir.mkdir(parents=True, exist_ok=True)
+        self.writer.write_html(fig, str(graphs_dir / 'routing_overhead.html'))
+
+    def run_analysis(self) -> pd.DataFrame:
+        """Ejecuta el análisis de overhead y cambios de ruta"""
+        logging.info("Iniciando análisis de enrutamiento...")
+        try:
+            tables_dir = self.results_dir / 'tables'
+            tables_dir.mkdir(parents=True, exist_ok=True)
+
+            per_run = self.analyze_routing()
+            summary = self.summarize(per_run)
+            if summary.empty:
+                logging.warning("No se encontraron logs de enrutamiento (control_messages.csv / "
+                                "routing_table_changes.csv con cambios reales)")
+                return summary
+            self.writer.write_csv(per_run, tables_dir / 'routing_overhead_runs.csv', index=False)
+            self.writer.write_csv(summary, tables_dir / 'routing_overhead.csv', index=False)
+
+            if self.generate_plots:
+                try:
+                    self._plot_overhead(summary)
+                except Exception as e:
+                    logging.error(f"Error al generar gráfico de overhead de enrutamiento: {str(e)}")
+
+            logging.info("Análisis de enrutamiento completado")
+            return summary
+        except Exception as e:
+            logging.error(f"Error en el análisis de enrutamiento: {str(e)}")
+            raise
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 2:
+        print("Uso: python routing_analysis.py <directorio_simulacion>")
+        sys.exit(1)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    analyzer = RoutingAnalyzer(sys.argv[1])
+    analyzer.run_analysis()
@@ -1,38 +1,34 @@
 #!/usr/bin/env python3
 
+import io
 import os
 import sys
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from pathlib import Path
 import json
 from datetime import datetime
 import logging
 from typing import Dict, List, Tuple
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import networkx as nx
-from scipy import stats
 
-# Configuración de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('post_processing.log'),
-        logging.StreamHandler()
-    ]
-)
+from sweep_index import get_sweep_index, KNOWN_CONFIGS, KNOWN_PROTOCOLS
+from log_io import read_csv
+from output_writer import get_writer
+from output_tree import DEFAULT_RESULTS_DIR
+from report_assets import get_report_assets
+
+# matplotlib, seaborn y plotly se importan dentro de los métodos de gráficos:
+# las etapas de tablas y la validación no pagan su tiempo de importación
 
 class SimulationAnalyzer:
-    def __init__(self, simulation_dir: str):
+    def __init__(self, simulation_dir: str, generate_plots: bool = True, results_dir: str = None):
         self.simulation_dir = Path(simulation_dir)
-        self.results_dir = Path('post_processing/results')
-        self.configs = ['no_mal_no_int', 'int_no_mal', 'mal_no_int', 'mal_int']
-        self.protocols = ['AODV', 'OLSR', 'DSDV', 'DSR']
+        self.generate_plots = generate_plots
+        self.results_dir = Path(results_dir or DEFAULT_RESULTS_DIR)
+        self.writer = get_writer()
+        self.index = get_sweep_index(simulation_dir)
+        self.configs = self.index.configs or list(KNOWN_CONFIGS)
+        self.protocols = self.index.protocols or list(KNOWN_PROTOCOLS)
         self.metrics = {
             'throughput_promedio': 'Kbps',
             'delay_promedio': 'ms',
@@ -56,15 +52,14 @@ class SimulationAnalyzer:
 
     def _load_protocol_metrics(self, config: str, protocol: str) -> Dict:
         """Carga las métricas para un protocolo específico"""
-        protocol_dir = self.simulation_dir / config / protocol
         metrics = {}
         
-        for run_dir in protocol_dir.glob('run*'):
-            metrics_file = run_dir / 'metrics' / 'metrics.csv'
-            if metrics_file.exists():
+        for run in self.index.runs(config, protocol):
+            metrics_file = self.index.artefact_path(config, protocol, run, 'metrics')
+            if metrics_file is not None:
                 try:
-                    df = pd.read_csv(metrics_file)
-                    metrics[f'run_{run_dir.name}'] = df
+                    df = read_csv(metrics_file)
+                    metrics[f'run_{run}'] = df
                     logging.info(f"Cargado archivo de métricas: {metrics_file}")
                 except Exception as e:
                     logging.error(f"Error al cargar {metrics_file}: {str(e)}")
@@ -99,20 +94,28 @@ class SimulationAnalyzer:
         
         return pd.DataFrame(summary)
 
-    def generate_comparative_plots(self, metrics_data: Dict):
-        """Genera gráficos comparativos entre protocolos y configuraciones"""
+    def generate_comparative_plots(self, metrics_data: Dict, interactive: bool = True, static: bool = True):
+        """Genera gráficos comparativos entre protocolos y configuraciones.
+        
+        interactive: tendencias temporales (plotly); static: cajas y correlaciones (pyplot).
+        """
         for metric, unit in self.metrics.items():
-            # Gráfico de cajas para comparar protocolos
-            self._plot_boxplot(metrics_data, metric, unit)
+            if static:
+                # Gráfico de cajas para comparar protocolos
+                self._plot_boxplot(metrics_data, metric, unit)
             
-            # Gráfico de líneas para tendencias temporales
-            self._plot_temporal_trends(metrics_data, metric, unit)
+            if interactive:
+                # Gráfico de líneas para tendencias temporales
+                self._plot_temporal_trends(metrics_data, metric, unit)
             
-            # Gráfico de calor para correlaciones
-            self._plot_correlation_heatmap(metrics_data, metric)
+            if static:
+                # Gráfico de calor para correlaciones
+                self._plot_correlation_heatmap(metrics_data, metric)
 
     def _plot_boxplot(self, metrics_data: Dict, metric: str, unit: str):
         """Genera gráfico de cajas para una métrica específica"""
+        import matplotlib.pyplot as plt
+        
         plt.figure(figsize=(12, 6))
         data = []
         labels = []
@@ -129,18 +132,21 @@ class SimulationAnalyzer:
                     labels.append(f'{config}\n{protocol}')
         
         if data:  # Solo crear el gráfico si hay datos
-            plt.boxplot(data, labels=labels)
+            plt.boxplot(data)
             plt.title(f'Distribución de {metric} por Configuración y Protocolo')
             plt.ylabel(f'{metric} ({unit})')
-            plt.xticks(rotation=45)
+            # Etiquetas vía xticks: el argumento 'labels' de boxplot cambió de nombre en matplotlib 3.9
+            plt.xticks(range(1, len(labels) + 1), labels, rotation=45)
             plt.tight_layout()
-            plt.savefig(self.results_dir / 'graphs' / f'{metric}_boxplot.png')
+            self.writer.write_figure(self.results_dir / 'graphs' / f'{metric}_boxplot.png')
             plt.close()
         else:
             logging.warning(f"No hay datos disponibles para generar el gráfico de cajas de {metric}")
 
     def _plot_temporal_trends(self, metrics_data: Dict, metric: str, unit: str):
         """Genera gráfico de tendencias temporales"""
+        import plotly.graph_objects as go
+        
         fig = go.Figure()
         
         for config in self.configs:
@@ -161,7 +167,7 @@ class SimulationAnalyzer:
             yaxis_title=f'{metric} ({unit})',
             showlegend=True
         )
-        fig.write_html(self.results_dir / 'graphs' / f'{metric}_temporal.html')
+        self.writer.write_html(fig, self.results_dir / 'graphs' / f'{metric}_temporal.html')
 
     def _plot_correlation_heatmap(self, metrics_data: Dict, metric: str):
         """Genera mapa de calor de correlaciones"""
@@ -186,12 +192,15 @@ class SimulationAnalyzer:
             
             # Verificar que hay datos válidos para graficar
             if not mean_correlation.isna().all().all():
+                import matplotlib.pyplot as plt
+                import seaborn as sns
+                
                 plt.figure(figsize=(10, 8))
                 sns.heatmap(mean_correlation, annot=True, cmap='coolwarm', center=0, 
                           mask=mean_correlation.isna())  # Enmascarar valores NaN
                 plt.title(f'Correlación entre Métricas para {metric}')
                 plt.tight_layout()
-                plt.savefig(str(self.results_dir / 'graphs' / f'{metric}_correlation.png'))
+                self.writer.write_figure(str(self.results_dir / 'graphs' / f'{metric}_correlation.png'))
                 plt.close()
             else:
                 logging.warning(f"No hay datos válidos para generar el mapa de calor de correlación para {metric}")
@@ -205,11 +214,11 @@ class SimulationAnalyzer:
         from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
         from reportlab.lib.styles import getSampleStyleSheet
         
-        # Convertir Path a string para el nombre del archivo
-        pdf_path = str(self.results_dir / 'reports' / 'analysis_report.pdf')
-        
+        # El PDF se arma en memoria y se publica completo
+        pdf_path = self.results_dir / 'reports' / 'analysis_report.pdf'
+        buffer = io.BytesIO()
         doc = SimpleDocTemplate(
-            pdf_path,
+            buffer,
             pagesize=letter
         )
         styles = getSampleStyleSheet()
@@ -299,9 +308,13 @@ class SimulationAnalyzer:
                         styles['Normal']
                     ))
         
+        # Gráficos ya generados, reducidos y cacheados por contenido
+        elements.extend(get_report_assets(self.results_dir).flowables('analysis', styles))
+        
         doc.build(elements)
+        self.writer.write_bytes(pdf_path, buffer.getvalue())
 
-    def run_analysis(self):
+    def run_analysis(self, metrics_data: Dict = None):
         """Ejecuta todo el proceso de análisis"""
         logging.info("Iniciando análisis de simulaciones...")
         
@@ -310,15 +323,17 @@ class SimulationAnalyzer:
         (self.results_dir / 'graphs').mkdir(parents=True, exist_ok=True)
         (self.results_dir / 'reports').mkdir(parents=True, exist_ok=True)
         
-        # Cargar datos
-        metrics_data = self.load_metrics()
+        # Cargar datos (salvo que vengan ya combinados, p. ej. desde shards)
+        if metrics_data is None:
+            metrics_data = self.load_metrics()
         
         # Generar estadísticas
         summary_stats = self.generate_summary_statistics(metrics_data)
-        summary_stats.to_csv(self.results_dir / 'tables' / 'summary_statistics.csv', index=False)
+        self.writer.write_csv(summary_stats, self.results_dir / 'tables' / 'summary_statistics.csv', index=False)
         
         # Generar gráficos
-        self.generate_comparative_plots(metrics_data)
+        if self.generate_plots:
+            self.generate_comparative_plots(metrics_data)
         
         # Generar reporte
         self.generate_report(summary_stats)
@@ -326,6 +341,11 @@ class SimulationAnalyzer:
         logging.info("Análisis completado exitosamente")
 
 if __name__ == "__main__":
+    from main import setup_logging
+
+    # Mismo destino que main.py: post_processing/logs, un archivo por invocación
+    setup_logging()
+    
     if len(sys.argv) != 2:
         print("Uso: python run_analysis.py <directorio_simulacion>")
         sys.exit(1)
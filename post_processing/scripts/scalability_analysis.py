@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+
+import logging
+import argparse
+import warnings
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from sweep_index import get_sweep_index, KNOWN_PROTOCOLS
+from integrity_check import parse_metadata
+from output_writer import get_writer
+from output_tree import DEFAULT_RESULTS_DIR
+
+# Escenario de ataque según qué tipos de nodos hay (mismos nombres que las configuraciones del barrido)
+SCENARIOS = {(False, False): 'no_mal_no_int', (False, True): 'int_no_mal',
+             (True, False): 'mal_no_int', (True, True): 'mal_int'}
+# Columna de metrics.csv -> descripción; 'wall_s' es el tiempo de pared de la corrida (telemetría o timestamps)
+SCALING_METRICS = {
+    'throughput_promedio': 'Throughput promedio',
+    'delay_promedio': 'Delay promedio',
+    'pdr': 'Packet Delivery Ratio',
+    'wall_s': 'Tiempo de pared por corrida (s)'
+}
+# Tamaños que interesan al despliegue (nodos totales)
+DEFAULT_TARGET_SIZES = [100, 200, 300, 400, 500]
+
+
+def _fit_model(model: str, n: np.ndarray, y: np.ndarray) -> Optional[np.ndarray]:
+    """Parámetros (a, b) por mínimos cuadrados; None si el modelo no aplica a los datos"""
+    if model == 'lineal':
+        return np.polyfit(n, y, 1)[::-1]
+    if model == 'logarítmico':
+        return np.polyfit(np.log(n), y, 1)[::-1]
+    if model == 'potencia':
+        if np.any(y <= 0):
+            return None
+        log_a, b = np.polyfit(np.log(n), np.log(y), 1)[::-1]
+        return np.array([np.exp(log_a), b])
+    raise ValueError(f"Modelo desconocido: {model}")
+
+
+def predict(model: str, params, n) -> np.ndarray:
+    """Valor del modelo ajustado en `n` nodos"""
+    a, b = params
+    n = np.asarray(n, dtype=float)
+    if model == 'lineal':
+        return a + b * n
+    if model == 'logarítmico':
+        return a + b * np.log(n)
+    return a * n ** b
+
+
+class ScalabilityAnalyzer:
+    """Curvas de escalabilidad por protocolo a partir de un barrido sobre la cantidad de nodos.
+
+    Las corridas se agrupan por la cantidad de nodos registrada en metrics.csv
+    (o en metadata.txt), no por el nombre de la configuración, así que sirve
+    cualquier grilla de `run_simulations CON DSR.sh` con SCALABILITY=1. Por
+    protocolo y escenario de ataque se ajustan modelos lineal, logarítmico y de
+    potencia sobre las corridas individuales y se elige el de menor AIC; con
+    esas curvas se predicen los tamaños de despliegue y se extrapola el mayor
+    tamaño que cumple los umbrales de PDR, delay y tiempo de pared.
+    """
+
+    MODELS = ('lineal', 'logarítmico', 'potencia')
+    # El costo de simular crece al menos linealmente con los nodos (eventos por nodo): sin modelo logarítmico
+    METRIC_MODELS = {'wall_s': ('lineal', 'potencia')}
+
+    def __init__(self, simulation_dir: str, generate_plots: bool = True, results_dir: str = None,
+                 min_pdr: float = 90.0, max_delay: Optional[float] = None, max_wall_s: Optional[float] = 3600.0,
+                 max_nodes: int = 1000, target_sizes: List[int] = None):
+        self.simulation_dir = Path(simulation_dir)
+        self.generate_plots = generate_plots
+        self.results_dir = Path(results_dir or DEFAULT_RESULTS_DIR)
+        self.writer = get_writer()
+        self.index = get_sweep_index(simulation_dir)
+        self.protocols = self.index.protocols or list(KNOWN_PROTOCOLS)
+        self.min_pdr = min_pdr
+        self.max_delay = max_delay
+        self.max_wall_s = max_wall_s
+        self.max_nodes = max_nodes
+        self.target_sizes = target_sizes or DEFAULT_TARGET_SIZES
+
+    def _telemetry_wall(self) -> Dict[Tuple[str, str, str], float]:
+        """Tiempo de pared por corrida según la telemetría del monitor del barrido, si existe"""
+        from sweep_monitor import TELEMETRY_FILE
+
+        path = self.simulation_dir / TELEMETRY_FILE
+        if not path.exists():
+            return {}
+        try:
+            telemetry = pd.read_csv(path)
+        except (OSError, pd.errors.EmptyDataError) as e:
+            logging.warning(f"No se pudo leer la telemetría {path}: {str(e)}")
+            return {}
+        # La última muestra de cada corrida tiene su tiempo de pared acumulado
+        runs = telemetry.sort_values('timestamp').groupby(['config', 'protocol', 'run'])['elapsed_s'].last()
+        return {(c, p, f'run{r}'): wall for (c, p, r), wall in runs.items()}
+
+    def collect(self, metrics_data: Dict) -> pd.DataFrame:
+        """Una fila por corrida: cantidad de nodos, escenario, métricas y tiempo de pared"""
+        telemetry_wall = self._telemetry_wall()
+        rows = []
+        for config, config_data in metrics_data.items():
+            for protocol, protocol_data in config_data.items():
+                for run_key, run_data in protocol_data.items():
+                    if run_data.empty:
+                        continue
+                    run = run_key[len('run_'):] if run_key.startswith('run_') else run_key
+                    row = run_data.iloc[-1]
+                    path = self.index.artefact_path(config, protocol, run, 'metadata') if self.index.configs else None
+                    try:
+                        metadata = parse_metadata(path) if path is not None else {}
+                    except (OSError, UnicodeDecodeError) as e:
+                        logging.warning(f"No se pudo leer {path}: {str(e)}")
+                        metadata = {}
+
+                    counts = {}
+                    for column, key in (('nodos_fijos', 'fixed'), ('nodos_moviles', 'mobile'),
+                                        ('nodos_maliciosos', 'malicious'), ('nodos_interferentes', 'interfering')):
+                        value = pd.to_numeric(row.get(column), errors='coerce')
+                        counts[key] = int(value) if pd.notna(value) else int(metadata.get(key, 0))
+                    nodes = sum(counts.values())
+                    if nodes == 0:
+                        logging.warning(f"Corrida sin cantidad de nodos: {config}/{protocol}/{run_key}")
+                        continue
+
+                    wall = telemetry_wall.get((config, protocol, run))
+                    if wall is None and 'started' in metadata:
+                        # metrics.csv se escribe al terminar la simulación y metadata.txt al empezar
+                        try:
+                            ended = datetime.strptime(str(row.get('timestamp')), '%Y-%m-%d %H:%M:%S').timestamp()
+                            wall = ended - metadata['started'] if ended >= metadata['started'] else None
+                        except ValueError:
+                            wall = None
+
+                    rows.append({'config': config, 'protocol': protocol, 'run': run, 'nodes': nodes,
+                                 **counts,
+                                 'scenario': SCENARIOS[(counts['malicious'] > 0, counts['interfering'] > 0)],
+                                 **{m: pd.to_numeric(row.get(m), errors='coerce')
+                                    for m in SCALING_METRICS if m != 'wall_s'},
+                                 'wall_s': wall})
+        return pd.DataFrame(rows)
+
+    def fit(self, runs: pd.DataFrame) -> pd.DataFrame:
+        """Mejor modelo (menor AIC) por protocolo, escenario y métrica"""
+        fits = []
+        for (protocol, scenario), group in runs.groupby(['protocol', 'scenario']):
+            for metric in SCALING_METRICS:
+                data = group[['nodes', metric]].dropna()
+                sizes = data['nodes'].nunique()
+                if sizes < 2:
+                    continue
+                n = data['nodes'].to_numpy(float)
+                y = data[metric].to_numpy(float)
+                best = None
+                for model in self.METRIC_MODELS.get(metric, self.MODELS):
+                    with warnings.catch_warnings():
+                        # Un solo valor repetido por tamaño deja el ajuste mal condicionado
+                        warnings.simplefilter('ignore')
+                        params = _fit_model(model, n, y)
+                    if params is None or not np.all(np.isfinite(params)):
+                        continue
+                    residual = y - predict(model, params, n)
+                    rss = float(np.sum(residual ** 2))
+                    aic = len(y) * np.log(max(rss, 1e-12) / len(y)) + 2 * len(params)
+                    if best is None or aic < best['AIC']:
+                        total = float(np.sum((y - y.mean()) ** 2))
+                        best = {'Protocolo': protocol, 'Escenario': scenario, 'Métrica': metric, 'Modelo': model,
+                                'a': params[0], 'b': params[1], 'R2': 1 - rss / total if total > 0 else np.nan,
+                                'AIC': aic, 'Corridas': len(y), 'Tamaños': sizes,
+                                'Nodos mínimo': int(n.min()), 'Nodos máximo': int(n.max())}
+                if best is not None:
+                    fits.append(best)
+        return pd.DataFrame(fits)
+
+    def _curve(self, fit: pd.Series, n) -> np.ndarray:
+        # Todas las métricas son no negativas y el PDR es un porcentaje
+        values = predict(fit['Modelo'], (fit['a'], fit['b']), n)
+        return np.clip(values, 0.0, 100.0 if fit['Métrica'] == 'pdr' else None)
+
+    def predictions(self, fits: pd.DataFrame) -> pd.DataFrame:
+        """Valor predicho de cada métrica en los tamaños de despliegue"""
+        rows = []
+        for _, fit in fits.iterrows():
+            for size, value in zip(self.target_sizes, self._curve(fit, self.target_sizes)):
+                rows.append({'Protocolo': fit['Protocolo'], 'Escenario': fit['Escenario'], 'Métrica': fit['Métrica'],
+                             'Nodos': size, 'Predicción': value, 'Extrapolado': size > fit['Nodos máximo']})
+        return pd.DataFrame(rows)
+
+    def feasible_sizes(self, fits: pd.DataFrame) -> pd.DataFrame:
+        """Mayor cantidad de nodos que cumple todos los umbrales, por protocolo y escenario.
+
+        Se recorre desde el menor tamaño observado hacia arriba y se corta en el
+        primer tamaño que viola algún umbral según las curvas ajustadas.
+        """
+        limits = {'pdr': (self.min_pdr, 'min'), 'delay_promedio': (self.max_delay, 'max'),
+                  'wall_s': (self.max_wall_s, 'max')}
+        rows = []
+        for (protocol, scenario), group in fits.groupby(['Protocolo', 'Escenario']):
+            group = group.set_index('Métrica', drop=False)
+            start = int(group['Nodos mínimo'].min())
+            sizes = np.arange(start, max(start, self.max_nodes) + 1)
+            violated = np.zeros(len(sizes), dtype=bool)
+            reason = np.full(len(sizes), '', dtype=object)
+            for metric, (threshold, kind) in limits.items():
+                if threshold is None or metric not in group.index:
+                    continue
+                values = self._curve(group.loc[metric], sizes)
+                bad = values < threshold if kind == 'min' else values > threshold
+                reason[bad & ~violated] = metric
+                violated |= bad
+            if violated.any():
+                first = int(np.argmax(violated))
+                # Ya el menor tamaño observado viola algún umbral
+                largest = int(sizes[first - 1]) if first > 0 else None
+                limit = reason[first]
+            else:
+                largest, limit = int(sizes[-1]), f'horizonte ({self.max_nodes})'
+            rows.append({'Protocolo': protocol, 'Escenario': scenario, 'Nodos máximos': largest, 'Límite': limit,
+                         'Nodos observados': int(group['Nodos máximo'].max()),
+                         'Extrapolado': largest is not None and largest > group['Nodos máximo'].max()})
+        limits = pd.DataFrame(rows)
+        limits['Nodos máximos'] = limits['Nodos máximos'].astype('Int64')
+        return limits
+
+    def run_analysis(self, metrics_data: Dict) -> Optional[pd.DataFrame]:
+        """Ajusta las curvas de escalabilidad y guarda tablas y gráfico; None si el barrido tiene un solo tamaño"""
+        logging.info("Iniciando análisis de escalabilidad por cantidad de nodos...")
+        try:
+            runs = self.collect(metrics_data)
+            # En el barrido estándar cada escenario de ataque tiene un solo tamaño de red
+            if runs.empty or runs.groupby('scenario')['nodes'].nunique().max() < 2:
+                logging.info("El barrido tiene un solo tamaño de red por escenario: "
+                             "no se ajustan curvas de escalabilidad")
+                return None
+
+            fits = self.fit(runs)
+            if fits.empty:
+                logging.warning("No hay datos suficientes para ajustar curvas de escalabilidad")
+                return None
+
+            tables_dir = self.results_dir / 'tables'
+            tables_dir.mkdir(parents=True, exist_ok=True)
+            by_size = runs.groupby(['protocol', 'scenario', 'nodes'])[list(SCALING_METRICS)] \
+                .agg(['mean', 'std', 'count'])
+            by_size.columns = [f'{metric}_{stat}' for metric, stat in by_size.columns]
+            self.writer.write_csv(by_size.reset_index().round(6), tables_dir / 'scalability_by_size.csv', index=False)
+            self.writer.write_csv(fits.round(6), tables_dir / 'scalability_fits.csv', index=False)
+            self.writer.write_csv(self.predictions(fits).round(6), tables_dir / 'scalability_predictions.csv',
+                                  index=False)
+            limits = self.feasible_sizes(fits)
+            self.writer.write_csv(limits, tables_dir / 'scalability_limits.csv', index=False)
+
+            for _, limit in limits.iterrows():
+                if pd.isna(limit['Nodos máximos']):
+                    logging.info(f"Escalabilidad {limit['Protocolo']}/{limit['Escenario']}: ningún tamaño "
+                                 f"observado cumple los umbrales (límite: {limit['Límite']})")
+                else:
+                    logging.info(f"Escalabilidad {limit['Protocolo']}/{limit['Escenario']}: hasta "
+                                 f"{limit['Nodos máximos']} nodos (límite: {limit['Límite']}"
+                                 f"{', extrapolado' if limit['Extrapolado'] else ''})")
+
+            if self.generate_plots:
+                try:
+                    self._plot_curves(runs, fits)
+                except Exception as e:
+                    logging.error(f"Error al generar gráfico de curvas de escalabilidad: {str(e)}")
+            return fits
+        except Exception as e:
+            logging.error(f"Error en el análisis de escalabilidad por cantidad de nodos: {str(e)}")
+            raise
+
+    def _plot_curves(self, runs: pd.DataFrame, fits: pd.DataFrame):
+        """Corridas observadas y curvas ajustadas hasta el horizonte de extrapolación"""
+        import plotly.graph_objects as go
+        from plotly.subplots import make_subplots
+        import plotly.express as px
+
+        metrics = [m for m in SCALING_METRICS if m in set(fits['Métrica'])]
+        fig = make_subplots(rows=len(metrics), cols=1, subplot_titles=[SCALING_METRICS[m] for m in metrics])
+        colors = dict(zip(sorted(fits['Protocolo'].unique()), px.colors.qualitative.Plotly))
+        sizes = np.linspace(runs['nodes'].min(), max(self.max_nodes, runs['nodes'].max()), 200)
+        for row, metric in enumerate(metrics, start=1):
+            for _, fit in fits[fits['Métrica'] == metric].iterrows():
+                label = f"{fit['Protocolo']} ({fit['Escenario']})"
+                color = colors[fit['Protocolo']]
+                observed = runs[(runs['protocol'] == fit['Protocolo']) & (runs['scenario'] == fit['Escenario'])]
+                fig.add_trace(go.Scatter(x=observed['nodes'], y=observed[metric], mode='markers', name=label,
+                                         legendgroup=label, showlegend=row == 1, marker=dict(color=color, size=5)),
+                              row=row, col=1)
+                fig.add_trace(go.Scatter(x=sizes, y=self._curve(fit, sizes), mode='lines', name=label,
+                                         legendgroup=label, showlegend=False,
+                                         line=dict(color=color, dash='solid' if fit['Escenario'] == 'no_mal_no_int'
+                                                   else 'dash')),
+                              row=row, col=1)
+            fig.update_xaxes(title_text='Nodos totales', row=row, col=1)
+        fig.update_layout(height=320 * len(metrics), title='Curvas de escalabilidad por protocolo')
+        graphs_dir = self.results_dir / 'graphs'
+        graphs_dir.mkdir(parents=True, exist_ok=True)
+        self.writer.write_html(fig, str(graphs_dir / 'scalability_curves.html'))
+
+
+def main():
+    from run_analysis import SimulationAnalyzer
+
+    parser = argparse.ArgumentParser(description='Curvas de escalabilidad por cantidad de nodos')
+    parser.add_argument('simulation_dir', help='Barrido con varios tamaños de red (SCALABILITY=1)')
+    parser.add_argument('--min-pdr', type=float, default=90.0, help='PDR mínimo aceptable (%%)')
+    parser.add_argument('--max-delay', type=float, default=None, help='Delay promedio máximo aceptable (s)')
+    parser.add_argument('--max-wall', type=float, default=3600.0,
+                        help='Tiempo de pared máximo por corrida (s); 0 para no limitar')
+    parser.add_argument('--max-nodes', type=int, default=1000, help='Horizonte de extrapolación')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_TARGET_SIZES,
+                        help='Tamaños de red a predecir')
+    parser.add_argument('--output-dir', default=None, help=f'Directorio de resultados ({DEFAULT_RESULTS_DIR})')
+    parser.add_argument('--no-plots', action='store_true')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    metrics_data = SimulationAnalyzer(args.simulation_dir).load_metrics()
+    ScalabilityAnalyzer(args.simulation_dir, generate_plots=not args.no_plots, results_dir=args.output_dir,
+                        min_pdr=args.min_pdr, max_delay=args.max_delay, max_wall_s=args.max_wall or None,
+                        max_nodes=args.max_nodes, target_sizes=args.sizes).run_analysis(metrics_data)
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,28 @@
 #!/usr/bin/env python3
 
+import io
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from pathlib import Path
 import logging
-from typing import Dict, List
-import plotly.express as px
-import plotly.graph_objects as go
-from scipy import stats
+from typing import Dict, List, Optional
+
+from sweep_index import get_sweep_index, KNOWN_CONFIGS, KNOWN_PROTOCOLS, BASELINE_CONFIG
+from output_writer import get_writer
+from output_tree import DEFAULT_RESULTS_DIR
+from report_assets import get_report_assets
+
+# Las librerías de gráficos se importan solo en los métodos que las usan
 
 class SecurityAnalyzer:
-    def __init__(self, simulation_dir: str):
+    def __init__(self, simulation_dir: str, generate_plots: bool = True, results_dir: str = None):
         self.simulation_dir = Path(simulation_dir)
-        self.results_dir = Path('post_processing/results')
-        self.configs = ['no_mal_no_int', 'int_no_mal', 'mal_no_int', 'mal_int']
-        self.protocols = ['AODV', 'OLSR', 'DSDV', 'DSR']
+        self.generate_plots = generate_plots
+        self.results_dir = Path(results_dir or DEFAULT_RESULTS_DIR)
+        self.writer = get_writer()
+        index = get_sweep_index(simulation_dir)
+        self.configs = index.configs or list(KNOWN_CONFIGS)
+        self.protocols = index.protocols or list(KNOWN_PROTOCOLS)
         self.metrics = {
             'perdida_paquetes': 'Tasa de pérdida de paquetes',
             'delay_promedio': 'Latencia de red',
@@ -25,14 +31,52 @@ class SecurityAnalyzer:
             'pdr': 'Packet Delivery Ratio'
         }
         
-    def analyze_security_metrics(self, metrics_data: Dict):
-        """Analiza métricas relacionadas con seguridad"""
+    def analyze_security_metrics(self, metrics_data: Dict) -> Dict[str, pd.DataFrame]:
+        """Analiza métricas relacionadas con seguridad; devuelve las estadísticas por protocolo"""
+        protocol_stats = {}
         for metric, description in self.metrics.items():
-            self._analyze_security_metric(metrics_data, metric, description)
+            stats = self._analyze_security_metric(metrics_data, metric, description)
+            if stats is not None:
+                protocol_stats[metric] = stats
+        return protocol_stats
             
-    def _analyze_security_metric(self, metrics_data: Dict, metric: str, description: str):
-        """Analiza una métrica específica de seguridad"""
-        # Crear DataFrame para análisis
+    def _analyze_security_metric(self, metrics_data: Dict, metric: str,
+                                 description: str) -> Optional[pd.DataFrame]:
+        """Analiza una métrica específica de seguridad; devuelve las estadísticas por protocolo"""
+        df = self._metric_values(metrics_data, metric)
+        if df is None:
+            logging.warning(f"No se encontraron datos para la métrica {metric}")
+            return None
+        
+        # Asegurarse de que el directorio de tablas existe
+        tables_dir = self.results_dir / 'tables'
+        tables_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Análisis estadístico
+        stats_by_config = df.groupby('config')['value'].agg(['mean', 'std', 'min', 'max'])
+        stats_by_protocol = df.groupby('protocol')['value'].agg(['mean', 'std', 'min', 'max'])
+        
+        # Guardar estadísticas
+        self.writer.write_csv(stats_by_config, str(tables_dir / f'{metric}_by_config.csv'))
+        self.writer.write_csv(stats_by_protocol, str(tables_dir / f'{metric}_by_protocol.csv'))
+        
+        # Generar gráficos
+        if self.generate_plots:
+            self._plot_security_metric(df, metric, description)
+        return stats_by_protocol
+        
+    def plot_security_metrics(self, metrics_data: Dict, interactive: bool = True, violin: bool = True):
+        """Genera solo los gráficos de las métricas de seguridad (sin escribir tablas).
+        
+        interactive: gráficos HTML de plotly; violin: gráficos de violín con pyplot.
+        """
+        for metric, description in self.metrics.items():
+            df = self._metric_values(metrics_data, metric)
+            if df is not None:
+                self._plot_security_metric(df, metric, description, interactive, violin)
+        
+    def _metric_values(self, metrics_data: Dict, metric: str) -> Optional[pd.DataFrame]:
+        """Valor medio de la métrica por corrida: (config, protocol, run, value)"""
         data = []
         for config in self.configs:
             for protocol in self.protocols:
@@ -51,32 +95,24 @@ class SecurityAnalyzer:
                             })
         
         if not data:  # Si no hay datos, salir
-            logging.warning(f"No se encontraron datos para la métrica {metric}")
-            return
-            
-        df = pd.DataFrame(data)
-        
-        # Asegurarse de que el directorio de tablas existe
-        tables_dir = self.results_dir / 'tables'
-        tables_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Análisis estadístico
-        stats_by_config = df.groupby('config')['value'].agg(['mean', 'std', 'min', 'max'])
-        stats_by_protocol = df.groupby('protocol')['value'].agg(['mean', 'std', 'min', 'max'])
+            return None
+        return pd.DataFrame(data)
         
-        # Guardar estadísticas
-        stats_by_config.to_csv(str(tables_dir / f'{metric}_by_config.csv'))
-        stats_by_protocol.to_csv(str(tables_dir / f'{metric}_by_protocol.csv'))
-        
-        # Generar gráficos
-        self._plot_security_metric(df, metric, description)
-        
-    def _plot_security_metric(self, df: pd.DataFrame, metric: str, description: str):
+    def _plot_security_metric(self, df: pd.DataFrame, metric: str, description: str,
+                          interactive: bool = True, violin: bool = True):
         """Genera gráficos para una métrica de seguridad"""
-        # Gráfico de barras por configuración
-        fig = px.box(df, x='config', y='value', color='protocol',
-                    title=f'{description} por Configuración y Protocolo')
-        fig.write_html(str(self.results_dir / 'graphs' / f'{metric}_security.html'))
+        if interactive:
+            import plotly.express as px
+            
+            # Gráfico de barras por configuración
+            fig = px.box(df, x='config', y='value', color='protocol',
+                        title=f'{description} por Configuración y Protocolo')
+            self.writer.write_html(fig, str(self.results_dir / 'graphs' / f'{metric}_security.html'))
+        
+        if not violin:
+            return
+        import matplotlib.pyplot as plt
+        import seaborn as sns
         
         # Gráfico de violín
         plt.figure(figsize=(12, 6))
@@ -84,7 +120,7 @@ class SecurityAnalyzer:
         plt.title(f'Distribución de {description}')
         plt.xticks(rotation=45)
         plt.tight_layout()
-        plt.savefig(str(self.results_dir / 'graphs' / f'{metric}_violin.png'))
+        self.writer.write_figure(str(self.results_dir / 'graphs' / f'{metric}_violin.png'))
         plt.close()
         
     def analyze_attack_impact(self, metrics_data: Dict):
@@ -101,14 +137,39 @@ class SecurityAnalyzer:
             
     def _analyze_attack_impact(self, metrics_data: Dict, metric: str, description: str):
         """Analiza el impacto de ataques en una métrica específica"""
+        df = self.compute_attack_impact(metrics_data, metric)
+        if df is None:
+            return
+        
+        # Asegurarse de que el directorio de tablas existe
+        tables_dir = self.results_dir / 'tables'
+        tables_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Guardar resultados
+        self.writer.write_csv(df, str(tables_dir / f'{metric}_attack_impact.csv'), index=False)
+        
+        # Generar gráfico
+        if self.generate_plots:
+            import plotly.express as px
+            
+            fig = px.bar(df, x='protocol', y='impact', color='config',
+                        title=f'{description} por Protocolo y Tipo de Ataque',
+                        barmode='group')
+            self.writer.write_html(fig, str(self.results_dir / 'graphs' / f'{metric}_attack_impact.html'))
+        
+    def compute_attack_impact(self, metrics_data: Dict, metric: str) -> Optional[pd.DataFrame]:
+        """Impacto relativo (%) de cada configuración de ataque respecto de la base, por protocolo"""
         # Comparar configuraciones con y sin ataques
-        baseline = metrics_data['no_mal_no_int']
-        attack_configs = ['mal_no_int', 'int_no_mal', 'mal_int']
+        if BASELINE_CONFIG not in metrics_data:
+            logging.warning(f"Sin configuración base {BASELINE_CONFIG}, no se analiza el impacto en {metric}")
+            return None
+        baseline = metrics_data[BASELINE_CONFIG]
+        attack_configs = [config for config in self.configs if config != BASELINE_CONFIG]
         
         impact_data = []
         for protocol in self.protocols:
             baseline_values = []
-            for run_data in baseline[protocol].values():
+            for run_data in baseline.get(protocol, {}).values():
                 if metric in run_data.columns:
                     values = run_data[metric].dropna().values
                     if len(values) > 0:
@@ -125,7 +186,7 @@ class SecurityAnalyzer:
             
             for config in attack_configs:
                 attack_values = []
-                for run_data in metrics_data[config][protocol].values():
+                for run_data in metrics_data.get(config, {}).get(protocol, {}).values():
                     if metric in run_data.columns:
                         values = run_data[metric].dropna().values
                         if len(values) > 0:
@@ -150,25 +211,16 @@ class SecurityAnalyzer:
         
         if not impact_data:  # Si no hay datos de impacto, salir
             logging.warning(f"No se encontraron datos de impacto para la métrica {metric}")
-            return
+            return None
             
-        df = pd.DataFrame(impact_data)
+        return pd.DataFrame(impact_data)
         
-        # Asegurarse de que el directorio de tablas existe
-        tables_dir = self.results_dir / 'tables'
-        tables_dir.mkdir(parents=True, exist_ok=True)
+    def generate_security_report(self, metrics_data: Dict, protocol_stats: Dict[str, pd.DataFrame] = None):
+        """Genera un reporte de seguridad.
         
-        # Guardar resultados
-        df.to_csv(str(tables_dir / f'{metric}_attack_impact.csv'), index=False)
-        
-        # Generar gráfico
-        fig = px.bar(df, x='protocol', y='impact', color='config',
-                    title=f'{description} por Protocolo y Tipo de Ataque',
-                    barmode='group')
-        fig.write_html(str(self.results_dir / 'graphs' / f'{metric}_attack_impact.html'))
-        
-    def generate_security_report(self, metrics_data: Dict):
-        """Genera un reporte de seguridad"""
+        protocol_stats son las estadísticas por protocolo de analyze_security_metrics;
+        si no se pasan, se ejecutan aquí ese análisis y el de impacto de ataques.
+        """
         from reportlab.lib import colors
         from reportlab.lib.pagesizes import letter
         from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
@@ -178,11 +230,11 @@ class SecurityAnalyzer:
         reports_dir = self.results_dir / 'reports'
         reports_dir.mkdir(parents=True, exist_ok=True)
         
-        # Convertir Path a string para el nombre del archivo
-        pdf_path = str(reports_dir / 'security_report.pdf')
-        
+        # El PDF se arma en memoria y se publica completo
+        pdf_path = reports_dir / 'security_report.pdf'
+        buffer = io.BytesIO()
         doc = SimpleDocTemplate(
-            pdf_path,
+            buffer,
             pagesize=letter
         )
         styles = getSampleStyleSheet()
@@ -201,11 +253,12 @@ class SecurityAnalyzer:
         ))
         elements.append(Spacer(1, 12))
         
-        # Análisis de métricas de seguridad
-        self.analyze_security_metrics(metrics_data)
-        
-        # Análisis de impacto de ataques
-        self.analyze_attack_impact(metrics_data)
+        if protocol_stats is None:
+            # Análisis de métricas de seguridad
+            protocol_stats = self.analyze_security_metrics(metrics_data)
+            
+            # Análisis de impacto de ataques
+            self.analyze_attack_impact(metrics_data)
         
         # Conclusiones de seguridad
         elements.append(Paragraph("Conclusiones de Seguridad", styles['Heading1']))
@@ -217,10 +270,9 @@ class SecurityAnalyzer:
         
         # Generar conclusiones automáticamente
         for metric in self.metrics.keys():
-            metric_file = self.results_dir / 'tables' / f'{metric}_by_protocol.csv'
-            if metric_file.exists():
+            metric_data = protocol_stats.get(metric)
+            if metric_data is not None:
                 try:
-                    metric_data = pd.read_csv(metric_file)
                     if not metric_data.empty:
                         best_protocol = metric_data.loc[metric_data['mean'].idxmin()]
                         elements.append(Paragraph(
@@ -240,7 +292,11 @@ class SecurityAnalyzer:
                     styles['Normal']
                 ))
         
+        # Gráficos ya generados, reducidos y cacheados por contenido
+        elements.extend(get_report_assets(self.results_dir).flowables('security', styles))
+        
         doc.build(elements)
+        self.writer.write_bytes(pdf_path, buffer.getvalue())
 
 if __name__ == "__main__":
     import sys
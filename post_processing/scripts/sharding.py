@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+
+import gzip
+import json
+import logging
+import socket
+import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+import pandas as pd
+
+from sketches import QuantileSketch
+from distribution_analysis import DistributionAnalyzer
+from sweep_index import get_sweep_index, register_layout
+from log_io import read_csv
+from output_tree import DEFAULT_RESULTS_DIR, OutputTree
+
+PARTIAL_VERSION = 1
+
+class ShardSpec:
+    """Selección de un subárbol del barrido: '<config>/<protocolo>[/<desde>-<hasta>]'.
+
+    Cualquiera de los componentes puede ser '*'. El rango de corridas es
+    inclusivo y se refiere al número de `runN`.
+    """
+
+    def __init__(self, spec: str = '*/*'):
+        parts = spec.strip('/').split('/')
+        if len(parts) > 3:
+            raise ValueError(f"Especificación de shard inválida: {spec}")
+        parts += ['*'] * (3 - len(parts))
+        self.spec = spec
+        self.config, self.protocol, runs = parts
+        self.run_range = None
+        if runs != '*':
+            start, _, end = runs.partition('-')
+            self.run_range = (int(start), int(end or start))
+
+    def matches(self, config: str, protocol: str, run_name: str) -> bool:
+        """Indica si una corrida pertenece al shard"""
+        if self.config != '*' and config != self.config:
+            return False
+        if self.protocol != '*' and protocol != self.protocol:
+            return False
+        if self.run_range is not None:
+            try:
+                run_number = int(run_name.replace('run', ''))
+            except ValueError:
+                return False
+            return self.run_range[0] <= run_number <= self.run_range[1]
+        return True
+
+    def __str__(self):
+        return self.spec
+
+
+def map_shard(simulation_dir: str, spec: ShardSpec, output_file: str, results_dir: str = None) -> Path:
+    """Procesa un shard y escribe sus agregados parciales en un archivo comprimido"""
+    sim_dir = Path(simulation_dir)
+    index = get_sweep_index(simulation_dir)
+    distribution_analyzer = DistributionAnalyzer(simulation_dir, results_dir=results_dir)
+    runs = []
+    sketches: Dict = {}
+
+    for config in index.configs:
+        for protocol in index.protocols_for(config):
+            for run in index.runs(config, protocol):
+                if not spec.matches(config, protocol, run):
+                    continue
+                run_dir = index.run_dir(config, protocol, run)
+                metrics_file = index.artefact_path(config, protocol, run, 'metrics')
+                if metrics_file is None:
+                    continue
+                try:
+                    df = read_csv(metrics_file)
+                except Exception as e:
+                    logging.error(f"Error al cargar {metrics_file}: {str(e)}")
+                    continue
+
+                runs.append({
+                    'config': config,
+                    'protocol': protocol,
+                    'run': run_dir.name,
+                    'metrics': df.to_dict(orient='split', index=False)
+                })
+
+                cell_sketches = sketches.setdefault(config, {}).setdefault(protocol, {})
+                try:
+                    for name, sketch in distribution_analyzer.build_run_sketches(run_dir).items():
+                        cell_sketches.setdefault(name, QuantileSketch()).merge(sketch)
+                except Exception as e:
+                    logging.error(f"Error al procesar paquetes de {run_dir}: {str(e)}")
+
+    partial = {
+        'version': PARTIAL_VERSION,
+        'host': socket.gethostname(),
+        'simulation_dir': str(sim_dir.resolve()),
+        'shard': str(spec),
+        'runs': runs,
+        'sketches': {config: {protocol: {name: sketch.to_dict() for name, sketch in cell.items()}
+                              for protocol, cell in protocols.items()}
+                     for config, protocols in sketches.items()}
+    }
+
+    output = Path(output_file)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with gzip.open(output, 'wt', encoding='utf-8') as f:
+        json.dump(partial, f, separators=(',', ':'))
+    logging.info(f"Shard {spec}: {len(runs)} corridas escritas en {output}")
+    return output
+
+
+def load_partial(path: str) -> Dict:
+    """Lee un archivo de agregados parciales"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        partial = json.load(f)
+    if partial.get('version') != PARTIAL_VERSION:
+        raise ValueError(f"Versión de parcial no soportada en {path}: {partial.get('version')}")
+    return partial
+
+
+def merge_partials(paths: List[str]) -> Dict:
+    """Combina parciales de varios shards en métricas y sketches globales"""
+    metrics_data: Dict = {}
+    sketches: Dict = {}
+    seen = set()
+
+    for path in paths:
+        partial = load_partial(path)
+        for run in partial['runs']:
+            key = (run['config'], run['protocol'], run['run'])
+            if key in seen:
+                logging.warning(f"Corrida duplicada entre shards, se ignora: {'/'.join(key)} ({path})")
+                continue
+            seen.add(key)
+            split = run['metrics']
+            df = pd.DataFrame(split['data'], columns=split['columns'])
+            metrics_data.setdefault(run['config'], {}).setdefault(run['protocol'], {})[f"run_{run['run']}"] = df
+
+        for config, protocols in partial['sketches'].items():
+            for protocol, cell in protocols.items():
+                target = sketches.setdefault(config, {}).setdefault(protocol, {})
+                for name, data in cell.items():
+                    target.setdefault(name, QuantileSketch()).merge(QuantileSketch.from_dict(data))
+
+    return {'metrics_data': metrics_data, 'sketches': sketches}
+
+
+def _complete_metrics_data(metrics_data: Dict, configs: List[str], protocols: List[str]) -> Dict:
+    """Ordena las celdas como en un análisis local y rellena las que no tienen corridas"""
+    ordered = {}
+    for config in configs + sorted(set(metrics_data) - set(configs)):
+        config_data = metrics_data.get(config, {})
+        ordered[config] = {protocol: config_data.get(protocol, {})
+                           for protocol in protocols + sorted(set(config_data) - set(protocols))}
+    return ordered
+
+
+def reduce_partials(paths: List[str], label: str = 'shards', results_dir: str = None):
+    """Combina parciales y genera las mismas tablas y reportes que un análisis local"""
+    from main import run_analysis_stages
+    from run_analysis import SimulationAnalyzer
+
+    merged = merge_partials(paths)
+    if not Path(label).is_dir():
+        # Sin el barrido local, las etapas ven las celdas y corridas de los parciales
+        # (incluidas configuraciones fuera de las conocidas, p. ej. scale_*)
+        register_layout(label, {config: {protocol: [run[len('run_'):] for run in runs]
+                                         for protocol, runs in protocols.items()}
+                                for config, protocols in merged['metrics_data'].items()})
+    reference = SimulationAnalyzer(label)
+    metrics_data = _complete_metrics_data(merged['metrics_data'], reference.configs, reference.protocols)
+    logging.info(f"Combinados {len(paths)} parciales")
+    run_analysis_stages(label, metrics_data, merged['sketches'], results_dir=results_dir)
+    return merged
+
+
+def plan_shards(simulation_dir: str) -> List[ShardSpec]:
+    """Divide un barrido en un shard por celda (configuración, protocolo)"""
+    index = get_sweep_index(simulation_dir)
+    specs = []
+    for config in index.configs:
+        for protocol in index.protocols_for(config):
+            if index.runs(config, protocol):
+                specs.append(ShardSpec(f'{config}/{protocol}'))
+    return specs
+
+
+def _map_worker(args):
+    simulation_dir, spec, output_file, results_dir = args
+    return str(map_shard(simulation_dir, ShardSpec(spec), output_file, results_dir))
+
+
+def run_local(simulation_dir: str, partials_dir: str = None, workers: int = 4, results_dir: str = None):
+    """Ejecuta el modo map/reduce en la máquina local con varios procesos"""
+    partials = Path(partials_dir) if partials_dir else Path(results_dir or DEFAULT_RESULTS_DIR) / 'partials'
+    partials.mkdir(parents=True, exist_ok=True)
+    jobs = []
+    for spec in plan_shards(simulation_dir):
+        name = str(spec).replace('/', '_')
+        jobs.append((simulation_dir, str(spec), str(partials / f'{name}.partial.json.gz'), results_dir))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        outputs = list(executor.map(_map_worker, jobs))
+    return reduce_partials(outputs, simulation_dir, results_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Post-procesamiento distribuido (map/reduce) por shards')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    map_parser = subparsers.add_parser('map', help='Procesa un shard y escribe sus agregados parciales')
+    map_parser.add_argument('simulation_dir')
+    map_parser.add_argument('shard', help="'<config>/<protocolo>[/<desde>-<hasta>]', admite '*'")
+    map_parser.add_argument('output', help='Archivo de salida (.partial.json.gz)')
+
+    reduce_parser = subparsers.add_parser('reduce', help='Combina parciales y genera tablas y reportes')
+    reduce_parser.add_argument('partials', nargs='+')
+    reduce_parser.add_argument('--output-dir', default=None, help=f'Raíz de resultados (por defecto {DEFAULT_RESULTS_DIR})')
+
+    local_parser = subparsers.add_parser('local', help='Ejecuta map/reduce localmente con varios procesos')
+    local_parser.add_argument('simulation_dir')
+    local_parser.add_argument('--partials-dir', default=None, help='Por defecto <raíz de resultados>/partials')
+    local_parser.add_argument('--output-dir', default=None, help=f'Raíz de resultados (por defecto {DEFAULT_RESULTS_DIR})')
+    local_parser.add_argument('--workers', type=int, default=4)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    try:
+        if args.command == 'map':
+            map_shard(args.simulation_dir, ShardSpec(args.shard), args.output)
+        elif args.command == 'reduce':
+            with OutputTree(args.output_dir, 'shards reduce') as tree:
+                reduce_partials(args.partials, results_dir=str(tree.root))
+        else:
+            with OutputTree(args.output_dir, 'shards local', args.simulation_dir) as tree:
+                run_local(args.simulation_dir, args.partials_dir, args.workers, str(tree.root))
+    except Exception as e:
+        logging.error(f"Error fatal: {str(e)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+from output_writer import publish
+
+
+class QuantileSketch:
+    """Sketch de cuantiles mergeable (estilo KLL).
+
+    Mantiene una jerarquía de compactadores: cada elemento del nivel h
+    representa 2**h muestras. El tamaño del sketch es O(k log(n/k)), por lo
+    que se pueden combinar corridas, shards y barridos completos sin
+    conservar las muestras originales.
+    """
+
+    def __init__(self, k: int = 200):
+        self.k = k
+        self.n = 0
+        self.min = float('inf')
+        self.max = float('-inf')
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._offset = 0
+
+    def _capacity(self, level: int) -> int:
+        """Capacidad del compactador de un nivel"""
+        depth = len(self.levels) - level - 1
+        return max(int(np.ceil(self.k * (2.0 / 3.0) ** depth)), 2)
+
+    def update(self, value: float):
+        """Agrega un único valor al sketch"""
+        self.update_many(np.array([value], dtype=float))
+
+    def update_many(self, values: Iterable[float]):
+        """Agrega un bloque de valores al sketch (se ignoran NaN)"""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+        self.n += int(values.size)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def _compress(self):
+        """Compacta niveles mientras el sketch supere su capacidad total"""
+        while sum(level.size for level in self.levels) > sum(self._capacity(h) for h in range(len(self.levels))):
+            # Se compacta el nivel más bajo que esté lleno
+            level = next(h for h in range(len(self.levels)) if self.levels[h].size >= self._capacity(h))
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(self.levels[level])
+            # Si la cantidad es impar, el último elemento queda en el nivel
+            keep = items[-1:] if items.size % 2 else items[:0]
+            pairs = items[:items.size - keep.size]
+            promoted = pairs[self._offset::2]
+            self._offset ^= 1
+            self.levels[level] = keep
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """Combina otro sketch en este (in place) y lo devuelve"""
+        if other.n == 0:
+            return self
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantiles(self, qs: Iterable[float]) -> np.ndarray:
+        """Estima varios cuantiles (q en [0, 1]) en una sola pasada"""
+        qs = np.asarray(list(qs), dtype=float)
+        if self.n == 0:
+            return np.full(qs.shape, np.nan)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(level.size, 2 ** h, dtype=float)
+                                  for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='mergesort')
+        items = items[order]
+        cumulative = np.cumsum(weights[order])
+        ranks = qs * cumulative[-1]
+        idx = np.clip(np.searchsorted(cumulative, ranks, side='left'), 0, items.size - 1)
+        result = items[idx]
+        # Los extremos son exactos
+        result[qs <= 0.0] = self.min
+        result[qs >= 1.0] = self.max
+        return result
+
+    def quantile(self, q: float) -> float:
+        """Estima un cuantil (q en [0, 1])"""
+        return float(self.quantiles([q])[0])
+
+    def to_dict(self) -> Dict:
+        """Serializa el sketch a un diccionario compatible con JSON"""
+        return {
+            'k': self.k,
+            'n': self.n,
+            'min': self.min if self.n else None,
+            'max': self.max if self.n else None,
+            'levels': [level.tolist() for level in self.levels]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'QuantileSketch':
+        """Reconstruye un sketch serializado con to_dict"""
+        sketch = cls(k=data.get('k', 200))
+        sketch.n = int(data.get('n', 0))
+        if sketch.n:
+            sketch.min = float(data['min'])
+            sketch.max = float(data['max'])
+        sketch.levels = [np.asarray(level, dtype=float) for level in data.get('levels', [[]])] or [np.empty(0)]
+        return sketch
+
+
+def save_sketches(sketches: Dict[str, QuantileSketch], path: Path, extra: Dict = None):
+    """Guarda un conjunto de sketches con nombre en un archivo JSON"""
+    payload = dict(extra or {})
+    payload['sketches'] = {name: sketch.to_dict() for name, sketch in sketches.items()}
+    # Publicación atómica: otro análisis puede estar leyendo el mismo sketch
+    publish(path, json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+
+
+def load_sketches(path: Path) -> Dict[str, QuantileSketch]:
+    """Carga un conjunto de sketches guardado con save_sketches"""
+    with open(path) as f:
+        payload = json.load(f)
+    return {name: QuantileSketch.from_dict(data) for name, data in payload.get('sketches', {}).items()}
+
+
+def merge_sketch_files(paths: Iterable[Path]) -> Dict[str, QuantileSketch]:
+    """Combina los sketches de varios archivos (corridas, shards o barridos)"""
+    merged: Dict[str, QuantileSketch] = {}
+    for path in paths:
+        for name, sketch in load_sketches(path).items():
+            if name in merged:
+                merged[name].merge(sketch)
+            else:
+                merged[name] = sketch
+    return merged
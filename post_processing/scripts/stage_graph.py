@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from output_writer import get_writer
+
+# Recurso exclusivo de matplotlib: pyplot guarda la figura activa en estado global y no
+# admite dos etapas dibujando a la vez
+PYPLOT = 'pyplot'
+
+
+class Stage:
+    """Etapa del grafo: una función, las etapas cuyos resultados recibe y los recursos exclusivos.
+
+    `inputs` son dependencias de datos: el resultado de cada una se pasa en
+    memoria como argumento con el mismo nombre. `after` son dependencias de
+    orden sin datos (p. ej. dos etapas que escriben el mismo archivo).
+    """
+
+    def __init__(self, name: str, func: Callable[..., Any], inputs: Iterable[str] = (),
+                 after: Iterable[str] = (), resources: Iterable[str] = ()):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.after = list(after)
+        self.resources = set(resources)
+
+    @property
+    def depends_on(self) -> List[str]:
+        return self.inputs + [name for name in self.after if name not in self.inputs]
+
+    def __repr__(self) -> str:
+        return f"Stage({self.name!r})"
+
+
+class StageGraph:
+    """Grafo de etapas con dependencias explícitas que se ejecuta en un pool de hilos.
+
+    Una etapa se lanza apenas terminan sus dependencias y sus recursos
+    exclusivos están libres, así que el tiempo total tiende al camino crítico y
+    no a la suma de las etapas. Los resultados intermedios (DataFrames) pasan en
+    memoria. Si una etapa falla, las que dependen de ella no se ejecutan y el
+    resto del grafo sigue; al final se lanza un error con las etapas fallidas.
+    Los archivos que una etapa escribe con el escritor en segundo plano se
+    publican antes de darla por terminada.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Stage] = {}
+
+    def add(self, name: str, func: Callable[..., Any], inputs: Iterable[str] = (),
+            after: Iterable[str] = (), resources: Iterable[str] = ()) -> Stage:
+        if name in self.stages:
+            raise ValueError(f"Etapa duplicada: {name}")
+        stage = Stage(name, func, inputs, after, resources)
+        self.stages[name] = stage
+        return stage
+
+    def _validate(self, provided: Dict[str, Any]):
+        """Verifica que las dependencias existan y que el grafo no tenga ciclos"""
+        for stage in self.stages.values():
+            for dep in stage.depends_on:
+                if dep not in self.stages and dep not in provided:
+                    raise ValueError(f"La etapa {stage.name} depende de {dep}, que no existe")
+        state = {}
+
+        def visit(name: str, path: List[str]):
+            if state.get(name) == 'done' or name not in self.stages:
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f"Ciclo en el grafo de etapas: {' -> '.join(path + [name])}")
+            state[name] = 'visiting'
+            for dep in self.stages[name].depends_on:
+                visit(dep, path + [name])
+            state[name] = 'done'
+
+        for name in self.stages:
+            visit(name, [])
+
+    def run(self, provided: Optional[Dict[str, Any]] = None, workers: int = 4) -> Dict[str, Any]:
+        """Ejecuta el grafo; `provided` son entradas ya disponibles (p. ej. metrics_data)"""
+        results = dict(provided or {})
+        self._validate(results)
+        writer = get_writer()
+        pending = {name: stage for name, stage in self.stages.items()}
+        failed: Dict[str, str] = {}
+        held = set()
+        running = {}
+        durations = {}
+        started = time.perf_counter()
+
+        def timed(stage: Stage, kwargs: Dict[str, Any]):
+            t0 = time.perf_counter()
+            try:
+                with writer.scope(stage.name):
+                    result = stage.func(**kwargs)
+                # Barrera: la etapa termina cuando sus archivos están publicados, así las
+                # dependientes nunca leen un resultado a medio escribir
+                writer.flush(stage.name)
+                return result
+            finally:
+                durations[stage.name] = time.perf_counter() - t0
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            while pending or running:
+                # Las etapas que dependen de una fallida no se ejecutan
+                for name, stage in list(pending.items()):
+                    blocked = [dep for dep in stage.depends_on if dep in failed]
+                    if blocked:
+                        failed[name] = f"depende de {', '.join(blocked)}"
+                        logging.error(f"Etapa {name} omitida: depende de {', '.join(blocked)}, que falló")
+                        del pending[name]
+
+                # Primero las etapas con recursos exclusivos: se ejecutan en serie y suelen
+                # formar el camino crítico
+                for name, stage in sorted(pending.items(), key=lambda item: not item[1].resources):
+                    if any(dep not in results for dep in stage.depends_on) or stage.resources & held:
+                        continue
+                    held |= stage.resources
+                    kwargs = {dep: results[dep] for dep in stage.inputs}
+                    running[executor.submit(timed, stage, kwargs)] = stage
+                    del pending[name]
+
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    held -= stage.resources
+                    try:
+                        results[stage.name] = future.result()
+                        logging.info(f"Etapa {stage.name} completada en {durations[stage.name]:.2f} s")
+                    except Exception as e:
+                        failed[stage.name] = str(e)
+                        logging.error(f"Error en la etapa {stage.name}: {str(e)}")
+
+        elapsed = time.perf_counter() - started
+        logging.info(f"Grafo de etapas: {len(durations)} etapas en {elapsed:.2f} s "
+                     f"(suma secuencial {sum(durations.values()):.2f} s, {max(1, workers)} hilos)")
+        if failed:
+            raise RuntimeError(f"Etapas fallidas: {', '.join(sorted(failed))}")
+        return results
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+INDEX_VERSION = 4
+INDEX_FILE = '.sweep_index.json'
+# Corridas excluidas por integrity_check.py; el índice las oculta a todas las etapas
+QUARANTINE_FILE = '.quarantine.json'
+
+# Orden canónico de configuraciones y protocolos; los que se descubran además se agregan al final
+KNOWN_CONFIGS = ['no_mal_no_int', 'int_no_mal', 'mal_no_int', 'mal_int']
+KNOWN_PROTOCOLS = ['AODV', 'OLSR', 'DSDV', 'DSR']
+BASELINE_CONFIG = 'no_mal_no_int'
+
+# Artefactos de una corrida, relativos al directorio runN
+ARTEFACTS = {
+    'metadata': 'metadata.txt',
+    'metrics': 'metrics/metrics.csv',
+    'node_metrics': 'metrics/node_metrics.csv',
+    'node_timeseries': 'metrics/node_timeseries.csv',
+    'nodes': 'node_metadata/nodes.csv',
+    'packets': 'packet_logs/packets_normal.csv',
+    'packets_malicious': 'packet_logs/packets_malicious.csv',
+    'routing': 'routing_logs/routing_table_changes.csv',
+    'control': 'routing_logs/control_messages.csv',
+    'positions': 'mobile_positions.csv',
+    'energy': 'energy_consumption.csv'
+}
+
+# Variantes comprimidas de un log, en orden de preferencia; se indexan como el mismo artefacto
+COMPRESSED_SUFFIXES = ('.zst', '.gz')
+
+# Subdirectorios de una corrida que se recorren al indexar
+RUN_SUBDIRS = sorted({Path(p).parent.as_posix() for p in ARTEFACTS.values()} - {'.'})
+
+_index_cache: Dict[str, 'SweepIndex'] = {}
+
+
+def _ordered(names, known: List[str]) -> List[str]:
+    """Ordena nombres con los conocidos primero (en su orden) y el resto alfabéticamente"""
+    names = set(names)
+    return [n for n in known if n in names] + sorted(names - set(known))
+
+
+def _scan_dir(path: str) -> Tuple[Dict[str, os.DirEntry], Dict[str, os.DirEntry]]:
+    """Lista un directorio en una sola llamada y separa subdirectorios de archivos"""
+    dirs, files = {}, {}
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        dirs[entry.name] = entry
+                    elif entry.is_file():
+                        files[entry.name] = entry
+                except OSError:
+                    continue
+    except (FileNotFoundError, NotADirectoryError, PermissionError):
+        pass
+    return dirs, files
+
+
+def _mtime_ns(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class SweepIndex:
+    """Índice del árbol <config>/<protocolo>/runN de un barrido.
+
+    Recorre el árbol una sola vez con os.scandir y registra tamaño y mtime de
+    cada artefacto conocido (en texto plano o comprimido). El índice se guarda en `.sweep_index.json` dentro
+    del barrido y se reutiliza mientras no cambie el mtime de ningún directorio
+    indexado (crear o borrar corridas y archivos invalida el índice). De la
+    raíz se compara la lista de subdirectorios, porque guardar el propio
+    índice modifica su mtime.
+    """
+
+    def __init__(self, simulation_dir: str):
+        self.simulation_dir = Path(simulation_dir)
+        self.index_file = self.simulation_dir / INDEX_FILE
+        # config -> protocolo -> corrida -> artefacto -> {'path', 'size', 'mtime'}
+        self.tree: Dict[str, Dict[str, Dict[str, Dict[str, Dict]]]] = {}
+        # Ruta relativa de cada directorio indexado -> mtime_ns
+        self.dir_mtimes: Dict[str, int] = {}
+        self.root_dirs: List[str] = []
+        # 'config/protocolo/corrida' -> motivos de la cuarentena
+        self.quarantine: Dict[str, List[str]] = {}
+
+    def build(self) -> 'SweepIndex':
+        """Recorre el barrido y construye el índice"""
+        root = str(self.simulation_dir)
+        self.tree = {}
+        self.dir_mtimes = {}
+
+        config_dirs, _ = _scan_dir(root)
+        self.root_dirs = sorted(config_dirs)
+        for config, config_entry in config_dirs.items():
+            if config.startswith('.'):
+                continue
+            protocol_dirs, _ = _scan_dir(config_entry.path)
+            protocols = {}
+            for protocol, protocol_entry in protocol_dirs.items():
+                run_dirs, _ = _scan_dir(protocol_entry.path)
+                runs = {name: self._index_run(entry, f'{config}/{protocol}/{name}')
+                        for name, entry in run_dirs.items() if name.startswith('run')}
+                # Un protocolo conocido sin corridas se registra igual (para advertirlo al validar)
+                if runs or protocol in KNOWN_PROTOCOLS:
+                    protocols[protocol] = runs
+                    self.dir_mtimes[f'{config}/{protocol}'] = protocol_entry.stat().st_mtime_ns
+            # Directorios auxiliares del barrido (logs, etc.) no tienen protocolos con corridas
+            if any(protocols.values()) or (config in KNOWN_CONFIGS and protocols):
+                self.tree[config] = protocols
+                self.dir_mtimes[config] = config_entry.stat().st_mtime_ns
+
+        total = sum(len(runs) for protocols in self.tree.values() for runs in protocols.values())
+        logging.info(f"Índice del barrido construido: {len(self.tree)} configuraciones, {total} corridas")
+        return self
+
+    def _index_run(self, run_entry: os.DirEntry, relative: str) -> Dict[str, Dict]:
+        """Registra los artefactos presentes en una corrida"""
+        self.dir_mtimes[relative] = run_entry.stat().st_mtime_ns
+        subdirs, files = _scan_dir(run_entry.path)
+        listing = dict(files)
+        for sub in RUN_SUBDIRS:
+            if sub in subdirs:
+                self.dir_mtimes[f'{relative}/{sub}'] = subdirs[sub].stat().st_mtime_ns
+                _, sub_files = _scan_dir(subdirs[sub].path)
+                listing.update({f'{sub}/{name}': entry for name, entry in sub_files.items()})
+
+        artefacts = {}
+        for name, relative_path in ARTEFACTS.items():
+            for candidate in (relative_path,) + tuple(relative_path + s for s in COMPRESSED_SUFFIXES):
+                entry = listing.get(candidate)
+                if entry is not None:
+                    stat = entry.stat()
+                    artefacts[name] = {'path': candidate, 'size': stat.st_size, 'mtime': stat.st_mtime}
+                    break
+        return artefacts
+
+    def is_current(self, check_files: bool = False) -> bool:
+        """Comprueba que ningún directorio indexado haya cambiado desde que se construyó el índice.
+
+        Reescribir un archivo existente no cambia el mtime de su directorio: con
+        check_files también se compara tamaño y mtime de cada artefacto (un
+        stat por archivo, pensado para procesos de larga duración).
+        """
+        if not self.dir_mtimes:
+            return False
+        root_dirs, _ = _scan_dir(str(self.simulation_dir))
+        if sorted(root_dirs) != self.root_dirs:
+            return False
+        for relative, mtime in self.dir_mtimes.items():
+            if _mtime_ns(str(self.simulation_dir / relative)) != mtime:
+                return False
+        if check_files:
+            for config, protocol, run in self.iter_runs(include_quarantined=True):
+                run_dir = self.run_dir(config, protocol, run)
+                for entry in self.tree[config][protocol][run].values():
+                    try:
+                        stat = os.stat(run_dir / entry['path'])
+                    except OSError:
+                        return False
+                    if stat.st_size != entry['size'] or stat.st_mtime != entry['mtime']:
+                        return False
+        return True
+
+    def save(self):
+        """Guarda el índice junto al barrido (si el directorio no es escribible, se omite)"""
+        payload = {'version': INDEX_VERSION, 'root_dirs': self.root_dirs,
+                   'dir_mtimes': self.dir_mtimes, 'tree': self.tree}
+        tmp_file = self.index_file.with_name(f'{INDEX_FILE}.{os.getpid()}.tmp')
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(payload, f, separators=(',', ':'))
+            os.replace(tmp_file, self.index_file)
+        except OSError as e:
+            logging.debug(f"No se pudo guardar el índice en {self.index_file}: {str(e)}")
+            try:
+                tmp_file.unlink()
+            except OSError:
+                pass
+
+    @classmethod
+    def load(cls, simulation_dir: str) -> Optional['SweepIndex']:
+        """Carga el índice guardado; devuelve None si no existe o es de otra versión"""
+        index = cls(simulation_dir)
+        try:
+            with open(index.index_file) as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if payload.get('version') != INDEX_VERSION:
+            return None
+        index.tree = payload.get('tree', {})
+        index.dir_mtimes = payload.get('dir_mtimes', {})
+        index.root_dirs = payload.get('root_dirs', [])
+        return index
+
+    def load_quarantine(self) -> 'SweepIndex':
+        """Lee la lista de cuarentena del barrido (si no existe, no hay corridas excluidas)"""
+        try:
+            with open(self.simulation_dir / QUARANTINE_FILE) as f:
+                self.quarantine = json.load(f).get('runs', {})
+        except (OSError, ValueError):
+            self.quarantine = {}
+        return self
+
+    def is_quarantined(self, config: str, protocol: str, run: str) -> bool:
+        return f'{config}/{protocol}/{run}' in self.quarantine
+
+    @property
+    def configs(self) -> List[str]:
+        """Configuraciones presentes en el barrido, en orden canónico"""
+        return _ordered(self.tree, KNOWN_CONFIGS)
+
+    @property
+    def protocols(self) -> List[str]:
+        """Protocolos presentes en alguna configuración, en orden canónico"""
+        return _ordered({p for protocols in self.tree.values() for p in protocols}, KNOWN_PROTOCOLS)
+
+    def protocols_for(self, config: str) -> List[str]:
+        """Protocolos presentes en una configuración"""
+        return _ordered(self.tree.get(config, {}), KNOWN_PROTOCOLS)
+
+    def runs(self, config: str, protocol: str, include_quarantined: bool = False) -> List[str]:
+        """Corridas de una celda, en el mismo orden que sorted(glob('run*')), sin las de cuarentena"""
+        runs = sorted(self.tree.get(config, {}).get(protocol, {}))
+        if include_quarantined or not self.quarantine:
+            return runs
+        return [run for run in runs if not self.is_quarantined(config, protocol, run)]
+
+    def iter_runs(self, include_quarantined: bool = False) -> Iterator[Tuple[str, str, str]]:
+        """Recorre (config, protocolo, corrida) en orden canónico"""
+        for config in self.configs:
+            for protocol in self.protocols_for(config):
+                for run in self.runs(config, protocol, include_quarantined):
+                    yield config, protocol, run
+
+    def run_dir(self, config: str, protocol: str, run: str) -> Path:
+        return self.simulation_dir / config / protocol / run
+
+    def artefact(self, config: str, protocol: str, run: str, name: str) -> Optional[Dict]:
+        """Entrada del artefacto (ruta relativa, tamaño, mtime) o None si la corrida no lo tiene"""
+        return self.tree.get(config, {}).get(protocol, {}).get(run, {}).get(name)
+
+    def artefact_path(self, config: str, protocol: str, run: str, name: str) -> Optional[Path]:
+        """Ruta absoluta del artefacto o None si la corrida no lo tiene"""
+        entry = self.artefact(config, protocol, run, name)
+        return self.run_dir(config, protocol, run) / entry['path'] if entry else None
+
+    def fingerprint(self, names: List[str] = None) -> str:
+        """Huella de los artefactos indicados (o de todos): cambia si se agrega, borra o modifica alguno"""
+        digest = hashlib.sha1()
+        for config, protocol, run in self.iter_runs():
+            artefacts = self.tree[config][protocol][run]
+            for name in sorted(artefacts if names is None else set(names) & set(artefacts)):
+                entry = artefacts[name]
+                digest.update(f"{config}/{protocol}/{run}/{entry['path']}:{entry['size']}:{entry['mtime']}\n".encode())
+        return digest.hexdigest()
+
+    def total_bytes(self, name: str = None) -> int:
+        """Tamaño total indexado (de un artefacto o de todos)"""
+        return sum(entry['size'] for protocols in self.tree.values() for runs in protocols.values()
+                   for artefacts in runs.values() for key, entry in artefacts.items()
+                   if name is None or key == name)
+
+
+def get_sweep_index(simulation_dir: str, refresh: bool = False, persist: bool = True) -> SweepIndex:
+    """Devuelve el índice de un barrido, compartido por todas las etapas del proceso.
+
+    Dentro de un mismo proceso el índice se construye o valida una sola vez. El
+    guardado en disco se reutiliza si sigue vigente; en otro caso se recorre
+    el árbol y se guarda.
+    """
+    key = str(Path(simulation_dir).resolve())
+    if not refresh and key in _index_cache:
+        return _index_cache[key]
+
+    index = None if refresh else SweepIndex.load(simulation_dir)
+    if index is not None and index.is_current():
+        logging.info(f"Índice del barrido reutilizado desde {index.index_file}")
+    else:
+        index = SweepIndex(simulation_dir).build()
+        if persist and index.tree:
+            index.save()
+    _index_cache[key] = index.load_quarantine()
+    return index
+
+
+def register_layout(simulation_dir: str, layout: Dict[str, Dict[str, List[str]]]) -> SweepIndex:
+    """Registra en el proceso el índice de un barrido que no está en disco, sin artefactos.
+
+    `layout` es configuración -> protocolo -> corridas. Lo usa la combinación de
+    shards: las etapas toman las celdas de los parciales en lugar de las conocidas.
+    """
+    index = SweepIndex(simulation_dir)
+    index.tree = {config: {protocol: {run: {} for run in runs} for protocol, runs in protocols.items()}
+                  for config, protocols in layout.items()}
+    _index_cache[str(Path(simulation_dir).resolve())] = index
+    return index
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Uso: python sweep_index.py <directorio_simulacion>")
+        sys.exit(1)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    index = get_sweep_index(sys.argv[1], refresh=True)
+    for config in index.configs:
+        for protocol in index.protocols_for(config):
+            runs = index.runs(config, protocol)
+            quarantined = len(index.runs(config, protocol, include_quarantined=True)) - len(runs)
+            print(f"{config}/{protocol}: {len(runs)} corridas" + (f" ({quarantined} en cuarentena)" if quarantined else ""))
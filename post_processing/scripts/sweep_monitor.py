@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import time
+import signal
+import asyncio
+import logging
+import argparse
+import statistics
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+TELEMETRY_FILE = 'logs/telemetry.csv'
+TELEMETRY_COLUMNS = ['timestamp', 'config', 'protocol', 'run', 'pid', 'elapsed_s', 'cpu_s', 'cpu_pct',
+                     'rss_mb', 'sim_time', 'sim_total', 'sim_speed', 'runs_done', 'runs_total', 'eta_s']
+# Logs que la simulación escribe cada segundo simulado; la primera columna es el tiempo de simulación
+PROGRESS_LOGS = ('mobile_positions.csv', 'energy_consumption.csv', 'metrics/node_timeseries.csv')
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path, 'rb') as f:
+            return f.read().decode('utf-8', 'replace')
+    except OSError:
+        return None
+
+
+def _boot_uptime() -> float:
+    text = _read('/proc/uptime')
+    return float(text.split()[0]) if text else 0.0
+
+
+def _last_time(path: Path) -> Optional[float]:
+    """Primera columna de la última línea completa de un CSV que crece (sin leerlo entero)"""
+    try:
+        with open(path, 'rb') as f:
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(0, size - 4096))
+            tail = f.read()
+    except OSError:
+        return None
+    # La última línea puede estar a medio escribir: solo cuentan las terminadas en '\n'
+    lines = tail.split(b'\n')[:-1]
+    for line in reversed(lines):
+        try:
+            return float(line.split(b',', 1)[0])
+        except ValueError:
+            continue
+    return None
+
+
+class SimulationJob:
+    """Una corrida de ns-3 en curso, identificada por su --outputDir"""
+
+    def __init__(self, output_dir: str, args: Dict[str, str]):
+        self.output_dir = Path(output_dir)
+        self.config = args.get('configName', '')
+        self.protocol = args.get('routingProtocol', '')
+        match = re.search(r'_run(\d+)$', self.output_dir.name)
+        if match:
+            self.run = int(match.group(1))
+        else:
+            # run_simulations CON DSR.sh usa SEED=1000+run
+            self.run = int(args['seed']) - 1000 if args.get('seed', '').isdigit() else 0
+        self.sim_total = float(args.get('simTime', 'nan'))
+        self.pids: List[int] = []
+        self.start = None
+        self.cpu_s = 0.0
+        self.rss_mb = 0.0
+        self.sim_time = None
+        self.sample_wall = None
+        self.cpu_pct = float('nan')
+        self.sim_speed = float('nan')
+        self.warned = False
+
+    def remaining_s(self) -> Optional[float]:
+        """Tiempo de pared que le falta a la corrida según su velocidad actual"""
+        if self.sim_time is None or not self.sim_speed > 0:
+            return None
+        return max(0.0, self.sim_total - self.sim_time) / self.sim_speed
+
+    def probe(self):
+        """Muestrea CPU y RSS de los procesos de la corrida y el avance de sus logs"""
+        now = time.time()
+        uptime = _boot_uptime()
+        cpu_s, rss_mb, start = 0.0, 0.0, None
+        for pid in self.pids:
+            stat = _read(f'/proc/{pid}/stat')
+            if stat is None:
+                continue
+            # El nombre del ejecutable va entre paréntesis y puede tener espacios
+            fields = stat[stat.rfind(')') + 2:].split()
+            cpu_s += (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+            rss_mb += int(fields[21]) * PAGE_SIZE / 2 ** 20
+            started = now - (uptime - int(fields[19]) / CLOCK_TICKS)
+            start = started if start is None else min(start, started)
+        sim_time = max((t for t in (_last_time(self.output_dir / name) for name in PROGRESS_LOGS)
+                        if t is not None), default=None)
+
+        if self.sample_wall is not None:
+            dt = now - self.sample_wall
+            if dt > 0:
+                self.cpu_pct = 100 * (cpu_s - self.cpu_s) / dt
+                if sim_time is not None and self.sim_time is not None:
+                    self.sim_speed = (sim_time - self.sim_time) / dt
+        elif start is not None and now > start:
+            self.cpu_pct = 100 * cpu_s / (now - start)
+            if sim_time is not None:
+                self.sim_speed = sim_time / (now - start)
+        self.start = start if start is not None else self.start
+        self.cpu_s, self.rss_mb, self.sim_time, self.sample_wall = cpu_s, rss_mb, sim_time, now
+
+    def elapsed(self, now: float) -> float:
+        return now - self.start if self.start is not None else 0.0
+
+
+def find_jobs(simulation_dir: Path) -> Dict[str, SimulationJob]:
+    """Corridas en curso del barrido: procesos con --outputDir dentro del directorio del barrido.
+
+    `./ns3 run` lanza el ejecutable de la simulación como hijo y ambos llevan
+    el --outputDir en la línea de comandos; se agrupan por directorio de salida
+    y cuentan como una sola corrida.
+    """
+    prefix = str(simulation_dir.resolve()) + os.sep
+    jobs: Dict[str, SimulationJob] = {}
+    for entry in os.scandir('/proc'):
+        if not entry.name.isdigit():
+            continue
+        cmdline = _read(f'/proc/{entry.name}/cmdline')
+        if not cmdline or '--outputDir=' not in cmdline:
+            continue
+        # `./ns3 run "..."` pasa los argumentos de la simulación en un solo argumento
+        args = dict(re.findall(r'--(\w+)=([^\s\x00"]+)', cmdline))
+        output_dir = os.path.abspath(args['outputDir'])
+        if not output_dir.startswith(prefix):
+            continue
+        job = jobs.setdefault(output_dir, SimulationJob(output_dir, args))
+        job.pids.append(int(entry.name))
+    return jobs
+
+
+def count_completed(simulation_dir: Path) -> int:
+    """Corridas ya movidas a <config>/<protocolo>/runN (incluidas las recuperadas del caché)"""
+    return sum(1 for _ in simulation_dir.glob('*/*/run*/metrics/metrics.csv'))
+
+
+class SweepMonitor:
+    """Monitor asíncrono de un barrido en curso.
+
+    Cada `interval` segundos busca en /proc las simulaciones del barrido, lee
+    CPU y RSS de cada una y el tiempo simulado de la última línea de sus logs
+    por segundo simulado; la velocidad (segundos simulados por segundo de
+    pared) sale del crecimiento entre muestras. Cada muestra se agrega como una
+    fila de `logs/telemetry.csv`, que `summarize` agrega después por
+    configuración y protocolo. El tiempo restante del barrido se estima con la
+    duración mediana de las corridas observadas y el avance de las que están en
+    curso.
+    """
+
+    def __init__(self, simulation_dir: str, total_runs: Optional[int] = None, interval: float = 5.0,
+                 report_every: float = 60.0, runaway_factor: float = 3.0, telemetry: Optional[str] = None):
+        self.simulation_dir = Path(simulation_dir)
+        self.total_runs = total_runs
+        self.interval = interval
+        self.report_every = report_every
+        self.runaway_factor = runaway_factor
+        self.telemetry = Path(telemetry) if telemetry else self.simulation_dir / TELEMETRY_FILE
+        self.jobs: Dict[str, SimulationJob] = {}
+        # Duración de pared de las corridas que terminaron mientras el monitor las observaba
+        self.durations: Dict[Tuple[str, str], List[float]] = {}
+        self.completed = 0
+        self.last_report = 0.0
+
+    def _refresh_jobs(self):
+        now = time.time()
+        found = find_jobs(self.simulation_dir)
+        for output_dir, job in list(self.jobs.items()):
+            if output_dir not in found:
+                # Terminó: la duración observada alimenta la estimación del resto del barrido
+                self.durations.setdefault((job.config, job.protocol), []).append(job.elapsed(now))
+                del self.jobs[output_dir]
+                logging.info(f"Corrida terminada {job.config}/{job.protocol}/run{job.run}: "
+                             f"{job.elapsed(now):.0f} s de pared, {job.cpu_s:.0f} s de CPU, {job.rss_mb:.0f} MB")
+        for output_dir, job in found.items():
+            if output_dir in self.jobs:
+                self.jobs[output_dir].pids = job.pids
+            else:
+                self.jobs[output_dir] = job
+
+    def typical_duration(self, config: str = None, protocol: str = None) -> Optional[float]:
+        """Mediana de la duración observada de la celda, del protocolo o de todo el barrido"""
+        for match in ((lambda c, p: c == config and p == protocol), (lambda c, p: p == protocol), (lambda c, p: True)):
+            values = [d for (c, p), ds in self.durations.items() if match(c, p) for d in ds]
+            if values:
+                return statistics.median(values)
+        return None
+
+    def eta(self, now: float) -> Optional[float]:
+        """Tiempo de pared restante: corridas en curso más las pendientes a la duración mediana"""
+        if self.total_runs is None:
+            return None
+        remainders = []
+        for job in self.jobs.values():
+            remaining = job.remaining_s()
+            if remaining is None:
+                typical = self.typical_duration(job.config, job.protocol)
+                if typical is None:
+                    return None
+                remaining = max(0.0, typical - job.elapsed(now))
+            remainders.append(remaining)
+        running = sum(remainders)
+        pending = max(0, self.total_runs - self.completed - len(self.jobs))
+        if pending == 0:
+            return max(remainders, default=0.0)
+        typical = self.typical_duration()
+        if typical is None:
+            return None
+        # Con varias corridas simultáneas las pendientes se reparten entre ellas
+        return (running + pending * typical) / max(1, len(self.jobs))
+
+    def _check_runaway(self, job: SimulationJob, now: float):
+        typical = self.typical_duration(job.config, job.protocol)
+        if job.warned or typical is None or job.elapsed(now) <= self.runaway_factor * typical:
+            return
+        job.warned = True
+        logging.warning(f"Corrida lenta {job.config}/{job.protocol}/run{job.run} (pid {job.pids[0]}): "
+                        f"{job.elapsed(now):.0f} s de pared, más de {self.runaway_factor:g} veces la mediana "
+                        f"({typical:.0f} s); tiempo simulado {job.sim_time}/{job.sim_total:g}")
+
+    def _append_rows(self, rows: List[List]):
+        if not rows:
+            return
+        self.telemetry.parent.mkdir(parents=True, exist_ok=True)
+        new = not self.telemetry.exists()
+        with open(self.telemetry, 'a') as f:
+            if new:
+                f.write(','.join(TELEMETRY_COLUMNS) + '\n')
+            for row in rows:
+                f.write(','.join('' if v is None else (f'{v:.6g}' if isinstance(v, float) else str(v))
+                                 for v in row) + '\n')
+
+    async def sample(self):
+        """Una muestra de todas las corridas en curso"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._refresh_jobs)
+        self.completed = await loop.run_in_executor(None, count_completed, self.simulation_dir)
+        # Las lecturas de /proc y de las colas de los logs de cada corrida van en paralelo
+        await asyncio.gather(*(loop.run_in_executor(None, job.probe) for job in self.jobs.values()))
+
+        now = time.time()
+        eta = self.eta(now)
+        rows = []
+        for job in self.jobs.values():
+            self._check_runaway(job, now)
+            rows.append([int(now), job.config, job.protocol, job.run, job.pids[0], round(job.elapsed(now), 1),
+                         round(job.cpu_s, 2), job.cpu_pct, round(job.rss_mb, 1), job.sim_time, job.sim_total,
+                         job.sim_speed, self.completed, self.total_runs, None if eta is None else round(eta)])
+        await loop.run_in_executor(None, self._append_rows, rows)
+
+        if now - self.last_report >= self.report_every:
+            self.last_report = now
+            self.report(eta)
+
+    def report(self, eta: Optional[float]):
+        total = self.total_runs if self.total_runs is not None else '?'
+        eta_text = f"{int(eta) // 3600}:{int(eta) % 3600 // 60:02d}:{int(eta) % 60:02d}" if eta is not None else 'desconocido'
+        running = ', '.join(f"{j.config}/{j.protocol}/run{j.run} {j.cpu_pct:.0f}% CPU {j.rss_mb:.0f} MB "
+                            f"x{j.sim_speed:.2f}" for j in self.jobs.values()) or 'ninguna'
+        print(f"{time.strftime('%a %d %b %Y %H:%M:%S')} - Corridas {self.completed}/{total} - "
+              f"En curso: {running} - Restante estimado: {eta_text}", flush=True)
+
+    async def watch(self, parent_pid: Optional[int] = None, once: bool = False):
+        """Muestrea hasta recibir SIGTERM/SIGINT o hasta que termina el proceso `parent_pid`"""
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+        logging.info(f"Monitoreando {self.simulation_dir} cada {self.interval:g} s; telemetría en {self.telemetry}")
+        while True:
+            try:
+                await self.sample()
+            except Exception as e:
+                logging.error(f"Error al muestrear el barrido: {str(e)}")
+            if once or (parent_pid is not None and not os.path.exists(f'/proc/{parent_pid}')):
+                break
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=self.interval)
+                break
+            except asyncio.TimeoutError:
+                pass
+        self.report(self.eta(time.time()))
+
+
+def load_telemetry(path: str) -> pd.DataFrame:
+    try:
+        return pd.read_csv(path)
+    except (OSError, pd.errors.EmptyDataError) as e:
+        logging.error(f"Error fatal: no se pudo leer la telemetría {path}: {str(e)}")
+        sys.exit(1)
+
+
+def summarize(telemetry: pd.DataFrame, runaway_factor: float = 3.0) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Costo de simulación por configuración y protocolo y corridas anómalas.
+
+    Cada corrida se resume con su última muestra (tiempo de pared y CPU son
+    acumulados) y el pico de RSS; las celdas se ordenan por tiempo de pared
+    medio. Son anómalas las corridas que tardaron más de `runaway_factor` veces
+    la mediana de su celda.
+    """
+    runs = telemetry.sort_values('timestamp').groupby(['config', 'protocol', 'run'], sort=False).agg(
+        wall_s=('elapsed_s', 'last'), cpu_s=('cpu_s', 'last'), peak_rss_mb=('rss_mb', 'max'),
+        sim_time=('sim_time', 'max'), sim_total=('sim_total', 'last'), samples=('timestamp', 'size')).reset_index()
+    runs['sim_speed'] = runs['sim_time'] / runs['wall_s']
+
+    cells = runs.groupby(['config', 'protocol']).agg(
+        runs=('run', 'nunique'), wall_s_mean=('wall_s', 'mean'), wall_s_max=('wall_s', 'max'),
+        cpu_s_mean=('cpu_s', 'mean'), peak_rss_mb=('peak_rss_mb', 'max'),
+        sim_speed_mean=('sim_speed', 'mean')).reset_index()
+    cells['wall_share_pct'] = 100 * cells['wall_s_mean'] * cells['runs'] / (cells['wall_s_mean'] * cells['runs']).sum()
+    cells = cells.sort_values('wall_s_mean', ascending=False).reset_index(drop=True)
+
+    median = runs.groupby(['config', 'protocol'])['wall_s'].transform('median')
+    runaways = runs.assign(cell_median_s=median)[runs['wall_s'] > runaway_factor * median]
+    return cells, runaways.sort_values('wall_s', ascending=False).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Monitor de recursos y avance de un barrido de simulaciones')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    watch_parser = subparsers.add_parser('watch', help='Monitorear las simulaciones en curso del barrido')
+    watch_parser.add_argument('simulation_dir', help='Directorio del barrido')
+    watch_parser.add_argument('--total', type=int, default=None, help='Corridas totales del barrido (para el ETA)')
+    watch_parser.add_argument('--interval', type=float, default=5.0, help='Segundos entre muestras')
+    watch_parser.add_argument('--report-every', type=float, default=60.0,
+                              help='Segundos entre líneas de estado en la salida estándar')
+    watch_parser.add_argument('--runaway-factor', type=float, default=3.0,
+                              help='Avisar si una corrida supera este múltiplo de la duración mediana')
+    watch_parser.add_argument('--parent-pid', type=int, default=None, help='Terminar cuando termine este proceso')
+    watch_parser.add_argument('--telemetry', default=None, help=f'Archivo de telemetría (<barrido>/{TELEMETRY_FILE})')
+    watch_parser.add_argument('--once', action='store_true', help='Tomar una sola muestra')
+
+    summary_parser = subparsers.add_parser('summarize', help='Costo de simulación por configuración y protocolo')
+    summary_parser.add_argument('telemetry', help='Archivo de telemetría o directorio del barrido')
+    summary_parser.add_argument('--runaway-factor', type=float, default=3.0)
+    summary_parser.add_argument('--output', default=None, help='CSV con el resumen por celda')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        handlers=[logging.StreamHandler(sys.stderr)], force=True)
+
+    if args.command == 'watch':
+        monitor = SweepMonitor(args.simulation_dir, total_runs=args.total, interval=args.interval,
+                               report_every=args.report_every, runaway_factor=args.runaway_factor,
+                               telemetry=args.telemetry)
+        asyncio.run(monitor.watch(parent_pid=args.parent_pid, once=args.once))
+    else:
+        path = Path(args.telemetry)
+        if path.is_dir():
+            path = path / TELEMETRY_FILE
+        cells, runaways = summarize(load_telemetry(str(path)), args.runaway_factor)
+        with pd.option_context('display.width', 200, 'display.max_columns', None):
+            print(cells.round(2).to_string(index=False))
+            if not runaways.empty:
+                print(f"\nCorridas anómalas (más de {args.runaway_factor:g} veces la mediana de su celda):")
+                print(runaways.round(2).to_string(index=False))
+        if args.output:
+            cells.round(4).to_csv(args.output, index=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+
+import sys
+import logging
+import argparse
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from sweep_index import get_sweep_index
+from log_io import read_csv
+from sharding import ShardSpec
+from timeseries_store import STORE_STREAMS, TimeSeriesStore
+
+# Flujos que se alinean con los paquetes: artefacto, columna de tiempo y columnas que se adjuntan
+STREAMS = {
+    'positions': {'artefact': 'positions', 'time': 'time', 'columns': ['x', 'y', 'z']},
+    'energy': {'artefact': 'energy', 'time': 'time', 'columns': ['energy_remaining']},
+    # Carga del emisor en su último intervalo con tráfico (la serie por nodo omite los intervalos en cero)
+    'load': {'artefact': 'node_timeseries', 'time': 'time', 'columns': ['tx_packets', 'lost_packets', 'throughput_kbps']},
+    # Cada fila real de la tabla de rutas es un cambio; se adjunta el acumulado por nodo
+    'routing': {'artefact': 'routing', 'time': 'timestamp', 'columns': ['route_changes']}
+}
+
+class TimelineJoiner:
+    """Alinea por tiempo de simulación los logs de una o varias corridas.
+
+    Cada log tiene su propia base de tiempo (`sim_time` en paquetes, `time` en
+    posiciones y energía, `timestamp` en enrutamiento). Los flujos de todas las
+    corridas se concatenan con un identificador de corrida y se unen con un
+    único merge_asof por (corrida, nodo), sin bucles por corrida ni por paquete.
+    """
+
+    def __init__(self, simulation_dir: str, runs: str = '*/*'):
+        self.simulation_dir = Path(simulation_dir)
+        self.index = get_sweep_index(simulation_dir)
+        self.spec = ShardSpec(runs)
+        self.run_keys = [key for key in self.index.iter_runs() if self.spec.matches(*key)]
+        self.run_table = pd.DataFrame(self.run_keys, columns=['config', 'protocol', 'run'])
+        self.run_table.index.name = 'run_id'
+        self.store = TimeSeriesStore(simulation_dir)
+
+    def _read(self, run_id: int, artefact: str, usecols: List[str] = None) -> Optional[pd.DataFrame]:
+        """Lee un artefacto de una corrida; devuelve None si falta o está vacío"""
+        path = self.index.artefact_path(*self.run_keys[run_id], artefact)
+        if path is None:
+            return None
+        try:
+            df = read_csv(path, usecols=usecols)
+        except pd.errors.EmptyDataError:
+            return None
+        except ValueError as e:
+            logging.warning(f"Columnas inesperadas en {path}: {str(e)}")
+            return None
+        if df.empty:
+            return None
+        df.insert(0, 'run_id', run_id)
+        return df
+
+    def _read_stored(self, run_id: int, name: str) -> Optional[pd.DataFrame]:
+        """Lee posiciones o energía del almacén memmap si está vigente; si no, del CSV"""
+        store = self.store.open(*self.run_keys[run_id], name)
+        if store is None:
+            stream = STREAMS[name]
+            return self._read(run_id, stream['artefact'], [stream['time'], 'node_id'] + stream['columns'])
+        df = store.read(columns=STREAMS[name]['columns'])
+        if df.empty:
+            return None
+        df.insert(0, 'run_id', run_id)
+        return df
+
+    def _concat(self, frames: List[pd.DataFrame], columns: List[str]) -> pd.DataFrame:
+        frames = [f for f in frames if f is not None]
+        if not frames:
+            return pd.DataFrame({c: pd.Series(dtype=float) for c in columns})
+        return pd.concat(frames, ignore_index=True)
+
+    def load_nodes(self) -> pd.DataFrame:
+        """Tabla (run_id, ip_address) -> node_id, node_type de todas las corridas"""
+        frames = [self._read(run_id, 'nodes', ['node_id', 'ip_address', 'node_type'])
+                  for run_id in range(len(self.run_keys))]
+        return self._concat(frames, ['run_id', 'node_id', 'ip_address', 'node_type'])
+
+    def load_packets(self, artefact: str = 'packets') -> pd.DataFrame:
+        """Paquetes recibidos de todas las corridas, con el nodo emisor resuelto desde su IP"""
+        frames = [self._read(run_id, artefact) for run_id in range(len(self.run_keys))]
+        packets = self._concat(frames, ['run_id', 'source_ip', 'sim_time'])
+        if packets.empty:
+            return packets
+        nodes = self.load_nodes()[['run_id', 'ip_address', 'node_id', 'node_type']]
+        packets = packets.merge(nodes, how='left', left_on=['run_id', 'source_ip'],
+                                right_on=['run_id', 'ip_address']).drop(columns='ip_address')
+        unknown = packets['node_id'].isna().sum()
+        if unknown:
+            logging.warning(f"{unknown} paquetes con IP de origen sin nodo en nodes.csv")
+        packets['node_id'] = packets['node_id'].fillna(-1).astype(np.int64)
+        packets['sim_time'] = packets['sim_time'].astype(float)
+        return packets
+
+    def load_stream(self, name: str) -> pd.DataFrame:
+        """Carga un flujo de todas las corridas como (run_id, node_id, t, columnas)"""
+        stream = STREAMS[name]
+        time_col = stream['time']
+        if name == 'routing':
+            usecols = [time_col, 'node_id', 'destination']
+        else:
+            usecols = [time_col, 'node_id'] + stream['columns']
+        if name in STORE_STREAMS:
+            frames = [self._read_stored(run_id, name) for run_id in range(len(self.run_keys))]
+        else:
+            frames = [self._read(run_id, stream['artefact'], usecols) for run_id in range(len(self.run_keys))]
+        df = self._concat(frames, ['run_id'] + usecols).rename(columns={time_col: 't'})
+
+        if name == 'routing':
+            # Las filas 0.0.0.0 son marcadores de versiones anteriores del simulador, no rutas
+            df = df[df['destination'].astype(str) != '0.0.0.0'].drop(columns='destination')
+            df = df.sort_values(['run_id', 'node_id', 't'], kind='mergesort')
+            df['route_changes'] = df.groupby(['run_id', 'node_id']).cumcount() + 1
+
+        df['node_id'] = df['node_id'].astype(np.int64)
+        df['t'] = df['t'].astype(float)
+        return df.sort_values('t', kind='mergesort').reset_index(drop=True)
+
+    def asof_join(self, left: pd.DataFrame, right: pd.DataFrame, name: str, left_time: str = 'sim_time',
+                  direction: str = 'backward', tolerance: float = None) -> pd.DataFrame:
+        """Une a cada fila de `left` la última muestra de `right` del mismo nodo y corrida.
+
+        Agrega `<name>_age`: tiempo entre la muestra usada y la fila (negativo si
+        direction='forward'). Con tolerance se descartan muestras más viejas.
+        """
+        left = left.sort_values(left_time, kind='mergesort')
+        right = right.rename(columns={'t': f'{name}_time'})
+        joined = pd.merge_asof(left, right, left_on=left_time, right_on=f'{name}_time',
+                               by=['run_id', 'node_id'], direction=direction, tolerance=tolerance,
+                               allow_exact_matches=True)
+        joined[f'{name}_age'] = joined[left_time] - joined.pop(f'{name}_time')
+        return joined
+
+    def packet_context(self, streams: Iterable[str] = ('positions', 'energy', 'routing'),
+                       tolerance: float = None, artefact: str = 'packets') -> pd.DataFrame:
+        """Cada paquete recibido con la posición, energía y rutas de su emisor al momento de llegar"""
+        result = self.load_packets(artefact)
+        if result.empty:
+            logging.warning("No se encontraron paquetes en las corridas seleccionadas")
+            return result
+        for name in streams:
+            stream = self.load_stream(name)
+            if stream.empty:
+                logging.info(f"Sin datos de {name} en las corridas seleccionadas")
+                for column in STREAMS[name]['columns'] + [f'{name}_age']:
+                    result[column] = np.nan
+                continue
+            result = self.asof_join(result, stream, name, tolerance=tolerance)
+
+        if 'route_changes' in result.columns and 'routing' in streams:
+            # Sin cambios previos registrados para el nodo: cero cambios, no un dato faltante
+            result['route_changes'] = result['route_changes'].fillna(0).astype(np.int64)
+
+        result = result.sort_values(['run_id', 'sim_time'], kind='mergesort').reset_index(drop=True)
+        return self.run_table.reset_index().merge(result, on='run_id', how='right').drop(columns='run_id')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Une por tiempo de simulación paquetes, posiciones, energía y rutas')
+    parser.add_argument('simulation_dir')
+    parser.add_argument('--runs', default='*/*', help="'<config>/<protocolo>[/<desde>-<hasta>]', admite '*'")
+    parser.add_argument('--streams', nargs='+', default=list(STREAMS), choices=list(STREAMS))
+    parser.add_argument('--tolerance', type=float, default=None,
+                        help='Antigüedad máxima (s) de la muestra unida a cada paquete')
+    parser.add_argument('--malicious', action='store_true', help='Usa packets_malicious.csv en lugar del normal')
+    parser.add_argument('--output', default='post_processing/results/tables/packet_context.csv.gz')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    try:
+        joiner = TimelineJoiner(args.simulation_dir, args.runs)
+        context = joiner.packet_context(args.streams, args.tolerance,
+                                        'packets_malicious' if args.malicious else 'packets')
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        # Nivel de compresión bajo: el CSV resultante es grande y pandas usa 9 por defecto
+        compression = {'method': 'gzip', 'compresslevel': 1, 'mtime': 0} if output.suffix == '.gz' else 'infer'
+        context.to_csv(output, index=False, compression=compression)
+        logging.info(f"{len(context)} paquetes de {len(joiner.run_keys)} corridas escritos en {output}")
+    except Exception as e:
+        logging.error(f"Error fatal: {str(e)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
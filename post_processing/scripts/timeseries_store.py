@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import shutil
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from sweep_index import get_sweep_index
+from log_io import iter_csv_chunks
+
+STORE_VERSION = 1
+# Almacén del barrido, junto a sus logs (el índice ignora los directorios ocultos de la raíz)
+STORE_DIR = '.timeseries_store'
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+# Logs por nodo que crecen como nodos × tiempo de simulación: artefacto y columnas de valores
+STORE_STREAMS = {
+    'positions': {'artefact': 'positions', 'columns': ['x', 'y', 'z']},
+    'energy': {'artefact': 'energy', 'columns': ['energy_remaining']}
+}
+
+
+def _chunk_files(k: int):
+    return f'chunk_{k:05d}.npy', f'chunk_{k:05d}.nodes.npy'
+
+
+def ingest_stream(source: str, store_dir: str, stream: str, source_entry: Dict,
+                  chunk_rows: int = DEFAULT_CHUNK_ROWS) -> int:
+    """Convierte un log CSV por nodo en bloques .npy ordenados por (nodo, tiempo).
+
+    El CSV se recorre por bloques de `chunk_rows` filas, sin cargarlo completo.
+    Cada bloque se guarda como una matriz float64 (tiempo + columnas) con las
+    filas de cada nodo contiguas y ordenadas por tiempo, y una tabla
+    (node_id, inicio, fin) para ubicarlas. El almacén se escribe en un
+    directorio temporal y se renombra al terminar.
+    """
+    columns = STORE_STREAMS[stream]['columns']
+    store_dir = Path(store_dir)
+    store_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp = store_dir.with_name(f'.{store_dir.name}.{os.getpid()}.tmp')
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir()
+    chunks, nodes, rows = [], set(), 0
+    try:
+        try:
+            reader = iter_csv_chunks(source, chunksize=chunk_rows, usecols=['time', 'node_id'] + columns)
+            for chunk in reader:
+                chunk = chunk.dropna(subset=['time', 'node_id'])
+                if chunk.empty:
+                    continue
+                node_ids = chunk['node_id'].to_numpy(np.int64)
+                data = chunk[['time'] + columns].to_numpy(np.float64)
+                order = np.lexsort((data[:, 0], node_ids))
+                node_ids, data = node_ids[order], np.ascontiguousarray(data[order])
+                ids, starts = np.unique(node_ids, return_index=True)
+                bounds = np.column_stack([ids, starts, np.append(starts[1:], len(node_ids))])
+
+                data_file, nodes_file = _chunk_files(len(chunks))
+                np.save(tmp / data_file, data)
+                np.save(tmp / nodes_file, bounds)
+                chunks.append({'rows': len(data), 't_min': float(data[:, 0].min()),
+                               't_max': float(data[:, 0].max())})
+                nodes.update(ids.tolist())
+                rows += len(data)
+        except pd.errors.EmptyDataError:
+            logging.warning(f"{source} está vacío: se guarda un almacén sin filas")
+
+        meta = {'version': STORE_VERSION, 'stream': stream, 'columns': columns, 'source': source_entry,
+                'rows': rows, 'nodes': sorted(nodes), 'chunk_rows': chunk_rows, 'chunks': chunks,
+                't_min': min((c['t_min'] for c in chunks), default=None),
+                't_max': max((c['t_max'] for c in chunks), default=None)}
+        with open(tmp / 'meta.json', 'w') as f:
+            json.dump(meta, f)
+        if store_dir.exists():
+            shutil.rmtree(store_dir)
+        os.replace(tmp, store_dir)
+        return rows
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def _ingest_worker(args):
+    return args[0], ingest_stream(*args)
+
+
+class RunStore:
+    """Serie por nodo de una corrida guardada en bloques .npy abiertos con memmap.
+
+    Leer una ventana (nodos × intervalo de tiempo) solo toca las filas de esa
+    ventana: se descartan los bloques fuera del intervalo por sus límites de
+    tiempo, se ubican las filas de cada nodo con su tabla de inicio y fin y
+    el intervalo se recorta con búsqueda binaria sobre el tiempo del nodo.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / 'meta.json') as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != STORE_VERSION:
+            raise ValueError(f"Versión de almacén no soportada en {self.path}: {self.meta.get('version')}")
+        self.columns: List[str] = self.meta['columns']
+        self._chunks = {}
+
+    @property
+    def nodes(self) -> List[int]:
+        return self.meta['nodes']
+
+    @property
+    def rows(self) -> int:
+        return self.meta['rows']
+
+    def _chunk(self, k: int):
+        if k not in self._chunks:
+            data_file, nodes_file = _chunk_files(k)
+            self._chunks[k] = (np.load(self.path / data_file, mmap_mode='r'), np.load(self.path / nodes_file))
+        return self._chunks[k]
+
+    def read(self, nodes: Iterable[int] = None, start: float = None, end: float = None,
+             columns: List[str] = None) -> pd.DataFrame:
+        """Filas (time, node_id, columnas) de los nodos indicados con start <= time <= end"""
+        columns = columns or self.columns
+        unknown = set(columns) - set(self.columns)
+        if unknown:
+            raise ValueError(f"Columnas desconocidas en {self.path}: {', '.join(sorted(unknown))}")
+        picks = [0] + [1 + self.columns.index(c) for c in columns]
+        wanted = None if nodes is None else np.asarray(sorted(set(int(n) for n in nodes)), dtype=np.int64)
+
+        values, node_ids = [], []
+        for k, info in enumerate(self.meta['chunks']):
+            if (start is not None and info['t_max'] < start) or (end is not None and info['t_min'] > end):
+                continue
+            data, bounds = self._chunk(k)
+            if wanted is not None:
+                bounds = bounds[np.isin(bounds[:, 0], wanted)]
+            inside = (start is None or info['t_min'] >= start) and (end is None or info['t_max'] <= end)
+            if inside and wanted is None:
+                values.append(data[:, picks])
+                node_ids.append(np.repeat(bounds[:, 0], bounds[:, 2] - bounds[:, 1]))
+                continue
+            for node_id, lo, hi in bounds:
+                times = data[lo:hi, 0]
+                a = lo + (np.searchsorted(times, start, 'left') if start is not None else 0)
+                b = lo + (np.searchsorted(times, end, 'right') if end is not None else hi - lo)
+                if b > a:
+                    values.append(data[a:b, picks])
+                    node_ids.append(np.full(b - a, node_id, dtype=np.int64))
+
+        if not values:
+            return pd.DataFrame({'time': pd.Series(dtype=float), 'node_id': pd.Series(dtype=np.int64),
+                                 **{c: pd.Series(dtype=float) for c in columns}})
+        values = np.concatenate(values)
+        node_ids = np.concatenate(node_ids)
+        # Mismo orden que el CSV: por tiempo y, dentro de cada instante, por nodo
+        order = np.lexsort((node_ids, values[:, 0]))
+        df = pd.DataFrame(values[order, 1:], columns=columns)
+        df.insert(0, 'node_id', node_ids[order])
+        df.insert(0, 'time', values[order, 0])
+        return df
+
+
+class TimeSeriesStore:
+    """Almacén de series por nodo de un barrido: un RunStore por corrida y flujo.
+
+    `ingest` convierte una vez los CSV de posiciones y energía; después los
+    analizadores leen ventanas de nodos y tiempo con `read_window` sin parsear
+    el CSV. Si el log cambió desde la ingesta (tamaño, mtime o compresión), el
+    almacén de esa corrida se considera vencido y se lee el CSV.
+    """
+
+    def __init__(self, simulation_dir: str):
+        self.simulation_dir = Path(simulation_dir)
+        self.root = self.simulation_dir / STORE_DIR
+        self.index = get_sweep_index(simulation_dir)
+
+    def stream_dir(self, config: str, protocol: str, run: str, stream: str) -> Path:
+        return self.root / config / protocol / run / stream
+
+    def _source(self, config: str, protocol: str, run: str, stream: str) -> Optional[Dict]:
+        return self.index.artefact(config, protocol, run, STORE_STREAMS[stream]['artefact'])
+
+    def is_current(self, config: str, protocol: str, run: str, stream: str) -> bool:
+        """El almacén existe y se generó desde la versión actual del log"""
+        meta_file = self.stream_dir(config, protocol, run, stream) / 'meta.json'
+        source = self._source(config, protocol, run, stream)
+        if source is None or not meta_file.is_file():
+            return False
+        try:
+            with open(meta_file) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return meta.get('version') == STORE_VERSION and meta.get('source') == source
+
+    def open(self, config: str, protocol: str, run: str, stream: str) -> Optional[RunStore]:
+        """RunStore vigente de una corrida, o None si no se ingirió o está vencido"""
+        if not self.is_current(config, protocol, run, stream):
+            return None
+        return RunStore(self.stream_dir(config, protocol, run, stream))
+
+    def read_window(self, config: str, protocol: str, run: str, stream: str, nodes: Iterable[int] = None,
+                    start: float = None, end: float = None) -> Optional[pd.DataFrame]:
+        """Ventana de nodos y tiempo de una corrida; recorre el CSV por bloques si no hay almacén vigente"""
+        store = self.open(config, protocol, run, stream)
+        if store is not None:
+            return store.read(nodes, start, end)
+
+        path = self.index.artefact_path(config, protocol, run, STORE_STREAMS[stream]['artefact'])
+        if path is None:
+            return None
+        logging.debug(f"Sin almacén vigente para {config}/{protocol}/{run}/{stream}: se lee {path}")
+        columns = ['time', 'node_id'] + STORE_STREAMS[stream]['columns']
+        wanted = None if nodes is None else set(int(n) for n in nodes)
+        frames = []
+        try:
+            for chunk in iter_csv_chunks(path, usecols=columns):
+                mask = np.ones(len(chunk), dtype=bool)
+                if wanted is not None:
+                    mask &= chunk['node_id'].isin(wanted).to_numpy()
+                if start is not None:
+                    mask &= (chunk['time'] >= start).to_numpy()
+                if end is not None:
+                    mask &= (chunk['time'] <= end).to_numpy()
+                frames.append(chunk[mask])
+        except pd.errors.EmptyDataError:
+            pass
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        df = pd.concat(frames, ignore_index=True)
+        df['node_id'] = df['node_id'].astype(np.int64)
+        df['time'] = df['time'].astype(float)
+        return df
+
+    def ingest(self, streams: List[str] = None, workers: int = 4, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+               refresh: bool = False) -> Dict:
+        """Ingiere en paralelo los logs de todas las corridas; omite los almacenes vigentes"""
+        streams = streams or list(STORE_STREAMS)
+        jobs = []
+        skipped = 0
+        for config, protocol, run in self.index.iter_runs():
+            for stream in streams:
+                source = self._source(config, protocol, run, stream)
+                if source is None:
+                    continue
+                if not refresh and self.is_current(config, protocol, run, stream):
+                    skipped += 1
+                    continue
+                jobs.append((str(self.index.run_dir(config, protocol, run) / source['path']),
+                             str(self.stream_dir(config, protocol, run, stream)), stream, source, chunk_rows))
+
+        summary = {'stores': 0, 'rows': 0, 'skipped': skipped, 'errors': 0}
+        if not jobs:
+            logging.info(f"Almacén de series al día ({skipped} vigentes)")
+            return summary
+
+        logging.info(f"Ingiriendo {len(jobs)} logs por nodo ({workers} procesos, {skipped} vigentes)...")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_ingest_worker, job): job[0] for job in jobs}
+            for future in as_completed(futures):
+                try:
+                    _, rows = future.result()
+                except Exception as e:
+                    summary['errors'] += 1
+                    logging.error(f"Error al ingerir {futures[future]}: {str(e)}")
+                    continue
+                summary['stores'] += 1
+                summary['rows'] += rows
+
+        size = sum(f.stat().st_size for f in self.root.rglob('*.npy'))
+        logging.info(f"Ingeridos {summary['stores']} logs ({summary['rows']} filas); "
+                     f"almacén en {self.root} ({size / 1e6:.1f} MB)")
+        return summary
+
+
+def plot_trajectory(df: pd.DataFrame, output_file: Path, title: str):
+    """Trayectoria x-y de cada nodo de una ventana de posiciones"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(8, 8))
+    for node_id, node in df.groupby('node_id'):
+        ax.plot(node['x'], node['y'], marker='.', markersize=3, linewidth=1, label=f'Nodo {node_id}')
+        ax.annotate(f"{node['time'].iloc[0]:g} s", (node['x'].iloc[0], node['y'].iloc[0]), fontsize=8)
+    ax.set_xlabel('x (m)')
+    ax.set_ylabel('y (m)')
+    ax.set_title(title)
+    ax.set_aspect('equal', adjustable='datalim')
+    if df['node_id'].nunique() <= 10:
+        ax.legend()
+    plt.tight_layout()
+    plt.savefig(output_file)
+    plt.close(fig)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Almacén memmap de posiciones y energía por nodo')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ingest = subparsers.add_parser('ingest', help='Convierte los CSV por nodo del barrido al almacén')
+    ingest.add_argument('simulation_dir')
+    ingest.add_argument('--streams', nargs='+', choices=list(STORE_STREAMS), default=list(STORE_STREAMS))
+    ingest.add_argument('--workers', type=int, default=4)
+    ingest.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help='Filas por bloque')
+    ingest.add_argument('--refresh', action='store_true', help='Reingiere aunque el almacén esté vigente')
+
+    window = subparsers.add_parser('window', help='Extrae una ventana de nodos y tiempo de una corrida')
+    window.add_argument('simulation_dir')
+    window.add_argument('run', help="'<config>/<protocolo>/<corrida>', p. ej. mal_int/AODV/run3")
+    window.add_argument('--stream', choices=list(STORE_STREAMS), default='positions')
+    window.add_argument('--nodes', type=int, nargs='+', default=None)
+    window.add_argument('--start', type=float, default=None, help='Inicio de la ventana (s)')
+    window.add_argument('--end', type=float, default=None, help='Fin de la ventana (s)')
+    window.add_argument('--output', default=None, help='CSV de salida (por defecto se imprime)')
+    window.add_argument('--plot', default=None, help='PNG con la trayectoria (solo posiciones)')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    try:
+        store = TimeSeriesStore(args.simulation_dir)
+        if args.command == 'ingest':
+            summary = store.ingest(args.streams, args.workers, args.chunk_rows, args.refresh)
+            sys.exit(1 if summary['errors'] else 0)
+
+        config, protocol, run = args.run.strip('/').split('/')
+        df = store.read_window(config, protocol, run, args.stream, args.nodes, args.start, args.end)
+        if df is None:
+            raise FileNotFoundError(f"La corrida {args.run} no tiene log de {args.stream}")
+        if args.output:
+            df.to_csv(args.output, index=False)
+            logging.info(f"{len(df)} filas escritas en {args.output}")
+        elif not args.plot:
+            print(df.to_string(index=False))
+        if args.plot:
+            if args.stream != 'positions':
+                raise ValueError("La trayectoria solo se grafica con --stream positions")
+            plot_trajectory(df, Path(args.plot), f'Trayectoria {args.run}')
+            logging.info(f"Trayectoria guardada en {args.plot}")
+    except Exception as e:
+        logging.error(f"Error fatal: {str(e)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@
 # Configuración inicial
 N_FIXED_NODES=20
 N_MOBILE_NODES=10
+DEFAULT_FIXED_NODES=$N_FIXED_NODES
+DEFAULT_MOBILE_NODES=$N_MOBILE_NODES
 SIM_TIME=60
 NUM_RUNS=10
 
@@ -17,6 +19,36 @@ CONFIGS=(
 # Protocolos de enrutamiento
 PROTOCOLS=("AODV" "OLSR" "DSDV" "DSR")
 
+# Modo de escalabilidad: en lugar de las configuraciones de ataque se barre la cantidad de nodos.
+# Cada punto de la grilla es "fijos:móviles:maliciosos:interferentes"; el análisis agrupa las corridas
+# por la cantidad de nodos registrada en metrics.csv (scalability_analysis.py)
+SCALABILITY="${SCALABILITY:-0}"
+NODE_GRID="${NODE_GRID:-20:10:0:0 40:20:0:0 80:40:0:0 160:80:0:0 20:10:2:3 80:40:2:3}"
+if [ "$SCALABILITY" = "1" ]; then
+    # Configuraciones "nombre:maliciosos:interferentes:fijos:móviles", una por punto de la grilla
+    CONFIGS=()
+    for point in $NODE_GRID; do
+        IFS=':' read -r fixed mobile malicious interfering <<< "$point"
+        CONFIGS+=("scale_${fixed}f_${mobile}m_${malicious}mal_${interfering}int:$malicious:$interfering:$fixed:$mobile")
+    done
+fi
+
+# Caché de resultados: reutiliza corridas con el mismo escenario, parámetros, semilla y build de ns-3
+USE_RUN_CACHE="${USE_RUN_CACHE:-1}"
+RUN_CACHE_DIR="${RUN_CACHE_DIR:-$HOME/.cache/simulacioniot/runs}"
+SCENARIO_SOURCE="scratch/simulacioniot.cc"
+
+# Asignación adaptativa de semillas: tras el lote inicial (NUM_RUNS) se agregan corridas
+# solo en las celdas cuyo IC no alcanza la precisión objetivo, hasta MAX_RUNS por celda
+ADAPTIVE_SEEDS="${ADAPTIVE_SEEDS:-0}"
+CI_TARGET="${CI_TARGET:-0.05}"
+MAX_RUNS="${MAX_RUNS:-30}"
+SEED_BATCH="${SEED_BATCH:-5}"
+# Compresión de logs al terminar el barrido (zstd si está instalado el paquete zstandard, si no gzip);
+# el post-procesamiento los lee comprimidos sin descomprimirlos a disco
+COMPRESS_LOGS="${COMPRESS_LOGS:-0}"
+POST_PROCESSING_SCRIPTS="${POST_PROCESSING_SCRIPTS:-$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)/../post_processing/scripts}"
+
 # Función para verificar dependencias
 check_dependencies() {
     echo "Verificando dependencias..."
@@ -43,19 +75,72 @@ check_disk_space() {
     echo "Espacio en disco suficiente."
 }
 
-# Función para monitorear recursos
-monitor_resources() {
-    while true; do
-        echo "$(date) - CPU: $(top -bn1 | grep "Cpu(s)" | awk '{print $2}')% - Mem: $(free -m | awk 'NR==2{printf "%.2f%%", $3*100/$2 }')"
-        sleep 60
-    done
-}
-
 # Función para respaldo de resultados
 backup_results() {
     echo "Creando respaldo de resultados..."
-    tar -czf "${SIMULATION_DIR}_backup_$(date +%Y%m%d_%H%M).tar.gz" "$SIMULATION_DIR"
-    echo "Respaldo creado: ${SIMULATION_DIR}_backup_$(date +%Y%m%d_%H%M).tar.gz"
+    if [ "$COMPRESS_LOGS" = "1" ]; then
+        # Los logs ya están comprimidos: volver a comprimir el tar solo gasta CPU
+        BACKUP_FILE="${SIMULATION_DIR}_backup_$(date +%Y%m%d_%H%M).tar"
+        tar -cf "$BACKUP_FILE" "$SIMULATION_DIR"
+    else
+        BACKUP_FILE="${SIMULATION_DIR}_backup_$(date +%Y%m%d_%H%M).tar.gz"
+        tar -czf "$BACKUP_FILE" "$SIMULATION_DIR"
+    fi
+    echo "Respaldo creado: $BACKUP_FILE"
+}
+
+# Función para identificar el build de ns-3 (commit y cambios locales, o NS3_BUILD_ID si está definido)
+ns3_build_id() {
+    if [ -n "$NS3_BUILD_ID" ]; then
+        echo "$NS3_BUILD_ID"
+    elif git rev-parse HEAD >/dev/null 2>&1; then
+        echo "$(git rev-parse HEAD)-$(git diff HEAD -- . ':(exclude)scratch' 2>/dev/null | sha256sum | cut -d' ' -f1)"
+    else
+        ./ns3 --version 2>/dev/null | sha256sum | cut -d' ' -f1
+    fi
+}
+
+# Función para calcular la clave de caché de una corrida a partir de sus entradas
+scenario_key() {
+    {
+        echo "source=$SOURCE_HASH"
+        echo "build=$BUILD_ID"
+        # Parámetros de línea de comandos, ordenados (sin outputDir, que no afecta al resultado)
+        printf '%s\n' "$@" | sort
+    } | sha256sum | cut -d' ' -f1
+}
+
+# Función para materializar una corrida cacheada como copia independiente
+cache_restore() {
+    local key=$1 dest=$2
+    local entry="$RUN_CACHE_DIR/$key"
+    [ "$USE_RUN_CACHE" = "1" ] && [ -f "$entry/.complete" ] || return 1
+    mkdir -p "$dest"
+    # Copia (reflink si el sistema de archivos lo soporta): modificar la corrida no altera el caché
+    cp -a --reflink=auto "$entry/." "$dest/" || return 1
+    rm -f "$dest/.complete" "$dest/cache_key.txt"
+    return 0
+}
+
+# Función para guardar una corrida completa en el caché
+cache_store() {
+    local key=$1 src=$2
+    shift 2
+    [ "$USE_RUN_CACHE" = "1" ] || return 0
+    [ -f "$src/metrics/metrics.csv" ] || return 0
+    local entry="$RUN_CACHE_DIR/$key"
+    local tmp="$entry.tmp.$$"
+    mkdir -p "$RUN_CACHE_DIR"
+    rm -rf "$tmp"
+    cp -a --reflink=auto "$src/." "$tmp/" || { rm -rf "$tmp"; return 1; }
+    {
+        echo "source=$SOURCE_HASH"
+        echo "build=$BUILD_ID"
+        printf '%s\n' "$@" | sort
+    } > "$tmp/cache_key.txt"
+    touch "$tmp/.complete"
+    # Publicación atómica: otra corrida concurrente con la misma clave no ve entradas a medias
+    mv -T "$tmp" "$entry" 2>/dev/null || rm -rf "$tmp"
 }
 
 # Función para limpiar archivos temporales
@@ -90,74 +175,147 @@ cp run_simulations.sh "$SIMULATION_DIR/scripts/"
 cp scratch/simulacioniot.cc "$SIMULATION_DIR/scripts/"
 cp manual_metrics_dsr.py "$SIMULATION_DIR/scripts/"
 
-# Iniciar monitoreo de recursos en segundo plano
-monitor_resources &
+# Iniciar monitoreo de recursos en segundo plano: CPU, RSS y velocidad de cada corrida en
+# logs/telemetry.csv (consultar con "sweep_monitor.py summarize"), estado y ETA cada 60 s
+MONITOR_ARGS=(--parent-pid $$)
+# Con semillas adaptativas el total de corridas no se conoce de antemano: sin total no hay ETA
+if [ "$ADAPTIVE_SEEDS" != "1" ]; then
+    MONITOR_ARGS+=(--total $((${#CONFIGS[@]} * ${#PROTOCOLS[@]} * NUM_RUNS)))
+fi
+python3 "$POST_PROCESSING_SCRIPTS/sweep_monitor.py" watch "$SIMULATION_DIR" "${MONITOR_ARGS[@]}" \
+    2>> "$SIMULATION_DIR/logs/sweep_monitor.log" &
 MONITOR_PID=$!
 
+# Función para ejecutar (o recuperar del caché) una corrida
+run_single_simulation() {
+    local CONFIG_NAME=$1 N_MALICIOUS_NODES=$2 N_INTERFERING_NODES=$3 protocol=$4 run=$5
+
+    # Definir semilla para la corrida
+    local SEED=$((1000 + run))
+
+    # Definir directorio de salida temporal
+    OUTPUT_DIR="$SIMULATION_DIR/raw_data_${CONFIG_NAME}_${protocol}_run${run}"
+    local NEW_DIR="$SIMULATION_DIR/$CONFIG_NAME/$protocol/run$run"
+
+    local PARAMS=(
+        "--nFixedNodes=$N_FIXED_NODES"
+        "--nMobileNodes=$N_MOBILE_NODES"
+        "--nMaliciousNodes=$N_MALICIOUS_NODES"
+        "--nInterferingNodes=$N_INTERFERING_NODES"
+        "--simTime=$SIM_TIME"
+        "--routingProtocol=$protocol"
+        "--configName=$CONFIG_NAME"
+        "--seed=$SEED"
+    )
+    local KEY=$(scenario_key "${PARAMS[@]}")
+
+    if cache_restore "$KEY" "$NEW_DIR"; then
+        echo "Corrida recuperada del caché: Config=$CONFIG_NAME, Protocol=$protocol, Run=$run, Seed=$SEED ($KEY)"
+        echo "$(date '+%Y-%m-%d %H:%M:%S') HIT $CONFIG_NAME/$protocol/run$run $KEY" >> "$SIMULATION_DIR/logs/run_cache.log"
+        return 0
+    fi
+
+    echo "Ejecutando simulación: Config=$CONFIG_NAME, Protocol=$protocol, Run=$run, Seed=$SEED"
+
+    # Ejecutar la simulación
+    ./ns3 run "scratch/simulacioniot ${PARAMS[*]} --outputDir=$OUTPUT_DIR"
+
+    # Crear directorios necesarios
+    mkdir -p "$NEW_DIR/pcap"
+    mkdir -p "$NEW_DIR/metrics"
+    mkdir -p "$NEW_DIR/node_metadata"
+    mkdir -p "$NEW_DIR/routing_logs"
+
+    # Mover archivos PCAP
+    mv iot_simulation_*.pcap "$NEW_DIR/pcap/" 2>/dev/null || true
+
+    # Verificar archivos generados
+    if [ ! -f "$OUTPUT_DIR/metrics/metrics.csv" ]; then
+        echo "Error: Falta metrics.csv en $OUTPUT_DIR" >> "$SIMULATION_DIR/logs/error_log.txt"
+    fi
+    if [ ! -f "$OUTPUT_DIR/node_metadata/nodes.csv" ]; then
+        echo "Error: Falta nodes.csv en $OUTPUT_DIR" >> "$SIMULATION_DIR/logs/error_log.txt"
+    fi
+    if [ -z "$(ls -A "$OUTPUT_DIR/pcap")" ]; then
+        echo "Error: Directorio pcap vacío en $OUTPUT_DIR" >> "$SIMULATION_DIR/logs/error_log.txt"
+    fi
+    if [ ! -f "$OUTPUT_DIR/routing_logs/routing_table_changes.csv" ]; then
+        echo "Error: Falta routing_table_changes.csv en $OUTPUT_DIR/routing_logs" >> "$SIMULATION_DIR/logs/error_log.txt"
+    fi
+
+    # Mover archivos a la estructura final
+    mv "$OUTPUT_DIR"/* "$NEW_DIR/" 2>/dev/null || true
+    rm -rf "$OUTPUT_DIR"
+
+    # Guardar la corrida en el caché para futuros barridos
+    cache_store "$KEY" "$NEW_DIR" "${PARAMS[@]}"
+    echo "$(date '+%Y-%m-%d %H:%M:%S') MISS $CONFIG_NAME/$protocol/run$run $KEY" >> "$SIMULATION_DIR/logs/run_cache.log"
+
+    echo "Archivos procesados y movidos a: $NEW_DIR"
+}
+
+# Identificar el escenario y el build de ns-3 una sola vez por barrido
+SOURCE_HASH=$(sha256sum "$SCENARIO_SOURCE" | cut -d' ' -f1)
+BUILD_ID=$(ns3_build_id)
+echo "Escenario: $SOURCE_HASH - Build ns-3: $BUILD_ID - Caché: $([ "$USE_RUN_CACHE" = "1" ] && echo "$RUN_CACHE_DIR" || echo desactivado)"
+
 # Iterar sobre cada configuración
 for config in "${CONFIGS[@]}"; do
     # Extraer nombre de configuración, nodos maliciosos e interferentes
     CONFIG_NAME=$(echo "$config" | cut -d':' -f1)
     N_MALICIOUS_NODES=$(echo "$config" | cut -d':' -f2)
     N_INTERFERING_NODES=$(echo "$config" | cut -d':' -f3)
+    # Tamaño de la red: propio de la configuración en el modo de escalabilidad
+    N_FIXED_NODES=$(echo "$config:" | cut -d':' -f4); N_FIXED_NODES=${N_FIXED_NODES:-$DEFAULT_FIXED_NODES}
+    N_MOBILE_NODES=$(echo "$config:" | cut -d':' -f5); N_MOBILE_NODES=${N_MOBILE_NODES:-$DEFAULT_MOBILE_NODES}
 
     # Iterar sobre cada protocolo
     for protocol in "${PROTOCOLS[@]}"; do
         # Iterar sobre cada corrida
         for run in $(seq 1 $NUM_RUNS); do
-            # Definir semilla para la corrida
-            SEED=$((1000 + run))
-
-            # Definir directorio de salida temporal
-            OUTPUT_DIR="$SIMULATION_DIR/raw_data_${CONFIG_NAME}_${protocol}_run${run}"
-            NEW_DIR="$SIMULATION_DIR/$CONFIG_NAME/$protocol/run$run"
-            
-            echo "Ejecutando simulación: Config=$CONFIG_NAME, Protocol=$protocol, Run=$run, Seed=$SEED"
-            
-            # Ejecutar la simulación
-            ./ns3 run "scratch/simulacioniot \
-                --nFixedNodes=$N_FIXED_NODES \
-                --nMobileNodes=$N_MOBILE_NODES \
-                --nMaliciousNodes=$N_MALICIOUS_NODES \
-                --nInterferingNodes=$N_INTERFERING_NODES \
-                --simTime=$SIM_TIME \
-                --routingProtocol=$protocol \
-                --configName=$CONFIG_NAME \
-                --outputDir=$OUTPUT_DIR \
-                --seed=$SEED"
-            
-            # Crear directorios necesarios
-            mkdir -p "$NEW_DIR/pcap"
-            mkdir -p "$NEW_DIR/metrics"
-            mkdir -p "$NEW_DIR/node_metadata"
-            mkdir -p "$NEW_DIR/routing_logs"
-            
-            # Mover archivos PCAP
-            mv iot_simulation_*.pcap "$NEW_DIR/pcap/" 2>/dev/null || true
-            
-            # Verificar archivos generados
-            if [ ! -f "$OUTPUT_DIR/metrics/metrics.csv" ]; then
-                echo "Error: Falta metrics.csv en $OUTPUT_DIR" >> "$SIMULATION_DIR/logs/error_log.txt"
-            fi
-            if [ ! -f "$OUTPUT_DIR/node_metadata/nodes.csv" ]; then
-                echo "Error: Falta nodes.csv en $OUTPUT_DIR" >> "$SIMULATION_DIR/logs/error_log.txt"
-            fi
-            if [ -z "$(ls -A "$OUTPUT_DIR/pcap")" ]; then
-                echo "Error: Directorio pcap vacío en $OUTPUT_DIR" >> "$SIMULATION_DIR/logs/error_log.txt"
-            fi
-            if [ ! -f "$OUTPUT_DIR/routing_logs/routing_table_changes.csv" ]; then
-                echo "Error: Falta routing_table_changes.csv en $OUTPUT_DIR/routing_logs" >> "$SIMULATION_DIR/logs/error_log.txt"
-            fi
-            
-            # Mover archivos a la estructura final
-            mv "$OUTPUT_DIR"/* "$NEW_DIR/" 2>/dev/null || true
-            rm -rf "$OUTPUT_DIR"
-            
-            echo "Archivos procesados y movidos a: $NEW_DIR"
+            run_single_simulation "$CONFIG_NAME" "$N_MALICIOUS_NODES" "$N_INTERFERING_NODES" "$protocol" "$run"
         done
     done
 done
 
+# Función para obtener los parámetros de una configuración: maliciosos, interferentes, fijos y móviles
+config_params() {
+    local name=$1 config fixed mobile
+    for config in "${CONFIGS[@]}"; do
+        if [ "$(echo "$config" | cut -d':' -f1)" = "$name" ]; then
+            fixed=$(echo "$config:" | cut -d':' -f4)
+            mobile=$(echo "$config:" | cut -d':' -f5)
+            echo "$(echo "$config" | cut -d':' -f2,3 | tr ':' ' ') ${fixed:-$DEFAULT_FIXED_NODES} ${mobile:-$DEFAULT_MOBILE_NODES}"
+            return 0
+        fi
+    done
+    return 1
+}
+
+# Lotes adicionales guiados por la convergencia de los intervalos de confianza
+if [ "$ADAPTIVE_SEEDS" = "1" ]; then
+    BATCH_NUMBER=1
+    while true; do
+        PLAN=$(python3 "$POST_PROCESSING_SCRIPTS/adaptive_seeds.py" "$SIMULATION_DIR" \
+            --target "$CI_TARGET" --max-runs "$MAX_RUNS" --batch "$SEED_BATCH" \
+            --report "$SIMULATION_DIR/logs/ci_precision_batch${BATCH_NUMBER}.csv" \
+            2>> "$SIMULATION_DIR/logs/adaptive_seeds.log") || {
+            echo "Error: falló el controlador de semillas adaptativas" >> "$SIMULATION_DIR/logs/error_log.txt"
+            break
+        }
+        if [ -z "$PLAN" ]; then
+            echo "Todas las celdas alcanzaron la precisión objetivo o quedaron agotadas ($MAX_RUNS corridas intentadas)"
+            break
+        fi
+        echo "Lote adaptativo $BATCH_NUMBER: $(echo "$PLAN" | wc -l) corridas adicionales"
+        while read -r CONFIG_NAME protocol run; do
+            read -r N_MALICIOUS_NODES N_INTERFERING_NODES N_FIXED_NODES N_MOBILE_NODES <<< "$(config_params "$CONFIG_NAME")"
+            run_single_simulation "$CONFIG_NAME" "$N_MALICIOUS_NODES" "$N_INTERFERING_NODES" "$protocol" "$run" < /dev/null
+        done <<< "$PLAN"
+        BATCH_NUMBER=$((BATCH_NUMBER + 1))
+    done
+fi
+
 # Detener monitoreo de recursos
 kill $MONITOR_PID
 
@@ -167,6 +325,14 @@ if [ -f "$SIMULATION_DIR/scripts/manual_metrics_dsr.py" ]; then
     python3 "$SIMULATION_DIR/scripts/manual_metrics_dsr.py"
 fi
 
+# Comprimir los logs voluminosos (paquetes, posiciones, energía, enrutamiento)
+if [ "$COMPRESS_LOGS" = "1" ]; then
+    echo "Comprimiendo logs del barrido..."
+    python3 "$POST_PROCESSING_SCRIPTS/log_io.py" "$SIMULATION_DIR" --workers "$(nproc)" \
+        2>> "$SIMULATION_DIR/logs/compact.log" || \
+        echo "Error: falló la compresión de logs" >> "$SIMULATION_DIR/logs/error_log.txt"
+fi
+
 # Crear respaldo de resultados
 backup_results
 
@@ -11,10 +11,14 @@
 #include "ns3/flow-monitor-module.h"
 #include "ns3/energy-module.h"
 #include <fstream>
+#include <sstream>
 #include <iomanip>
 #include <ctime>
 #include <sys/stat.h>
 #include <map>
+#include <set>
+#include <cctype>
+#include <cstdlib>
 #include <vector>
 
 using namespace ns3;
@@ -56,6 +60,33 @@ private:
     uint8_t trafficType; // 0: Normal, 1: Malicioso, 2: Interferente
 };
 
+// Clase TxTimeTag: marca cada paquete con su instante de envío para medir el delay por paquete
+class TxTimeTag : public Tag {
+public:
+    static TypeId GetTypeId(void) {
+        static TypeId tid = TypeId("ns3::TxTimeTag")
+            .SetParent<Tag>()
+            .AddConstructor<TxTimeTag>();
+        return tid;
+    }
+    TypeId GetInstanceTypeId(void) const override { return GetTypeId(); }
+    uint32_t GetSerializedSize(void) const override { return sizeof(int64_t); }
+    void Serialize(TagBuffer i) const override { i.WriteU64(txTime.GetTimeStep()); }
+    void Deserialize(TagBuffer i) override { txTime = TimeStep(i.ReadU64()); }
+    void Print(std::ostream &os) const override { os << "TxTime=" << txTime; }
+    void SetTxTime(Time time) { txTime = time; }
+    Time GetTxTime(void) const { return txTime; }
+private:
+    Time txTime;
+};
+
+// Marca el instante de envío en los paquetes generados por las aplicaciones OnOff
+static void TagTxTime(Ptr<const Packet> packet) {
+    TxTimeTag tag;
+    tag.SetTxTime(Simulator::Now());
+    packet->AddPacketTag(tag);
+}
+
 // Clase PacketLogger
 class PacketLogger
 {
@@ -82,7 +113,7 @@ private:
         std::ofstream packetLog(packetLogFile, std::ios::app);
         if (!packetLog.is_open()) { NS_LOG_ERROR("No se pudo abrir " << packetLogFile); return; }
         if (!headerWritten[packetLogFile]) { 
-            packetLog << "timestamp,source_ip,port,traffic_type,packet_size,sim_time\n"; 
+            packetLog << "timestamp,source_ip,port,traffic_type,packet_size,sim_time,delay_ms\n"; 
             headerWritten[packetLogFile] = true; 
         }
         std::time_t now = std::time(nullptr);
@@ -90,69 +121,228 @@ private:
         std::strftime(timestamp, sizeof(timestamp), "%Y-%m-%d %H:%M:%S", std::localtime(&now));
         InetSocketAddress inetAddr = InetSocketAddress::ConvertFrom(from);
         Ipv4Address srcAddr = inetAddr.GetIpv4();
+        TxTimeTag txTag;
         packetLog << timestamp << "," << srcAddr << "," << port << "," << trafficLabel << "," 
-                  << packet->GetSize() << "," << Simulator::Now().GetSeconds() << "\n";
+                  << packet->GetSize() << "," << Simulator::Now().GetSeconds() << ",";
+        if (packet->PeekPacketTag(txTag)) packetLog << (Simulator::Now() - txTag.GetTxTime()).GetSeconds() * 1000.0;
+        packetLog << "\n";
         packetLog.close();
     }
 };
 
 // Clase RoutingLogger
+// Registra los mensajes de control de enrutamiento transmitidos por cada nodo (uno por salto).
+// El archivo queda abierto durante toda la simulación: se escribe una fila por transmisión.
 class RoutingLogger {
 public:
     static void LogControlMessage(std::string protocol, uint32_t nodeId, 
                                  std::string msgType, uint32_t size) {
-        std::string logDir = g_outputDir + "/routing_logs";
-        mkdir(g_outputDir.c_str(), 0777);
-        mkdir(logDir.c_str(), 0777);
-        std::string logFile = logDir + "/control_messages.csv";
-        static bool headerWritten = false;
-        std::ofstream log(logFile, std::ios::app);
-        if (!log.is_open()) { NS_LOG_ERROR("No se pudo abrir " << logFile); return; }
-        if (!headerWritten) {
-            log << "timestamp,protocolo,nodo_id,tipo_mensaje,tamaño\n";
-            headerWritten = true;
-        }
-        std::time_t now = std::time(nullptr);
-        char timestamp[100];
-        std::strftime(timestamp, sizeof(timestamp), "%Y-%m-%d %H:%M:%S", 
-                      std::localtime(&now));
-        log << timestamp << "," << protocol << "," << nodeId << "," 
+        std::ofstream &log = Stream();
+        if (!log.is_open()) return;
+        log << Simulator::Now().GetSeconds() << "," << nodeId << "," << protocol << ","
             << msgType << "," << size << "\n";
-        log.close();
+    }
+
+    // Traza Ipv4L3Protocol/Tx: clasifica cada paquete IP saliente y registra los de control
+    static void ControlTx(Ptr<const Packet> packet, Ptr<Ipv4> ipv4, uint32_t interface) {
+        Ptr<Packet> copy = packet->Copy();
+        Ipv4Header ipHeader;
+        if (copy->RemoveHeader(ipHeader) == 0) return;
+        uint32_t nodeId = ipv4->GetObject<Node>()->GetId();
+
+        if (ipHeader.GetProtocol() == dsr::DsrRouting::PROT_NUMBER) {
+            // DSR encapsula también los datos; solo cuentan como control los paquetes sin carga UDP
+            dsr::DsrFixedSizeHeader fixedHeader;
+            copy->PeekHeader(fixedHeader);
+            if (fixedHeader.GetNextHeader() != UdpL4Protocol::PROT_NUMBER) {
+                LogControlMessage("DSR", nodeId, "control", packet->GetSize());
+            }
+            return;
+        }
+        if (ipHeader.GetProtocol() != UdpL4Protocol::PROT_NUMBER) return;
+
+        UdpHeader udpHeader;
+        copy->RemoveHeader(udpHeader);
+        uint16_t port = udpHeader.GetDestinationPort();
+        if (port == AODV_PORT) {
+            aodv::TypeHeader typeHeader;
+            copy->PeekHeader(typeHeader);
+            std::string msgType = "control";
+            switch (typeHeader.Get()) {
+                case aodv::AODVTYPE_RREQ: msgType = "RREQ"; break;
+                case aodv::AODVTYPE_RREP: msgType = "RREP"; break;
+                case aodv::AODVTYPE_RERR: msgType = "RERR"; break;
+                case aodv::AODVTYPE_RREP_ACK: msgType = "RREP_ACK"; break;
+            }
+            LogControlMessage("AODV", nodeId, msgType, packet->GetSize());
+        } else if (port == OLSR_PORT) {
+            LogControlMessage("OLSR", nodeId, "control", packet->GetSize());
+        } else if (port == DSDV_PORT) {
+            LogControlMessage("DSDV", nodeId, "update", packet->GetSize());
+        }
+    }
+
+    static void Close() {
+        if (Stream().is_open()) Stream().close();
+    }
+
+private:
+    // Puertos UDP de control de cada protocolo (en ns-3 no todos son constantes públicas)
+    static const uint16_t AODV_PORT = 654;
+    static const uint16_t OLSR_PORT = 698;
+    static const uint16_t DSDV_PORT = 269;
+
+    static std::ofstream &Stream() {
+        static std::ofstream log;
+        static bool opened = false;
+        if (!opened) {
+            opened = true;
+            std::string logDir = g_outputDir + "/routing_logs";
+            mkdir(g_outputDir.c_str(), 0777);
+            mkdir(logDir.c_str(), 0777);
+            std::string logFile = logDir + "/control_messages.csv";
+            log.open(logFile, std::ios::trunc);
+            if (!log.is_open()) { NS_LOG_ERROR("No se pudo abrir " << logFile); }
+            else log << "timestamp,node_id,protocol,msg_type,size\n";
+        }
+        return log;
     }
 };
 
-// Función para registrar métricas temporales
-void RecordTemporalMetrics(NodeContainer &allNodes, Ptr<FlowMonitor> monitor, double interval) {
-    NS_LOG_DEBUG("Registrando métricas temporales en tiempo " << Simulator::Now().GetSeconds());
-    if (!monitor) { NS_LOG_ERROR("FlowMonitor nulo en RecordTemporalMetrics"); return; }
-    monitor->CheckForLostPackets();
-    FlowMonitor::FlowStatsContainer stats = monitor->GetFlowStats();
-    
-    for (uint32_t i = 0; i < allNodes.GetN(); i++) {
-        Ptr<Node> node = allNodes.Get(i);
-        if (!node) { NS_LOG_ERROR("Nodo " << i << " nulo en RecordTemporalMetrics"); continue; }
-        uint32_t nodeId = node->GetId();
-        double throughput = 0.0, delay = 0.0, jitter = 0.0;
-        uint32_t flowCount = 0;
-        
+// Clase NodeSampler
+// Serie temporal por nodo a partir del FlowMonitor. Cada flujo se atribuye una sola vez a su
+// nodo origen (tx, pérdidas) y a su nodo destino (rx, delay, jitter) con el clasificador IPv4,
+// y se registran diferencias entre muestreos: el costo por muestreo es lineal en flujos.
+// Solo se escriben los nodos con actividad en el intervalo.
+class NodeSampler {
+public:
+    static void Sample(NodeContainer &allNodes, Ptr<FlowMonitor> monitor,
+                       Ptr<Ipv4FlowClassifier> classifier, double interval) {
+        NS_LOG_DEBUG("Registrando métricas temporales en tiempo " << Simulator::Now().GetSeconds());
+        if (!monitor || !classifier) { NS_LOG_ERROR("FlowMonitor o clasificador nulo en NodeSampler"); return; }
+        if (AddressToNode().empty()) IndexAddresses(allNodes);
+        monitor->CheckForLostPackets();
+        FlowMonitor::FlowStatsContainer stats = monitor->GetFlowStats();
+
+        std::map<uint32_t, NodeCounters> tick;
         for (auto const& stat : stats) {
-            throughput += stat.second.rxBytes * 8.0 / interval / 1000;
-            delay += stat.second.delaySum.GetSeconds();
-            jitter += stat.second.jitterSum.GetSeconds();
-            flowCount++;
+            Ipv4FlowClassifier::FiveTuple tuple = classifier->FindFlow(stat.first);
+            FlowMonitor::FlowStats &last = LastStats()[stat.first];
+            const FlowMonitor::FlowStats &cur = stat.second;
+
+            auto src = AddressToNode().find(tuple.sourceAddress);
+            if (src != AddressToNode().end()) {
+                NodeCounters &c = tick[src->second];
+                c.txPackets += cur.txPackets - last.txPackets;
+                c.txBytes += cur.txBytes - last.txBytes;
+                c.lostPackets += cur.lostPackets - last.lostPackets;
+            }
+            auto dst = AddressToNode().find(tuple.destinationAddress);
+            if (dst != AddressToNode().end()) {
+                NodeCounters &c = tick[dst->second];
+                c.rxPackets += cur.rxPackets - last.rxPackets;
+                c.rxBytes += cur.rxBytes - last.rxBytes;
+                c.delaySum += (cur.delaySum - last.delaySum).GetSeconds();
+                c.jitterSum += (cur.jitterSum - last.jitterSum).GetSeconds();
+            }
+            last = cur;
         }
-        
-        // Inicializar vector de métricas si está vacío
-        if (g_nodeMetrics[nodeId].empty()) {
-            g_nodeMetrics[nodeId].resize(3, 0.0); // throughput, delay, jitter
+
+        std::ofstream &log = Stream();
+        double now = Simulator::Now().GetSeconds();
+        for (auto const& entry : tick) {
+            const NodeCounters &c = entry.second;
+            if (c.txPackets == 0 && c.rxPackets == 0 && c.lostPackets == 0) continue;
+            if (log.is_open()) {
+                log << now << "," << entry.first << "," << c.txPackets << "," << c.txBytes << ","
+                    << c.rxPackets << "," << c.rxBytes << "," << c.lostPackets << ","
+                    << c.rxBytes * 8.0 / interval / 1000 << ",";
+                // Sin paquetes recibidos en el intervalo el delay y el jitter quedan vacíos
+                if (c.rxPackets > 0) log << c.delaySum / c.rxPackets * 1000.0 << "," << c.jitterSum / c.rxPackets * 1000.0;
+                else log << ",";
+                log << "\n";
+            }
+            NodeCounters &total = Totals()[entry.first];
+            total.rxBytes += c.rxBytes;
+            total.rxPackets += c.rxPackets;
+            total.delaySum += c.delaySum;
+            total.jitterSum += c.jitterSum;
         }
-        g_nodeMetrics[nodeId][0] = throughput / (flowCount > 0 ? flowCount : 1);
-        g_nodeMetrics[nodeId][1] = delay / (flowCount > 0 ? flowCount : 1);
-        g_nodeMetrics[nodeId][2] = jitter / (flowCount > 0 ? flowCount : 1);
+
+        // Promedios acumulados por nodo para node_metrics.csv: throughput (Kbps), delay y jitter (s) por paquete
+        double elapsed = now - FirstSample(now) + interval;
+        for (auto const& entry : Totals()) {
+            const NodeCounters &total = entry.second;
+            std::vector<double> &metrics = g_nodeMetrics[entry.first];
+            metrics.resize(3, 0.0);
+            metrics[0] = total.rxBytes * 8.0 / elapsed / 1000;
+            metrics[1] = total.rxPackets > 0 ? total.delaySum / total.rxPackets : 0.0;
+            metrics[2] = total.rxPackets > 0 ? total.jitterSum / total.rxPackets : 0.0;
+        }
+        Simulator::Schedule(Seconds(interval), &NodeSampler::Sample, allNodes, monitor, classifier, interval);
     }
-    Simulator::Schedule(Seconds(interval), &RecordTemporalMetrics, allNodes, monitor, interval);
-}
+
+    static void Close() {
+        if (Stream().is_open()) Stream().close();
+    }
+
+private:
+    struct NodeCounters {
+        uint64_t txPackets = 0, txBytes = 0, rxPackets = 0, rxBytes = 0, lostPackets = 0;
+        double delaySum = 0.0, jitterSum = 0.0;
+    };
+
+    // Direcciones IPv4 (sin loopback) de cada nodo
+    static void IndexAddresses(NodeContainer &allNodes) {
+        for (uint32_t i = 0; i < allNodes.GetN(); ++i) {
+            Ptr<Ipv4> ipv4 = allNodes.Get(i)->GetObject<Ipv4>();
+            if (!ipv4) continue;
+            for (uint32_t j = 0; j < ipv4->GetNInterfaces(); ++j) {
+                for (uint32_t k = 0; k < ipv4->GetNAddresses(j); ++k) {
+                    Ipv4Address address = ipv4->GetAddress(j, k).GetLocal();
+                    if (address != Ipv4Address::GetLoopback()) AddressToNode()[address] = allNodes.Get(i)->GetId();
+                }
+            }
+        }
+    }
+
+    static std::map<Ipv4Address, uint32_t> &AddressToNode() {
+        static std::map<Ipv4Address, uint32_t> addresses;
+        return addresses;
+    }
+
+    static std::map<FlowId, FlowMonitor::FlowStats> &LastStats() {
+        static std::map<FlowId, FlowMonitor::FlowStats> last;
+        return last;
+    }
+
+    static std::map<uint32_t, NodeCounters> &Totals() {
+        static std::map<uint32_t, NodeCounters> totals;
+        return totals;
+    }
+
+    static double FirstSample(double now) {
+        static double first = now;
+        return first;
+    }
+
+    static std::ofstream &Stream() {
+        static std::ofstream log;
+        static bool opened = false;
+        if (!opened) {
+            opened = true;
+            std::string metricsDir = g_outputDir + "/metrics";
+            mkdir(g_outputDir.c_str(), 0777);
+            mkdir(metricsDir.c_str(), 0777);
+            std::string logFile = metricsDir + "/node_timeseries.csv";
+            log.open(logFile, std::ios::trunc);
+            if (!log.is_open()) { NS_LOG_ERROR("No se pudo abrir " << logFile); }
+            else log << "time,node_id,tx_packets,tx_bytes,rx_packets,rx_bytes,lost_packets,"
+                     << "throughput_kbps,delay_ms,jitter_ms\n";
+        }
+        return log;
+    }
+};
 
 // Función para registrar consumo de energía
 void RecordEnergy(NodeContainer &allNodes) {
@@ -271,7 +461,72 @@ static void LogSimulationMetadata() {
     NS_LOG_INFO("Metadatos de simulación guardados en: " << metadataFile);
 }
 
-// Función para registrar cambios en la tabla de enrutamiento
+// Rutas vigentes de cada nodo en el último muestreo: nodo -> destino -> (siguiente salto, métrica)
+struct RouteEntry {
+    std::string nextHop;
+    uint32_t metric;
+};
+static std::map<uint32_t, std::map<std::string, RouteEntry>> g_lastRoutes;
+
+static bool IsIpv4Address(const std::string &token) {
+    uint32_t dots = 0;
+    for (char c : token) {
+        if (c == '.') dots++;
+        else if (!std::isdigit(static_cast<unsigned char>(c))) return false;
+    }
+    return dots == 3;
+}
+
+// Lee la tabla de rutas de un nodo desde PrintRoutingTable (AODV, OLSR y DSDV).
+// Columnas: AODV "Destination Gateway Interface Flag Expire Hops", DSDV
+// "Destination Gateway Interface HopCount ...", OLSR "Destination NextHop Interface Distance".
+static std::map<std::string, RouteEntry> SnapshotRoutes(Ptr<Ipv4> ipv4, Ptr<Ipv4RoutingProtocol> routing) {
+    std::map<std::string, RouteEntry> routes;
+    std::ostringstream table;
+    routing->PrintRoutingTable(Create<OutputStreamWrapper>(&table), Time::S);
+
+    std::set<std::string> ownAddresses;
+    for (uint32_t i = 0; i < ipv4->GetNInterfaces(); ++i) {
+        for (uint32_t j = 0; j < ipv4->GetNAddresses(i); ++j) {
+            std::ostringstream address;
+            address << ipv4->GetAddress(i, j).GetLocal();
+            ownAddresses.insert(address.str());
+        }
+    }
+
+    std::istringstream lines(table.str());
+    std::string line;
+    while (std::getline(lines, line)) {
+        std::istringstream fields(line);
+        std::vector<std::string> tokens;
+        std::string token;
+        while (fields >> token) tokens.push_back(token);
+        if (tokens.size() < 4 || !IsIpv4Address(tokens[0]) || !IsIpv4Address(tokens[1])) continue;
+
+        const std::string &destination = tokens[0];
+        // Loopback, broadcast y las rutas hacia el propio nodo no son rutas aprendidas
+        if (destination.compare(0, 4, "127.") == 0 || ownAddresses.count(destination) ||
+            (destination.size() >= 4 && destination.compare(destination.size() - 4, 4, ".255") == 0)) continue;
+
+        std::string metricToken = tokens[3];
+        if (g_routingProtocol == "AODV") {
+            if (tokens[3] != "UP") continue; // Rutas inválidas o en reparación no se usan para reenviar
+            metricToken = tokens.back();
+        }
+        char *end = nullptr;
+        unsigned long metric = std::strtoul(metricToken.c_str(), &end, 10);
+        if (end == metricToken.c_str()) continue;
+        routes[destination] = RouteEntry{tokens[1], static_cast<uint32_t>(metric)};
+    }
+    return routes;
+}
+
+// Función para registrar cambios en la tabla de enrutamiento.
+// Cada segundo se toma la tabla de cada nodo y se escribe solo la diferencia con el
+// muestreo anterior: ADD (ruta nueva), DEL (ruta eliminada) o CHG (cambia el siguiente
+// salto o la métrica). DSR no tiene tabla: su caché de rutas no se puede recorrer sin
+// modificarla (LookupRoute purga y reordena), por lo que para DSR solo se registra el
+// overhead de control en control_messages.csv.
 static void LogRoutingTableChanges(NodeContainer &allNodes) {
     NS_LOG_INFO("Iniciando LogRoutingTableChanges en tiempo " << Simulator::Now().GetSeconds());
     
@@ -298,15 +553,16 @@ static void LogRoutingTableChanges(NodeContainer &allNodes) {
 
     static bool headerWritten = false;
     if (!headerWritten) {
-        routingLog << "timestamp,node_id,protocol,destination,next_hop,metric\n";
+        routingLog << "timestamp,node_id,protocol,destination,next_hop,metric,change\n";
         headerWritten = true;
         NS_LOG_INFO("Encabezado escrito en " << routingLogFile);
     }
 
     double now = Simulator::Now().GetSeconds();
     uint32_t nodesProcessed = 0;
+    uint32_t changesWritten = 0;
 
-    for (uint32_t i = 0; i < allNodes.GetN(); ++i) {
+    for (uint32_t i = 0; i < allNodes.GetN() && g_routingProtocol != "DSR"; ++i) {
         Ptr<Node> node = allNodes.Get(i);
         if (!node) {
             NS_LOG_ERROR("Nodo " << i << " es nulo");
@@ -325,40 +581,34 @@ static void LogRoutingTableChanges(NodeContainer &allNodes) {
             continue;
         }
 
-        bool entryWritten = false;
-        if (g_routingProtocol == "AODV") {
-            Ptr<aodv::RoutingProtocol> aodv = DynamicCast<aodv::RoutingProtocol>(routing);
-            if (aodv) {
-                routingLog << now << "," << node->GetId() << ",AODV,0.0.0.0,0.0.0.0,0\n";
-                entryWritten = true;
-            }
-        } else if (g_routingProtocol == "OLSR") {
-            Ptr<olsr::RoutingProtocol> olsr = DynamicCast<olsr::RoutingProtocol>(routing);
-            if (olsr) {
-                routingLog << now << "," << node->GetId() << ",OLSR,0.0.0.0,0.0.0.0,0\n";
-                entryWritten = true;
-            }
-        } else if (g_routingProtocol == "DSDV") {
-            Ptr<dsdv::RoutingProtocol> dsdv = DynamicCast<dsdv::RoutingProtocol>(routing);
-            if (dsdv) {
-                routingLog << now << "," << node->GetId() << ",DSDV,0.0.0.0,0.0.0.0,0\n";
-                entryWritten = true;
-            }
-        } else if (g_routingProtocol == "DSR") {
-            Ptr<dsr::DsrRouting> dsr = DynamicCast<dsr::DsrRouting>(routing);
-            if (dsr) {
-                routingLog << now << "," << node->GetId() << ",DSR,0.0.0.0,0.0.0.0,0\n";
-                entryWritten = true;
+        std::map<std::string, RouteEntry> current = SnapshotRoutes(ipv4, routing);
+        std::map<std::string, RouteEntry> &previous = g_lastRoutes[node->GetId()];
+
+        for (const auto &route : current) {
+            auto old = previous.find(route.first);
+            const char *change = nullptr;
+            if (old == previous.end()) change = "ADD";
+            else if (old->second.nextHop != route.second.nextHop || old->second.metric != route.second.metric) change = "CHG";
+            if (change) {
+                routingLog << now << "," << node->GetId() << "," << g_routingProtocol << "," << route.first << ","
+                           << route.second.nextHop << "," << route.second.metric << "," << change << "\n";
+                changesWritten++;
             }
         }
-
-        if (entryWritten) {
-            nodesProcessed++;
+        for (const auto &route : previous) {
+            if (!current.count(route.first)) {
+                routingLog << now << "," << node->GetId() << "," << g_routingProtocol << "," << route.first << ","
+                           << route.second.nextHop << "," << route.second.metric << ",DEL\n";
+                changesWritten++;
+            }
         }
+        previous.swap(current);
+        nodesProcessed++;
     }
 
     routingLog.close();
-    NS_LOG_INFO("LogRoutingTableChanges completado. Nodos procesados: " << nodesProcessed);
+    NS_LOG_INFO("LogRoutingTableChanges completado. Nodos procesados: " << nodesProcessed
+                << ", cambios registrados: " << changesWritten);
     
     // Programar la próxima ejecución solo si no hemos llegado al final de la simulación
     if (Simulator::Now().GetSeconds() < g_simulationTime - 1.0) {
@@ -672,6 +922,9 @@ int main(int argc, char *argv[]) {
     if (!maliciousSinkPtr) { NS_LOG_ERROR("Fallo al crear sumidero de paquetes malicioso"); return 1; }
     maliciousSinkPtr->TraceConnectWithoutContext("Rx", MakeCallback(&PacketLogger::LogMaliciousPacket));
 
+    Config::ConnectWithoutContext("/NodeList/*/ApplicationList/*/$ns3::OnOffApplication/Tx", MakeCallback(&TagTxTime));
+    Config::ConnectWithoutContext("/NodeList/*/$ns3::Ipv4L3Protocol/Tx", MakeCallback(&RoutingLogger::ControlTx));
+
     NS_LOG_INFO("Configurando captura PCAP");
     mkdir(g_outputDir.c_str(), 0777);
     std::string pcapDir = g_outputDir + "/pcap";
@@ -689,7 +942,10 @@ int main(int argc, char *argv[]) {
     NS_LOG_INFO("Programando eventos de simulación");
     Simulator::Schedule(Seconds(1.0), &LogMobilePositions, mobileNodes);
     Simulator::Schedule(Seconds(1.0), &LogEnergyConsumption, allNodes);
-    Simulator::Schedule(Seconds(1.0), &RecordTemporalMetrics, allNodes, monitor, 1.0);
+    Ptr<Ipv4FlowClassifier> classifier = DynamicCast<Ipv4FlowClassifier>(flowMonitor.GetClassifier());
+    // Una fila por nodo en node_metrics.csv aunque no tenga tráfico: el muestreo solo completa los activos
+    for (uint32_t i = 0; i < allNodes.GetN(); ++i) g_nodeMetrics[allNodes.Get(i)->GetId()].resize(3, 0.0);
+    Simulator::Schedule(Seconds(1.0), &NodeSampler::Sample, allNodes, monitor, classifier, 1.0);
     Simulator::Schedule(Seconds(1.0), &LogRoutingTableChanges, allNodes);
     Simulator::Schedule(Seconds(simTime - 0.1), &CalculateMetrics, monitor, simTime);
     Simulator::Schedule(Seconds(simTime - 0.1), &RecordEnergy, allNodes);
@@ -698,6 +954,8 @@ int main(int argc, char *argv[]) {
     Simulator::Stop(Seconds(simTime));
     Simulator::Run();
     NS_LOG_INFO("Simulación completada.");
+    RoutingLogger::Close();
+    NodeSampler::Close();
     Simulator::Destroy();
     return 0;
 }
\ No newline at end of file